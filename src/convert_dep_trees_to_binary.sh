@@ -0,0 +1,3 @@
+#!/bin/bash
+
+PYTHONPATH=. python -m hu_nmt.data_augmentator.entrypoints.convert_dep_trees_to_binary "$@"
\ No newline at end of file
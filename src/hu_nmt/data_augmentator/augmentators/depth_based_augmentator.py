@@ -28,7 +28,7 @@ class DepthBasedAugmentator(AugmentatorBase):
 
         # No need to include the artificial ROOT node in augmentation
         distances_from_root = dep_graph.get_distances_from_root()
-        distances_from_root.pop('root-0', None)
+        distances_from_root.pop(dep_graph.get_root(), None)
         distances_from_root = distances_from_root.items()
 
         node_ids = [x[0] for x in distances_from_root]
@@ -54,5 +54,5 @@ class DepthBasedAugmentator(AugmentatorBase):
         # Subtract 1 from index,
         # because we removed the artifical ROOT node
         # from the first position in the sentence
-        indices_to_blank = [int(x.rpartition('_')[-1])-1 for x in words_to_augment]
+        indices_to_blank = [dep_graph.get_node_position(x) - 1 for x in words_to_augment]
         return node_ids, indices_to_blank
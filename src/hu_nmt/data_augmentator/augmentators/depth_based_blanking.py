@@ -14,8 +14,8 @@ class DepthBasedBlanking(DepthBasedAugmentator):
         self.BLANK = '[BLANK]'
 
     def augment(self, dep_graph: DependencyGraphWrapper):
-        node_ids, indices_to_blank = self.get_word_indicies_to_blank(dep_graph)
-        sentence = self.reconstruct_sentence_from_node_ids(node_ids)
+        _, indices_to_blank = self.get_word_indicies_to_blank(dep_graph)
+        sentence = list(dep_graph.get_sentence_tokens())
         log.debug(f'Original list of tokens: {sentence}')
         for idx in indices_to_blank:
             sentence[idx] = self.BLANK
@@ -10,8 +10,8 @@ class DepthBasedDropout(DepthBasedAugmentator):
         super().__init__()
 
     def augment(self, dep_graph):
-        node_ids, indices_to_blank = self.get_word_indicies_to_blank(dep_graph)
-        sentence = self.reconstruct_sentence_from_node_ids(node_ids)
+        _, indices_to_blank = self.get_word_indicies_to_blank(dep_graph)
+        sentence = list(dep_graph.get_sentence_tokens())
         log.debug(f'Original list of tokens: {sentence}')
         sentence = [i for j, i in enumerate(sentence) if j not in set(indices_to_blank)]
         log.debug(f'A list of tokens: {sentence}')
@@ -1,16 +1,19 @@
-from typing import Tuple, List, Set, Optional, Dict
+from typing import List, Optional, Dict
 
-import networkx as nx
 import numpy as np
 from tqdm import tqdm
 
 from hu_nmt.data_augmentator.augmentators.subject_object_augmentator import SubjectObjectAugmentator
 from hu_nmt.data_augmentator.filters.filter import Filter
 from hu_nmt.data_augmentator.graph_mappers.edge_mapper import EdgeMapper
-from hu_nmt.data_augmentator.graph_mappers.ged import GED
+from hu_nmt.data_augmentator.graph_mappers.ged import GED, DEFAULT_GED_TIMEOUT
 from hu_nmt.data_augmentator.graph_mappers.graph_similarity_base import GraphSimilarityBase
+from hu_nmt.data_augmentator.graph_mappers.label_histogram_similarity import LabelHistogramSimilarity
+from hu_nmt.data_augmentator.graph_mappers.parallel_similarity import ParallelSimilarityScorer
+from hu_nmt.data_augmentator.graph_mappers.similarity_cache import CachedGraphSimilarity
 from hu_nmt.data_augmentator.utils.logger import get_logger
-from hu_nmt.data_augmentator.utils.translation_graph import TranslationGraph
+from hu_nmt.data_augmentator.utils.pair_sampling import get_pair_count, sample_unordered_index_pairs
+from hu_nmt.data_augmentator.utils.translation_candidate import TranslationCandidate
 from hu_nmt.data_augmentator.wrapper.dependency_graph_wrapper import DependencyGraphWrapper
 
 log = get_logger(__name__)
@@ -18,8 +21,6 @@ log.setLevel('DEBUG')
 
 
 class GraphBasedAugmentator(SubjectObjectAugmentator):
-    similarity: GraphSimilarityBase
-    threshold: int
 
     def __init__(self,
                  src_lang_code: str,
@@ -38,48 +39,143 @@ class GraphBasedAugmentator(SubjectObjectAugmentator):
                  similarity_type: str = '',
                  filter_nsub_and_obj_have_same_ancestor: bool = True,
                  filter_same_pos_tag: bool = True,
-                 filter_for_noun_tags: bool = False):
+                 filter_for_noun_tags: bool = False,
+                 filter_chunk_size: int = 100000,
+                 num_workers: int = 1,
+                 ged_backend: str = 'networkx',
+                 use_similarity_cutoff: bool = True,
+                 similarity_cache_size: int = 100000,
+                 similarity_cache_path: Optional[str] = None,
+                 similarity_pair_timeout: Optional[float] = 10.0,
+                 similarity_time_budget: Optional[float] = None,
+                 similarity_fallback: Optional[str] = 'edge_mapper',
+                 expected_sentence_count: Optional[int] = None):
+        """
+        Args:
+            expected_sentence_count: number of sentence pairs of the run, when the candidates are added in shards.
+                                     The similarity time budget is shared among the shards by their sizes,
+                                     without it the first shards may use up the budget of the whole run.
+        """
         super().__init__(eng_graphs, hun_graphs, augmented_data_ratio, augmented_data_size, random_seed, filters, output_path, output_format,
                          save_original, separate_augmentation, filter_nsub_and_obj_have_same_ancestor,
-                         filter_same_pos_tag, filter_for_noun_tags)
+                         filter_same_pos_tag, filter_for_noun_tags, filter_chunk_size, num_workers)
 
-        GraphBasedAugmentator.threshold = threshold
+        self.threshold = threshold
+        # pairs below the threshold are only scored until they are proven to be below it
+        self.similarity_cutoff: Optional[float] = threshold if use_similarity_cutoff else None
 
+        self.similarity: Optional[GraphSimilarityBase] = None
+        self.fallback_similarity: Optional[GraphSimilarityBase] = None
         if similarity_type == 'ged':
-            GraphBasedAugmentator.similarity = GED()
+            # the scoring schedule limits the time of a pair and falls back explicitly, the networkx timeout
+            # is kept as a backstop where the schedule cannot interrupt the scoring or has no per pair limit
+            ged_timeout = similarity_pair_timeout if similarity_pair_timeout is not None else DEFAULT_GED_TIMEOUT
+            self.similarity = GED(backend=ged_backend, timeout=ged_timeout)
         elif similarity_type == 'edge_mapper':
-            GraphBasedAugmentator.similarity = EdgeMapper()
+            self.similarity = EdgeMapper()
+        if similarity_type in ['ged', 'edge_mapper']:
+            if similarity_fallback == 'edge_mapper' and similarity_type != 'edge_mapper':
+                self.fallback_similarity = EdgeMapper()
+            elif similarity_fallback is not None:
+                # edge mapper similarity falls back to its own label histogram bound
+                self.fallback_similarity = LabelHistogramSimilarity(self.similarity)
+        if similarity_type in ['ged', 'edge_mapper'] and similarity_cache_size > 0:
+            self.similarity = CachedGraphSimilarity(self.similarity, similarity_cache_size, similarity_cache_path)
+        self.similarity_pair_timeout = similarity_pair_timeout
+        self.similarity_time_budget = similarity_time_budget
+        self.expected_sentence_count = expected_sentence_count
+        self._searched_sentence_count = 0
+        self._similarity_scorer: Optional[ParallelSimilarityScorer] = None
 
-    @staticmethod
-    def sample_item_pairs(items: List[TranslationGraph], sample_count: int, dep: str = 'both'):
-        original_threshold = GraphBasedAugmentator.threshold
-        sampled_index_pairs: Set[Tuple[int, int]] = set()
-        pbar = tqdm(total=sample_count)
-        size = 0
-        failed = 0
-        while len(sampled_index_pairs) < sample_count:
-            (x, y) = np.random.choice(len(items), 2, replace=False)
-            if items[x].similarity >= GraphBasedAugmentator.threshold and \
-                    items[y].similarity >= GraphBasedAugmentator.threshold:
-                sampled_index_pairs.add((x, y))
-                change = len(sampled_index_pairs) - size
-                pbar.update(change)
-                size = len(sampled_index_pairs)
-            else:
-                failed += 1
-                if failed >= sample_count:
-                    log.warning(f'Reached {sample_count} failed sentence pairs, decreasing the threshold from '
-                                f'{GraphBasedAugmentator.threshold} to {GraphBasedAugmentator.threshold * 0.98}.')
-                    GraphBasedAugmentator.threshold *= 0.98
-                    failed = 0
-        GraphBasedAugmentator.threshold = original_threshold
-        return [(items[x], items[y]) for x, y in sampled_index_pairs]
+    def _get_similarity_scorer(self) -> ParallelSimilarityScorer:
+        if self._similarity_scorer is None:
+            self._similarity_scorer = ParallelSimilarityScorer(self.similarity, self.num_workers,
+                                                               self.similarity_pair_timeout,
+                                                               total_budget=self.similarity_time_budget,
+                                                               fallback=self.fallback_similarity)
+        return self._similarity_scorer
+
+    def finish_candidate_search(self):
+        # every candidate has been scored by now
+        if self._similarity_scorer is not None:
+            self._similarity_scorer.log_stats()
+            self._similarity_scorer.close()
+        if isinstance(self.similarity, CachedGraphSimilarity):
+            self.similarity.log_stats()
+            if self.similarity.cache_path is not None:
+                self.similarity.save()
 
     @staticmethod
-    def _get_similarity(src_graph: DependencyGraphWrapper, tgt_graph: DependencyGraphWrapper, dep):
-        src_subgraph = GraphBasedAugmentator._get_subgraph(src_graph, dep)
-        tgt_subgraph = GraphBasedAugmentator._get_subgraph(tgt_graph, dep)
-        return GraphBasedAugmentator.similarity.get_similarity_from_graphs(src_subgraph, tgt_subgraph)
+    def _get_required_item_count(sample_count: int) -> int:
+        """
+        Returns:
+            smallest number of items with at least sample_count distinct unordered pairs
+        """
+        item_count = int(np.ceil((1 + np.sqrt(1 + 8 * sample_count)) / 2))
+        # correct the rounding errors of the floating point square root
+        while item_count > 2 and get_pair_count(item_count - 1) >= sample_count:
+            item_count -= 1
+        while get_pair_count(item_count) < sample_count:
+            item_count += 1
+        return item_count
+
+    def get_sampling_threshold(self, sorted_similarities: np.ndarray, sample_count: int) -> float:
+        """
+        Args:
+            sorted_similarities: similarities of the candidates in descending order
+        Returns:
+            the threshold, or if the candidates above it cannot supply sample_count pairs,
+            the highest threshold whose candidates can. Below the similarity cutoff this is an upper bound
+            of the similarities.
+        """
+        eligible_count = int(np.count_nonzero(sorted_similarities >= self.threshold))
+        if get_pair_count(eligible_count) >= sample_count or eligible_count == len(sorted_similarities):
+            return self.threshold
+        required_count = min(self._get_required_item_count(sample_count), len(sorted_similarities))
+        lowered_threshold = float(sorted_similarities[required_count - 1])
+        log.warning(f'{eligible_count} candidates are above the threshold {self.threshold}, which is not enough for '
+                    f'{sample_count} sentence pairs, decreasing the threshold to {lowered_threshold}.')
+        return lowered_threshold
+
+    def sample_item_index_pairs(self, items: List[TranslationCandidate], sample_count: int, dep: str,
+                                rng: np.random.Generator) -> np.ndarray:
+        """
+        Samples distinct unordered pairs of candidates whose similarities are both above the threshold.
+        The candidates are sorted by similarity, so the pairs are drawn directly from the prefix above the threshold.
+        Similarities below the similarity cutoff are upper bounds, the candidates clipped just below the cutoff
+        are ranked by their own bounds, so a lowered threshold takes the best bounded candidates.
+        """
+        similarities = np.fromiter((item.similarity for item in items), dtype=np.float64, count=len(items))
+        bounds = np.fromiter((item.similarity if item.similarity_bound is None else item.similarity_bound
+                              for item in items), dtype=np.float64, count=len(items))
+        # stable, so candidates of equal similarity and bound keep their order
+        order = np.lexsort((-bounds, -similarities))
+        sorted_similarities = similarities[order]
+        threshold = self.get_sampling_threshold(sorted_similarities, sample_count)
+        eligible_count = int(np.count_nonzero(sorted_similarities >= threshold))
+        if threshold < self.threshold:
+            # the candidates tied at a lowered threshold are ordered by their bounds, only the required ones are taken
+            eligible_count = min(self._get_required_item_count(sample_count), len(items))
+
+        index_pairs = order[sample_unordered_index_pairs(eligible_count, sample_count, rng)]
+        return index_pairs[np.lexsort((index_pairs[:, 1], index_pairs[:, 0]))]
+
+    def sample_item_pairs(self, items: List[TranslationCandidate], sample_count: int, dep: str,
+                          rng: np.random.Generator):
+        return self._get_items_of_index_pairs(items, self.sample_item_index_pairs(items, sample_count, dep, rng))
+
+    def _get_budget_share(self, sentence_count: int) -> Optional[float]:
+        """
+        Returns:
+            share of the remaining similarity time budget of the next sentence_count sentences,
+            None (all of it) if the size of the run is not known
+        """
+        searched_sentence_count = self._searched_sentence_count
+        self._searched_sentence_count += sentence_count
+        if self.expected_sentence_count is None or sentence_count == 0:
+            return None
+        remaining_sentence_count = max(self.expected_sentence_count - searched_sentence_count, sentence_count)
+        return sentence_count / remaining_sentence_count
 
     @staticmethod
     def _get_subgraph(wrapper: DependencyGraphWrapper, dep: str) -> DependencyGraphWrapper:
@@ -87,12 +183,11 @@ class GraphBasedAugmentator(SubjectObjectAugmentator):
         # it has only 1 obj or nsubj edge due to previous constraints
         edges_with_type = edges_with_type[0]
         top_node_of_tree = edges_with_type.target_node
-        node_ids = wrapper.get_subtree_node_ids(top_node_of_tree)
-        subgraph = nx.DiGraph(wrapper.graph.subgraph(node_ids))
-        return DependencyGraphWrapper(subgraph)
+        # the similarity measures do not modify the graphs, so the subtree does not need to be copied
+        return wrapper.get_subtree_view(top_node_of_tree)
 
     def find_candidates(self, src_graphs: List[DependencyGraphWrapper], tgt_graphs: List[DependencyGraphWrapper],
-                        with_progress_bar: bool = False, separate_augmentation: bool = False) -> Dict[str, List[TranslationGraph]]:
+                        with_progress_bar: bool = False, separate_augmentation: bool = False) -> Dict[str, List[TranslationCandidate]]:
         candidates = {'obj': [], 'nsubj': [], 'both': []}
 
         if with_progress_bar:
@@ -100,13 +195,31 @@ class GraphBasedAugmentator(SubjectObjectAugmentator):
         else:
             iterable = zip(src_graphs, tgt_graphs)
         if separate_augmentation:
+            # the eligible pairs are collected first and scored in batches
+            eligible_pairs = {'obj': [], 'nsubj': []}
             for src_graph, tgt_graph in iterable:
-                if self.is_eligible_for_augmentation(src_graph, tgt_graph, 'obj'):
-                    sim = GraphBasedAugmentator._get_similarity(src_graph, tgt_graph, 'obj')
-                    candidates['obj'].append(TranslationGraph(src_graph, tgt_graph, sim))
-                if self.is_eligible_for_augmentation(src_graph, tgt_graph, 'nsubj'):
-                    sim = GraphBasedAugmentator._get_similarity(src_graph, tgt_graph, 'nsubj')
-                    candidates['nsubj'].append(TranslationGraph(src_graph, tgt_graph, sim))
+                for dep in eligible_pairs:
+                    if self.is_eligible_for_augmentation(src_graph, tgt_graph, dep):
+                        eligible_pairs[dep].append((src_graph, tgt_graph))
+
+            subgraph_pairs = [(GraphBasedAugmentator._get_subgraph(src_graph, dep),
+                               GraphBasedAugmentator._get_subgraph(tgt_graph, dep))
+                              for dep, graph_pairs in eligible_pairs.items() for src_graph, tgt_graph in graph_pairs]
+            similarities = self._get_similarity_scorer().score(
+                subgraph_pairs, cutoff=self.similarity_cutoff, with_progress_bar=with_progress_bar,
+                budget_share=self._get_budget_share(len(src_graphs)))
+            # the similarity a rejected pair gets when its upper bound is not below the cutoff
+            clipped_similarity = None if self.similarity_cutoff is None else \
+                float(np.nextafter(self.similarity_cutoff, -np.inf))
+            pair_idx = 0
+            for dep, graph_pairs in eligible_pairs.items():
+                for src_graph, tgt_graph in graph_pairs:
+                    similarity_bound = None
+                    if similarities[pair_idx] == clipped_similarity:
+                        similarity_bound = self.similarity.get_similarity_upper_bound(*subgraph_pairs[pair_idx])
+                    candidates[dep].append(TranslationCandidate.from_graphs(
+                        src_graph, tgt_graph, [dep], similarities[pair_idx], similarity_bound=similarity_bound))
+                    pair_idx += 1
             return candidates
         else:
             raise ValueError('Graph based augmentation only works with separate augmentation!')
@@ -1,7 +1,8 @@
 import copy
+import multiprocessing as mp
 import os
-from itertools import combinations
-from operator import itemgetter
+import tempfile
+from itertools import combinations, zip_longest
 from typing import List, Tuple, Dict, Optional
 
 import numpy as np
@@ -9,14 +10,26 @@ from tqdm import tqdm
 
 from hu_nmt.data_augmentator.base.augmentator_base import AugmentatorBase
 from hu_nmt.data_augmentator.filters.filter import Filter
+from hu_nmt.data_augmentator.utils.augmentation_writer import AugmentationSink, InMemoryAugmentationSink, \
+    StreamingAugmentationWriter
 from hu_nmt.data_augmentator.utils.logger import get_logger
-from hu_nmt.data_augmentator.utils.translation_graph import TranslationGraph
+from hu_nmt.data_augmentator.utils.packed_candidates import save_packed_candidates, init_swap_worker, \
+    swap_worker_chunk
+from hu_nmt.data_augmentator.utils.pair_sampling import sample_unordered_index_pairs
+from hu_nmt.data_augmentator.utils.translation_candidate import TranslationCandidate, SentenceCandidate, \
+    to_translation_candidate
 from hu_nmt.data_augmentator.utils.types.postag import Postag
 from hu_nmt.data_augmentator.wrapper.dependency_graph_wrapper import DependencyGraphWrapper
 
 log = get_logger(__name__)
 log.setLevel('DEBUG')
 
+# maximum number of sampled pairs swapped by a worker at once
+PARALLEL_SWAP_CHUNK_SIZE = 10000
+# every sampling step draws from its own stream spawned from the random seed,
+# so the samples of a step do not depend on which other steps ran before it
+RANDOM_STREAMS = ['obj', 'nsubj', 'both', 'same_predicate_lemma', 'predicate']
+
 
 class SubjectObjectAugmentator(AugmentatorBase):
 
@@ -33,7 +46,9 @@ class SubjectObjectAugmentator(AugmentatorBase):
                  separate_augmentation: bool = False,
                  filter_nsub_and_obj_have_same_ancestor: bool = True,
                  filter_same_pos_tag: bool = True,
-                 filter_for_noun_tags: bool = False):
+                 filter_for_noun_tags: bool = False,
+                 filter_chunk_size: int = 100000,
+                 num_workers: int = 1):
         super().__init__()
         if src_graphs and tgt_graphs and len(src_graphs) != len(tgt_graphs):
             raise ValueError('Length of sentences must be equal for both langugages')
@@ -55,7 +70,10 @@ class SubjectObjectAugmentator(AugmentatorBase):
                 self._num_augmented_sentences_to_generate_per_method = int(
                     self._pre_filter_sentence_count * float(self.augmented_data_ratio))
 
-        np.random.seed = random_seed
+        self.random_seed = random_seed
+        self._rngs: Dict[str, np.random.Generator] = {
+            name: np.random.default_rng(seed) for name, seed in
+            zip(RANDOM_STREAMS, np.random.SeedSequence(self.random_seed).spawn(len(RANDOM_STREAMS)))}
         self.filters = filters
         self._output_path = output_path
         self.output_format = output_format
@@ -64,10 +82,13 @@ class SubjectObjectAugmentator(AugmentatorBase):
         self.filter_nsub_and_obj_have_same_ancestor = filter_nsub_and_obj_have_same_ancestor
         self.filter_same_pos_tag = filter_same_pos_tag
         self.filter_for_noun_tags = filter_for_noun_tags
+        self.filter_chunk_size = filter_chunk_size
+        self.num_workers = num_workers
         self.error_cnt = 0
 
-        self._augmentation_candidate_translations: List[TranslationGraph] = []
-        self._candidate_translations: Dict[str, List[TranslationGraph]] = {'obj': [], 'nsubj': [], 'both': []}
+        self._augmentation_candidate_translations: List[TranslationCandidate] = []
+        # eligible pairs are reduced to compact records, so the dependency trees are not kept alive
+        self._candidate_translations: Dict[str, List[TranslationCandidate]] = {'obj': [], 'nsubj': [], 'both': []}
         sentence_pairs_template = {
             'obj_swapping_same_predicate_lemma': {
                 'src': [],
@@ -91,20 +112,19 @@ class SubjectObjectAugmentator(AugmentatorBase):
             # }
         }
         self._augmented_sentence_pairs = copy.deepcopy(sentence_pairs_template)
+        self._original_augmentation_sentence_pairs = None
         if self.save_original:
             self._original_augmentation_sentence_pairs = copy.deepcopy(sentence_pairs_template)
+        # augment() streams the pairs to the output files, otherwise they are collected in the dictionaries above
+        self._sink: AugmentationSink = InMemoryAugmentationSink(self._augmented_sentence_pairs,
+                                                               self._original_augmentation_sentence_pairs)
 
-    def group_candidates_by_predicate_lemmas(self) -> Dict[Tuple[str, str], List[TranslationGraph]]:
-        lemmas_to_graphs = {}  # tuple(src_lemma, tgt_lemma) --> tuple(src_graph, tgt_graph)
+    def group_candidates_by_predicate_lemmas(self) -> Dict[Tuple[str, str], List[TranslationCandidate]]:
+        lemmas_to_graphs = {}  # tuple(src_lemma, tgt_lemma) --> list of translation candidates
 
         for translation in self._candidate_translations["both"]:
-            src_nsubj_edge = translation.src.get_edges_with_property('dep', 'nsubj')[0]
-            # filtered candidates will only have one
-            tgt_nsubj_edge = translation.tgt.get_edges_with_property('dep', 'nsubj')[0]
-
-            src_predicate_lemma = translation.src.graph.nodes[src_nsubj_edge.source_node]['lemma'].strip()
-            tgt_predicate_lemma = translation.tgt.graph.nodes[tgt_nsubj_edge.source_node]['lemma'].strip()
-            lemmas_key = (src_predicate_lemma, tgt_predicate_lemma)
+            translation = to_translation_candidate(translation)
+            lemmas_key = (translation.src.predicate_lemma, translation.tgt.predicate_lemma)
             if lemmas_key not in lemmas_to_graphs:
                 lemmas_to_graphs[lemmas_key] = []
             lemmas_to_graphs[lemmas_key].append(translation)
@@ -128,6 +148,7 @@ class SubjectObjectAugmentator(AugmentatorBase):
             log.info(f'Working with {len(self._candidate_translations["obj"])} object candidate sentence pairs')
             log.info(f'Working with {len(self._candidate_translations["nsubj"])} candidate sentence pairs')
             log.info(f'Working with {len(self._candidate_translations["both"])} candidate sentence pairs')
+        self.finish_candidate_search()
 
         log.info(
             f'Going to generate {self._num_augmented_sentences_to_generate_per_method} augmented sentences per method')
@@ -135,33 +156,49 @@ class SubjectObjectAugmentator(AugmentatorBase):
 
         # self.augment_subtree_swapping_with_same_predicate_lemmas(lemmas_to_graphs)
         # self.augment_predicate_swapping()
-        self.augment_subtree_swapping()
+        if len(self.filters) > 0:
+            log.info(f'Filtering sentences in chunks of {self.filter_chunk_size}...')
+        in_memory_sink = self._sink
+        with self._get_output_writer() as writer:
+            self._sink = writer
+            try:
+                self.augment_subtree_swapping()
+            finally:
+                self._sink = in_memory_sink
 
-        # filter
         if len(self.filters) > 0:
-            number_of_sents_per_aug_method = {aug_name: len(sents['src']) for aug_name, sents in
-                                              self._augmented_sentence_pairs.items()}
-            log.info(f'Number of sentences per method before filtering: {number_of_sents_per_aug_method}')
-            log.info('Filtering sentences...')
-            for aug_method_name, sentences in self._augmented_sentence_pairs.items():
-                for filter in self.filters:
-                    filtered_src, filtered_tgt = filter.filter(sentences['src'], sentences['tgt'])
-                    self._augmented_sentence_pairs[aug_method_name]['src'] = filtered_src
-                    self._augmented_sentence_pairs[aug_method_name]['tgt'] = filtered_tgt
-            number_of_sents_per_aug_method = {aug_name: len(sents['src']) for aug_name, sents in
-                                              self._augmented_sentence_pairs.items()}
-            log.info(f'Number of sentences per method after filtering: {number_of_sents_per_aug_method}')
-
-        self.dump_augmented_sentences_to_files()
+            log.info(f'Number of sentences per method before filtering: {writer.pre_filter_counts}')
+            log.info(f'Number of sentences per method after filtering: {writer.written_counts}')
+
+    def finish_candidate_search(self):
+        """
+        Called once every candidate has been found, before the augmentation
+        """
+        pass
+
+    def _get_output_writer(self, filters: Optional[List[Filter]] = None) -> StreamingAugmentationWriter:
+        log.info(f'Saving augmented sentences at {self._output_path} with output format {self.output_format}')
+        return StreamingAugmentationWriter(self._output_path, self.output_format, self._augmented_sentence_pairs.keys(),
+                                           save_original=self.save_original,
+                                           filters=self.filters if filters is None else filters,
+                                           filter_chunk_size=self.filter_chunk_size)
+
+    def get_rng(self, stream: str) -> np.random.Generator:
+        return self._rngs[stream]
 
     @staticmethod
-    def sample_item_pairs(items: List, sample_count: int, dep: str = 'both'):
-        sampled_index_pairs: set[Tuple[int, int]] = set()
-        while len(sampled_index_pairs) < sample_count:
-            random_index_pair = np.random.choice(len(items), 2, replace=False)
-            sampled_index_pairs.add(tuple(random_index_pair))
+    def sample_item_index_pairs(items: List, sample_count: int, dep: str, rng: np.random.Generator) -> np.ndarray:
+        """
+        Samples distinct unordered pairs of item indices, at most len(items) * (len(items) - 1) / 2
+        """
+        return sample_unordered_index_pairs(len(items), sample_count, rng)
 
-        return [(items[x], items[y]) for x, y in sampled_index_pairs]
+    @classmethod
+    def sample_item_pairs(cls, items: List, sample_count: int, dep: str, rng: np.random.Generator):
+        """
+        Samples distinct unordered pairs of items, at most len(items) * (len(items) - 1) / 2
+        """
+        return cls._get_items_of_index_pairs(items, cls.sample_item_index_pairs(items, sample_count, dep, rng))
 
     def augment_predicate_swapping(self):
         log.info('Starting predicate swapping augmentation')
@@ -170,14 +207,14 @@ class SubjectObjectAugmentator(AugmentatorBase):
         # because a subtree swapping on a sentence pairs, yields
         # two new augmented sentences.
         sample_cnt = int(self._num_augmented_sentences_to_generate_per_method / 2)
-        sampled_translation_pairs = self.sample_item_pairs(self._candidate_translations["both"], sample_cnt)
+        sampled_translation_pairs = self.sample_item_pairs(self._candidate_translations["both"], sample_cnt, 'both',
+                                                           self.get_rng('predicate'))
         self.swap_predicates_in_all_combinations(sampled_translation_pairs)
         log.info('Finished predicate swapping augmentation')
 
     @staticmethod
-    def sample_list(from_list, num_samples):
-        all_indices = [x for x in range(len(from_list))]
-        sampled_indices = np.random.choice(all_indices, num_samples, replace=False)
+    def sample_list(from_list, num_samples, rng: np.random.Generator):
+        sampled_indices = rng.choice(len(from_list), num_samples, replace=False)
         return [from_list[idx] for idx in sampled_indices]
 
     def swap_predicates_in_all_combinations(self, translation_combinations):
@@ -186,13 +223,11 @@ class SubjectObjectAugmentator(AugmentatorBase):
                 if self.save_original:
                     # save original translation pairs
                     original_src_sents, original_tgt_sents = self.reconstruct_translation_pair(translation_pair)
-                    self._original_augmentation_sentence_pairs['predicate_swapping']['src'].extend(original_src_sents)
-                    self._original_augmentation_sentence_pairs['predicate_swapping']['tgt'].extend(original_tgt_sents)
+                    self._sink.add_original('predicate_swapping', original_src_sents, original_tgt_sents)
 
                 # augment translation pair
                 src_sents, tgt_sents = self.augment_pair(translation_pair, 'predicate')
-                self._augmented_sentence_pairs['predicate_swapping']['src'].extend(src_sents)
-                self._augmented_sentence_pairs['predicate_swapping']['tgt'].extend(tgt_sents)
+                self._sink.add('predicate_swapping', src_sents, tgt_sents)
             except Exception as e:
                 self.error_cnt += 1
                 log.exception('Cannot process sentence')
@@ -209,29 +244,53 @@ class SubjectObjectAugmentator(AugmentatorBase):
         pre_filter_sample_cnt = int(sample_cnt * pre_filter_multiplier)
 
         if self.separate_augmentation:
-            object_translation_pairs = self.sample_item_pairs(self._candidate_translations['obj'],
-                                                              pre_filter_sample_cnt, 'obj')
+            object_candidate_set, subject_candidate_set = 'obj', 'nsubj'
+        else:
+            object_candidate_set, subject_candidate_set = 'both', 'both'
+        object_index_pairs = self.sample_item_index_pairs(self._candidate_translations[object_candidate_set],
+                                                          pre_filter_sample_cnt, object_candidate_set,
+                                                          self.get_rng(object_candidate_set))
+        if self.separate_augmentation:
+            subject_index_pairs = self.sample_item_index_pairs(self._candidate_translations[subject_candidate_set],
+                                                               pre_filter_sample_cnt, subject_candidate_set,
+                                                               self.get_rng(subject_candidate_set))
+        else:
+            subject_index_pairs = object_index_pairs
 
-            subject_translation_pairs = self.sample_item_pairs(self._candidate_translations['nsubj'],
-                                                               pre_filter_sample_cnt, 'nsubj')
+        if self.num_workers > 1:
+            self.swap_dep_subtrees_in_parallel({
+                'obj': (object_candidate_set, object_index_pairs),
+                'nsubj': (subject_candidate_set, subject_index_pairs)
+            })
         else:
-            object_translation_pairs = self.sample_item_pairs(self._candidate_translations["both"],
-                                                              pre_filter_sample_cnt)
-            # self.swap_subtrees_among_combinations(sampled_translation_pairs, same_predicate_lemma=False)
-            subject_translation_pairs = object_translation_pairs
-        self.swap_dep_subtrees(object_translation_pairs, 'obj', same_predicate_lemma=False)
-        self.swap_dep_subtrees(subject_translation_pairs, 'nsubj', same_predicate_lemma=False)
+            object_translation_pairs = self._get_items_of_index_pairs(
+                self._candidate_translations[object_candidate_set], object_index_pairs)
+            subject_translation_pairs = self._get_items_of_index_pairs(
+                self._candidate_translations[subject_candidate_set], subject_index_pairs)
+            self.swap_dep_subtrees(object_translation_pairs, 'obj', same_predicate_lemma=False)
+            self.swap_dep_subtrees(subject_translation_pairs, 'nsubj', same_predicate_lemma=False)
 
         log.info('Finished subtree swapping on all permutations')
 
-    def swap_dep_subtrees(self, translation_pairs: List[Tuple[TranslationGraph, TranslationGraph]], dep: str,
-                          same_predicate_lemma: bool):
+    @staticmethod
+    def _get_items_of_index_pairs(items: List, index_pairs: np.ndarray) -> List[Tuple]:
+        return [(items[x], items[y]) for x, y in index_pairs.tolist()]
+
+    @staticmethod
+    def get_augmentation_key(dep: str, same_predicate_lemma: bool = False) -> str:
         if dep == 'obj':
             augmentation_key = 'obj_swapping'
         elif dep == 'nsubj':
             augmentation_key = 'subj_swapping'
         else:
             raise ValueError("Invalid dependency name value!")
+        if same_predicate_lemma:
+            return f'{augmentation_key}_same_predicate_lemma'
+        return augmentation_key
+
+    def swap_dep_subtrees(self, translation_pairs: List[Tuple[TranslationCandidate, TranslationCandidate]], dep: str,
+                          same_predicate_lemma: bool):
+        key = self.get_augmentation_key(dep, same_predicate_lemma)
         for translation_pair in tqdm(translation_pairs):
             try:
                 if self.save_original:
@@ -239,22 +298,65 @@ class SubjectObjectAugmentator(AugmentatorBase):
 
                 # swapping
                 src_sents, tgt_sents = self.augment_pair(translation_pair, dep)
-                if same_predicate_lemma:
-                    key = f'{augmentation_key}_same_predicate_lemma'
-                else:
-                    key = augmentation_key
                 if self.save_original:
-                    self._original_augmentation_sentence_pairs[key]['src'].extend(original_src_sents)
-                    self._original_augmentation_sentence_pairs[key]['tgt'].extend(original_tgt_sents)
-                self._augmented_sentence_pairs[key]['src'].extend(src_sents)
-                self._augmented_sentence_pairs[key]['tgt'].extend(tgt_sents)
+                    self._sink.add_original(key, original_src_sents, original_tgt_sents)
+                self._sink.add(key, src_sents, tgt_sents)
             except Exception as e:
                 self.error_cnt += 1
                 log.exception(f'Cannot process sentence')
         log.info(f'Could not perform {self.error_cnt} augmentations so far')
 
+    def swap_dep_subtrees_in_parallel(self, index_pairs_per_dep: Dict[str, Tuple[str, np.ndarray]]):
+        """
+        Swaps the subtrees of the sampled pairs in num_workers processes. The candidates are packed into
+        memory-mapped arrays instead of being pickled for the workers, and the pairs of every dependency
+        are split into contiguous chunks. The output is in the same order as with swap_dep_subtrees.
+        Args:
+            index_pairs_per_dep: dep (obj or nsubj) --> (candidate set name, sampled (k, 2) index pairs)
+        """
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            candidate_dirs = {}
+            index_pair_paths = {}
+            tasks = {}
+            for dep, (candidate_set, index_pairs) in index_pairs_per_dep.items():
+                if len(index_pairs) == 0:
+                    continue
+                if candidate_set not in candidate_dirs:
+                    candidate_dirs[candidate_set] = os.path.join(tmp_dir, candidate_set)
+                    save_packed_candidates([to_translation_candidate(translation) for translation in
+                                            self._candidate_translations[candidate_set]],
+                                           candidate_dirs[candidate_set])
+                index_pair_paths[dep] = os.path.join(tmp_dir, f'{dep}_index_pairs.npy')
+                np.save(index_pair_paths[dep], index_pairs)
+                chunk_size = min(PARALLEL_SWAP_CHUNK_SIZE,
+                                 max(1, -(-len(index_pairs) // (4 * self.num_workers))))
+                tasks[dep] = [(dep, candidate_set, dep, start, min(start + chunk_size, len(index_pairs)),
+                               self.save_original)
+                              for start in range(0, len(index_pairs), chunk_size)]
+            if not tasks:
+                return
+
+            log.info(f'Swapping subtrees with {self.num_workers} workers')
+            with mp.get_context('spawn').Pool(self.num_workers, initializer=init_swap_worker,
+                                              initargs=(candidate_dirs, index_pair_paths)) as pool:
+                # the chunks of all dependencies are queued at once, so obj and nsubj swapping run concurrently
+                chunk_results = {dep: pool.imap(swap_worker_chunk, dep_tasks) for dep, dep_tasks in tasks.items()}
+                with tqdm(total=sum(len(dep_tasks) for dep_tasks in tasks.values())) as pbar:
+                    # results are consumed in chunk order, alternating between the dependencies
+                    for results in zip_longest(*chunk_results.values()):
+                        for dep, result in zip(chunk_results.keys(), results):
+                            if result is None:
+                                continue
+                            key = self.get_augmentation_key(dep)
+                            if self.save_original:
+                                self._sink.add_original(key, result.original_src_sents, result.original_tgt_sents)
+                            self._sink.add(key, result.src_sents, result.tgt_sents)
+                            self.error_cnt += result.error_cnt
+                            pbar.update(1)
+        log.info(f'Could not perform {self.error_cnt} augmentations so far')
+
     def augment_subtree_swapping_with_same_predicate_lemmas(self, lemmas_to_graphs: Dict[
-        Tuple[str, str], List[TranslationGraph]]):
+        Tuple[str, str], List[TranslationCandidate]]):
         """
         Swaps Obj and Nsubj subtrees within the combinations of sentences
         that have the same same predicate lemma
@@ -275,20 +377,21 @@ class SubjectObjectAugmentator(AugmentatorBase):
         sample_cnt = int(
             self._num_augmented_sentences_to_generate_per_method / 2)  # = how many translation pairs do we need to sample -> a translation pair/combination gives 2 new translations
         if len(translation_combinations) > sample_cnt:
-            translation_combinations = self.sample_list(translation_combinations, sample_cnt)
+            translation_combinations = self.sample_list(translation_combinations, sample_cnt,
+                                                        rng=self.get_rng('same_predicate_lemma'))
 
         self.swap_dep_subtrees(translation_combinations, 'obj', same_predicate_lemma=True)
         self.swap_dep_subtrees(translation_combinations, 'nsubj', same_predicate_lemma=True)
         log.info('Finished subtree swapping with same predicate lemmas')
 
-    def augment_pair(self, translation_pair: Tuple[TranslationGraph, TranslationGraph], augmentation_type) -> Tuple[
-        List[str], List[str]]:
+    def augment_pair(self, translation_pair: Tuple[TranslationCandidate, TranslationCandidate], augmentation_type) -> \
+            Tuple[List[str], List[str]]:
         """
         Swaps the subtrees of the sentences
         Params:
-            sample_pair (List of Tuples of DependencyGraphWrappers): Two pairs of src_lang and tgt_lang
-                                                                     dependency parse trees selected for
-                                                                     augmentation
+            translation_pair (Tuple of TranslationCandidates): Two pairs of src_lang and tgt_lang
+                                                               sentences selected for augmentation
+                                                               (TranslationGraphs are converted)
             augmentation_type (String): defines what we swap (obj, nsubj or predicate)
         Returns:
              src_augmented_sentences (list of Strings): Source language augmented sentence pairs
@@ -299,97 +402,60 @@ class SubjectObjectAugmentator(AugmentatorBase):
         src_augmented_sentences = []
         tgt_augmented_sentences = []
 
-        src_graph_1 = translation_pair[0].src
-        tgt_graph_1 = translation_pair[0].tgt
-        src_graph_2 = translation_pair[1].src
-        tgt_graph_2 = translation_pair[1].tgt
-
-        # src_graph_1.display_graph()
-        # tgt_graph_1.display_graph()
-        # src_graph_2.display_graph()
-        # tgt_graph_2.display_graph()
+        translation_1 = to_translation_candidate(translation_pair[0])
+        translation_2 = to_translation_candidate(translation_pair[1])
 
         if augmentation_type == 'predicate':
-            src_augmented_sentences.extend(self.swap_predicates(src_graph_1, src_graph_2))
-            tgt_augmented_sentences.extend(self.swap_predicates(tgt_graph_1, tgt_graph_2))
+            src_augmented_sentences.extend(self.swap_candidate_predicates(translation_1.src, translation_2.src))
+            tgt_augmented_sentences.extend(self.swap_candidate_predicates(translation_1.tgt, translation_2.tgt))
         elif augmentation_type == 'obj' or augmentation_type == 'nsubj':
-            src_augmented_sentences.extend(self.swap_subtrees(src_graph_1, src_graph_2, augmentation_type))
-            tgt_augmented_sentences.extend(self.swap_subtrees(tgt_graph_1, tgt_graph_2, augmentation_type))
+            src_augmented_sentences.extend(
+                self.swap_candidate_subtrees(translation_1.src, translation_2.src, augmentation_type))
+            tgt_augmented_sentences.extend(
+                self.swap_candidate_subtrees(translation_1.tgt, translation_2.tgt, augmentation_type))
 
         return src_augmented_sentences, tgt_augmented_sentences
 
     def swap_predicates(self, sentence_graph_1: DependencyGraphWrapper, sentence_graph_2: DependencyGraphWrapper) -> \
             List[str]:
-        original_sentence_1 = self.reconstruct_sentence_from_node_ids(sentence_graph_1.graph.nodes)
-        original_sentence_2 = self.reconstruct_sentence_from_node_ids(sentence_graph_2.graph.nodes)
-        # Will have one edge only due to filtering. source node of nsubj edge --> predicate of sentence
-        predicate_1 = sentence_graph_1.get_edges_with_property('dep', 'nsubj')[0].source_node
-        predicate_2 = sentence_graph_2.get_edges_with_property('dep', 'nsubj')[0].source_node
+        return self.swap_candidate_predicates(SentenceCandidate.from_graph(sentence_graph_1, [], with_predicate=True),
+                                              SentenceCandidate.from_graph(sentence_graph_2, [], with_predicate=True))
 
-        predicate_1_word, _, predicate_1_idx = predicate_1.rpartition('_')
-        predicate_2_word, _, predicate_2_idx = predicate_2.rpartition('_')
+    @staticmethod
+    def swap_candidate_predicates(sentence_1: SentenceCandidate, sentence_2: SentenceCandidate) -> List[str]:
+        original_sentence_1 = list(sentence_1.tokens)
+        original_sentence_2 = list(sentence_2.tokens)
 
         # Swap predicates
-        original_sentence_1[int(predicate_1_idx)] = predicate_2_word
-        original_sentence_2[int(predicate_2_idx)] = predicate_1_word
-
-        return [' '.join(original_sentence_1[1:]), ' '.join(original_sentence_2[1:])]
-
-    def build_original_sentence_with_subgraph(self, sentence_graph: DependencyGraphWrapper, subtree_type: str) -> Tuple[
-        List[str], Tuple[int, int], List[str]]:
-        original_sentence_words = self.reconstruct_sentence_from_node_ids(sentence_graph.graph.nodes)
-        subgraph_words_with_ids = self.get_subgraph_from_edge_type(sentence_graph, subtree_type)
-        subgraph_offsets = self.get_offsets_from_node_ids(subgraph_words_with_ids)
-        subgraph_words = [x.rpartition('_')[0] for x in subgraph_words_with_ids]
+        original_sentence_1[sentence_1.predicate_index] = sentence_2.tokens[sentence_2.predicate_index]
+        original_sentence_2[sentence_2.predicate_index] = sentence_1.tokens[sentence_1.predicate_index]
 
-        return original_sentence_words, subgraph_offsets, subgraph_words
+        return [' '.join(original_sentence_1), ' '.join(original_sentence_2)]
 
     @staticmethod
     def swap_subtree(original_sentence: List[str], subgraph_offsets: Tuple[int, int], subgraph_to_insert: List[str]) -> \
             List[str]:
-        subtree_indices = range(subgraph_offsets[0], subgraph_offsets[1] + 1)
-        # remove subtree from sent1
-        original_sentence = [i for j, i in enumerate(original_sentence) if j not in subtree_indices]
-        # add new subtree of sent2 to sent1
-        insert_at = subgraph_offsets[0]
-        original_sentence[insert_at:insert_at] = subgraph_to_insert
-
-        return original_sentence
+        # replace the (contiguous) subtree of sent1 with the new subtree of sent2
+        return original_sentence[:subgraph_offsets[0]] + subgraph_to_insert + original_sentence[subgraph_offsets[1] + 1:]
 
     def swap_subtrees(self, sentence_graph_1: DependencyGraphWrapper, sentence_graph_2: DependencyGraphWrapper,
                       subtree_type: str) -> List[str]:
-        original_sentence_1, subgraph_offsets_1, subgraph_1 = self.build_original_sentence_with_subgraph(
-            sentence_graph_1, subtree_type)
-        original_sentence_2, subgraph_offsets_2, subgraph_2 = self.build_original_sentence_with_subgraph(
-            sentence_graph_2, subtree_type)
-
-        original_sentence_1 = self.swap_subtree(original_sentence_1, subgraph_offsets_1, subgraph_2)
-        original_sentence_2 = self.swap_subtree(original_sentence_2, subgraph_offsets_2, subgraph_1)
-
-        return [' '.join(original_sentence_1[1:]), ' '.join(original_sentence_2[1:])]
+        return self.swap_candidate_subtrees(SentenceCandidate.from_graph(sentence_graph_1, [subtree_type]),
+                                            SentenceCandidate.from_graph(sentence_graph_2, [subtree_type]),
+                                            subtree_type)
 
-    @staticmethod
-    def get_subgraph_from_edge_type(graph, edge_type) -> List[str]:
-        # Because of prior filtering, we always will have one edge
-
-        edges_with_type = graph.get_edges_with_property('dep', edge_type)[0]
-        top_node_of_tree = edges_with_type.target_node
-        node_ids = graph.get_subtree_node_ids(top_node_of_tree)
-        splitted_node_ids = [x.rpartition('_') for x in node_ids]
-        splitted_node_ids = [(x[0], int(x[2])) for x in splitted_node_ids]
-        return [f'{y[0]}_{y[1]}' for y in sorted(splitted_node_ids, key=itemgetter(1))]
+    def swap_candidate_subtrees(self, sentence_1: SentenceCandidate, sentence_2: SentenceCandidate,
+                                subtree_type: str) -> List[str]:
+        original_sentence_1 = self.swap_subtree(list(sentence_1.tokens), sentence_1.get_span(subtree_type),
+                                                sentence_2.get_subtree_tokens(subtree_type))
+        original_sentence_2 = self.swap_subtree(list(sentence_2.tokens), sentence_2.get_span(subtree_type),
+                                                sentence_1.get_subtree_tokens(subtree_type))
 
-    @staticmethod
-    def get_offsets_from_node_ids(node_ids: List[str]) -> Tuple[int, int]:
-        """
-        Returns the smallest and largest index from the list of node ids
-        """
-        ids = [int(x.rpartition('_')[-1]) for x in node_ids]
-        return min(ids), max(ids)
+        return [' '.join(original_sentence_1), ' '.join(original_sentence_2)]
 
     def find_candidates(self, src_graphs: List[DependencyGraphWrapper], tgt_graphs: List[DependencyGraphWrapper],
                         with_progress_bar: bool = False, separate_augmentation: bool = False) \
-            -> Dict[str, List[TranslationGraph]]:
+            -> Dict[str, List[TranslationCandidate]]:
         candidates = {'obj': [], 'nsubj': [], 'both': []}
 
         if with_progress_bar:
@@ -399,14 +465,15 @@ class SubjectObjectAugmentator(AugmentatorBase):
         if separate_augmentation:
             for src_graph, tgt_graph in iterable:
                 if self.is_eligible_for_augmentation(src_graph, tgt_graph, 'obj'):
-                    candidates['obj'].append(TranslationGraph(src_graph, tgt_graph))
+                    candidates['obj'].append(TranslationCandidate.from_graphs(src_graph, tgt_graph, ['obj']))
                 if self.is_eligible_for_augmentation(src_graph, tgt_graph, 'nsubj'):
-                    candidates['nsubj'].append(TranslationGraph(src_graph, tgt_graph))
+                    candidates['nsubj'].append(TranslationCandidate.from_graphs(src_graph, tgt_graph, ['nsubj']))
             return candidates
         else:
             for src_graph, tgt_graph in iterable:
                 if self.is_eligible_for_both_augmentation(src_graph, tgt_graph):
-                    candidates['both'].append(TranslationGraph(src_graph, tgt_graph))
+                    candidates['both'].append(
+                        TranslationCandidate.from_graphs(src_graph, tgt_graph, ['obj', 'nsubj'], with_predicate=True))
             return candidates
 
     def add_augmentable_candidates(self, src_graphs: List[DependencyGraphWrapper],
@@ -466,18 +533,16 @@ class SubjectObjectAugmentator(AugmentatorBase):
 
         dep_src = src_dep_edge.target_node
         dep_tgt = tgt_dep_edge.target_node
-        src_dep_subgraph = src_graph.get_subtree_node_ids(dep_src)
-        tgt_dep_subgraph = tgt_graph.get_subtree_node_ids(dep_tgt)
 
         # Subtree is consecutive
-        if not SubjectObjectAugmentator.is_consecutive_subsequence(src_dep_subgraph):
+        if not src_graph.is_subtree_contiguous(dep_src):
             return False
-        if not SubjectObjectAugmentator.is_consecutive_subsequence(tgt_dep_subgraph):
+        if not tgt_graph.is_subtree_contiguous(dep_tgt):
             return False
 
         if self.filter_for_noun_tags:
-            src_dep_subtree = DependencyGraphWrapper(src_graph.get_subtree(dep_src))
-            tgt_dep_subtree = DependencyGraphWrapper(tgt_graph.get_subtree(dep_tgt))
+            src_dep_subtree = src_graph.get_subtree_view(dep_src)
+            tgt_dep_subtree = tgt_graph.get_subtree_view(dep_tgt)
             # Should contain at least one NOUN property both in tgt and src
             if not (src_dep_subtree.get_nodes_with_property('postag', Postag.NOUN.name)
                     + src_dep_subtree.get_nodes_with_property('postag', Postag.PROPN.name)):
@@ -495,53 +560,16 @@ class SubjectObjectAugmentator(AugmentatorBase):
 
         return True
 
-    @staticmethod
-    def is_consecutive_subsequence(node_ids: List[str]) -> bool:
-        def check(lst):
-            lst = sorted(lst)
-            if lst:
-                return lst == list(range(lst[0], lst[-1] + 1))
-            else:
-                return True
-
+    def dump_augmented_sentences_to_files(self):
         """
-        Params:
-            node_ids (list of Strings): list of node ids
-        Returns:
-            Boolean value whether the words corresponding to nodes
-             are a consecutive subsequence in the original sentence
+        Writes the sentence pairs collected in memory (outside of augment()) to the output files
         """
-        return check([int(x.rpartition('_')[-1]) for x in node_ids])
-
-    def dump_augmented_sentences_to_files(self):
-        log.info(f'Saving augmented sentences at {self._output_path} with output format {self.output_format}')
-        if not os.path.exists(self._output_path):
-            os.mkdir(self._output_path)
-        augmentation_types = self._augmented_sentence_pairs.keys()
-        if self.output_format == 'tsv':
-            for augmentation_type in augmentation_types:
-                with open(f'{self._output_path}/{augmentation_type}.tsv', 'w+') as f:
-                    zipped = zip(self._augmented_sentence_pairs[augmentation_type]['src'],
-                                 self._augmented_sentence_pairs[augmentation_type]['tgt'])
-                    for src_sent, tgt_sent in zipped:
-                        f.write(f'{src_sent}\t{tgt_sent}')
-                        f.write('\n')
-        else:
-            for augmentation_type in augmentation_types:
-                os.mkdir(f'{self._output_path}/{augmentation_type}')
+        with self._get_output_writer(filters=[]) as writer:
+            for augmentation_type, sentences in self._augmented_sentence_pairs.items():
                 if self.save_original:
-                    os.mkdir(f'{self._output_path}/original_{augmentation_type}')
-                for lang in ['src', 'tgt']:
-                    if self.save_original:
-                        with open(f'{self._output_path}/original_{augmentation_type}/{augmentation_type}.{lang}',
-                                  'w+') as original_file:
-                            for sent in self._original_augmentation_sentence_pairs[augmentation_type][lang]:
-                                original_file.write(sent)
-                                original_file.write('\n')
-                    with open(f'{self._output_path}/{augmentation_type}/{augmentation_type}.{lang}', 'w+') as f:
-                        for sent in self._augmented_sentence_pairs[augmentation_type][lang]:
-                            f.write(sent)
-                            f.write('\n')
+                    original_sentences = self._original_augmentation_sentence_pairs[augmentation_type]
+                    writer.add_original(augmentation_type, original_sentences['src'], original_sentences['tgt'])
+                writer.add(augmentation_type, sentences['src'], sentences['tgt'])
 
     def print_augmented_pairs(self, idx: int):
         """
@@ -570,11 +598,10 @@ class SubjectObjectAugmentator(AugmentatorBase):
         norm_x = x / np.sqrt(np.sum(x ** 2))
         return np.exp(norm_x / t) / sum(np.exp(norm_x / t))
 
-    def reconstruct_translation_pair(self, translation_pair: Tuple[TranslationGraph, TranslationGraph]) -> Tuple[
-        List[str], List[str]]:
-        src_sents = [' '.join(self.reconstruct_sentence_from_node_ids(translation_pair[i].src.graph.nodes)[1:]) for i in
-                     range(2)]
-        tgt_sents = [' '.join(self.reconstruct_sentence_from_node_ids(translation_pair[i].tgt.graph.nodes)[1:]) for i in
-                     range(2)]
+    def reconstruct_translation_pair(self, translation_pair: Tuple[TranslationCandidate, TranslationCandidate]) -> \
+            Tuple[List[str], List[str]]:
+        translation_pair = [to_translation_candidate(translation) for translation in translation_pair]
+        src_sents = [' '.join(translation_pair[i].src.tokens) for i in range(2)]
+        tgt_sents = [' '.join(translation_pair[i].tgt.tokens) for i in range(2)]
 
         return src_sents, tgt_sents
@@ -1,6 +1,4 @@
 from abc import ABC, abstractmethod
-from operator import itemgetter
-from typing import List
 
 
 class AugmentatorBase(ABC):
@@ -14,9 +12,3 @@ class AugmentatorBase(ABC):
     @abstractmethod
     def augment(self, *args):
         raise NotImplementedError
-
-    @staticmethod
-    def reconstruct_sentence_from_node_ids(node_ids: List[str]) -> List[str]:
-        splitted_node_ids = [x.rpartition('_') for x in node_ids]
-        splitted_node_ids = [(x[0], int(x[2])) for x in splitted_node_ids]
-        return [y[0] for y in sorted(splitted_node_ids, key=itemgetter(1))]
@@ -1,5 +1,4 @@
 import os
-import re
 from abc import ABC, abstractmethod
 from dataclasses import dataclass
 from math import floor, ceil
@@ -9,10 +8,12 @@ import networkx as nx
 import psutil
 from tqdm import tqdm
 
-from hu_nmt.data_augmentator.utils.data_helpers import get_files_in_folder
+from hu_nmt.data_augmentator.utils.dependency_tree_store import is_binary_shard, get_shard_files, \
+    DependencyTreeShard, write_binary_shard, read_tsv_shard_tree_columns, update_shard_index
 from hu_nmt.data_augmentator.utils.logger import get_logger
 from hu_nmt.data_augmentator.utils.preprocessing import create_mini_batches
 from hu_nmt.data_augmentator.wrapper.dependency_graph_wrapper import DependencyGraphWrapper
+from hu_nmt.data_augmentator.wrapper.dependency_tree import DependencyTree
 
 log = get_logger(__name__)
 
@@ -86,6 +87,16 @@ class NlpPipelineBase(ABC):
     def sentence_to_node_relationship_list(nlp_pipeline, sent: str) -> List[NodeRelationship]:
         raise NotImplementedError
 
+    @staticmethod
+    @abstractmethod
+    def sentences_to_node_relationship_lists(nlp_pipeline, sentences: List[str]) -> List[List[NodeRelationship]]:
+        """
+        Parses the sentences with the batching of the pipeline
+        Returns:
+            node relationship lists in the order of the sentences, empty for the inputs with multiple sentences
+        """
+        raise NotImplementedError
+
     @abstractmethod
     def node_relationship_list_to_dep_parse_tree(self, dep_rel_list: List[NodeRelationship]) -> nx.DiGraph:
         raise NotImplementedError
@@ -106,20 +117,23 @@ class NlpPipelineBase(ABC):
 
     @staticmethod
     def read_parsed_dep_trees_from_files(data_dir: str, per_file: bool = False) -> Generator[nx.DiGraph, None, None]:
-        def atoi(text):
-            return int(text) if text.isdigit() else text
-
-        def natural_keys(text):
-            """
-            alist.sort(key=natural_keys) sorts in human order
-            http://nedbatchelder.com/blog/200712/human_sorting.html
-            (See Toothy's implementation in the comments)
-            """
-            return [atoi(c) for c in re.split(r'(\d+)', text)]
-
-        files_to_read = get_files_in_folder(data_dir)
-        files_to_read.sort(key=natural_keys)
-        for file in files_to_read:
+        """
+        Reads the dependency trees of a folder in natural-sort order of the shards.
+        Binary shards (see dependency_tree_store) and TSV shards are both supported.
+        """
+        for file in get_shard_files(data_dir):
+            if is_binary_shard(file):
+                shard = DependencyTreeShard(f'{data_dir}/{file}')
+                try:
+                    dep_graphs = shard.iter_dep_graphs()
+                    if per_file:
+                        yield list(dep_graphs)
+                    else:
+                        yield from dep_graphs
+                finally:
+                    shard.close()
+                continue
+
             dep_graphs = []
             with open(f'{data_dir}/{file}') as f:
                 graph = nx.DiGraph()
@@ -140,13 +154,37 @@ class NlpPipelineBase(ABC):
                 if per_file:
                     yield dep_graphs
 
+    @staticmethod
+    def read_dependency_trees_from_files(data_dir: str, per_file: bool = False) \
+            -> Generator[DependencyTree, None, None]:
+        """
+        Same as read_parsed_dep_trees_from_files, but yields array-backed DependencyTrees
+        without building networkx graphs.
+        """
+        for file in get_shard_files(data_dir):
+            shard = DependencyTreeShard(f'{data_dir}/{file}') if is_binary_shard(file) else None
+            try:
+                if shard is not None:
+                    tree_columns = shard.iter_tree_columns()
+                else:
+                    tree_columns = read_tsv_shard_tree_columns(f'{data_dir}/{file}')
+                dep_trees = (DependencyTree.from_tree_columns(columns) for columns in tree_columns)
+                if per_file:
+                    yield list(dep_trees)
+                else:
+                    yield from dep_trees
+            finally:
+                if shard is not None:
+                    shard.close()
+
     def get_graph_wrappers_from_files(self, data_folder) -> List[DependencyGraphWrapper]:
         dep_graphs = self.read_parsed_dep_trees_from_files(data_folder)
         return [DependencyGraphWrapper(x) for x in dep_graphs]
 
-    def file_to_serialized_dep_graph_files(self, sentences_path: str, output_dir: str, file_batch_size: int):
+    def file_to_serialized_dep_graph_files(self, sentences_path: str, output_dir: str, file_batch_size: int,
+                                           storage_format: str = 'tsv'):
         sentence_generator = self.get_file_line_generator(sentences_path)
-        self.sentences_to_serialized_dep_graph_files(sentence_generator, output_dir, file_batch_size)
+        self.sentences_to_serialized_dep_graph_files(sentence_generator, output_dir, file_batch_size, storage_format)
 
     @staticmethod
     def get_file_line_generator(file_path: str):
@@ -155,12 +193,13 @@ class NlpPipelineBase(ABC):
                 yield line.strip()
 
     def sentences_to_serialized_dep_graph_files(self, sentences_iter: Iterator[str], output_dir: str,
-                                                file_batch_size: int):
+                                                file_batch_size: int, storage_format: str = 'tsv'):
         """
         Args:
             sentences_iter: iterator for the sentences to process
             output_dir: location of tsv files containing the dep parsed sentences
             file_batch_size: amount of sentences to be parsed into a single file
+            storage_format: 'tsv' or 'binary' (see dependency_tree_store)
         """
 
         batch_of_sentences = []
@@ -212,12 +251,11 @@ class NlpPipelineBase(ABC):
                     for result in list_of_results:
                         list_of_dep_rel_lists.extend(result)
                 else:
-                    process_units = [SentenceProcessUnit(self.nlp_pipeline, sentence)
-                                     for sentence in batch_of_sentences]
-                    list_of_dep_rel_lists = map(self._sentence_process_unit_to_node_relationship_list, process_units)
+                    list_of_dep_rel_lists = self.sentences_to_node_relationship_lists(self.nlp_pipeline,
+                                                                                      batch_of_sentences)
 
                 # dump to file
-                self.write_dep_graphs_to_file(output_dir, file_idx, list_of_dep_rel_lists)
+                self.write_dep_graphs_to_file(output_dir, file_idx, list_of_dep_rel_lists, storage_format)
 
                 pbar.update(len(batch_of_sentences))
 
@@ -225,7 +263,13 @@ class NlpPipelineBase(ABC):
                 batch_of_sentences = []
 
     @staticmethod
-    def write_dep_graphs_to_file(output_dir, file_idx, list_of_dep_rel_lists):
+    def write_dep_graphs_to_file(output_dir, file_idx, list_of_dep_rel_lists, storage_format: str = 'tsv'):
+        if storage_format == 'binary':
+            write_binary_shard(output_dir, file_idx, list_of_dep_rel_lists)
+            return
+        elif storage_format != 'tsv':
+            raise ValueError(f'Storage format must be one of ("tsv", "binary") but found: {storage_format}')
+
         if not os.path.exists(output_dir):
             os.makedirs(output_dir)
         with open(os.path.join(output_dir, f'{file_idx}.tsv'), 'w') as output_file:
@@ -235,3 +279,4 @@ class NlpPipelineBase(ABC):
                                    f'\t{dep_rel.target_deprel}\t{dep_rel.source_key}\t{dep_rel.source_postag}\t{dep_rel.source_lemma}\n'
                     output_file.write(graph_record)
                 output_file.write('\n')
+        update_shard_index(output_dir, {f'{file_idx}.tsv': len(list_of_dep_rel_lists)})
@@ -8,12 +8,17 @@ from spacy.tokens.doc import Doc
 
 from hu_nmt.data_augmentator.base.nlp_pipeline_base import NlpPipelineBase, NodeRelationship, \
     SentenceProcessUnit, SentenceProcessBatch
+from hu_nmt.data_augmentator.utils.length_buckets import parse_in_length_order
 from hu_nmt.data_augmentator.utils.logger import get_logger
 from hu_nmt.data_augmentator.utils.types.postag import Postag
 
 log = get_logger(__name__)
 
 ROOT_KEY = 'root_0'
+# number of sentences spaCy parses together
+PIPE_BATCH_SIZE = 256
+# number of long outlier sentences spaCy parses together
+LONG_PIPE_BATCH_SIZE = 8
 
 
 class SpacyNlpPipeline(NlpPipelineBase):
@@ -38,7 +43,26 @@ class SpacyNlpPipeline(NlpPipelineBase):
 
     @staticmethod
     def sentence_to_node_relationship_list(nlp_pipeline, sent: str) -> List[NodeRelationship]:
-        doc = nlp_pipeline(sent)
+        return SpacyNlpPipeline._doc_to_node_relationship_list(nlp_pipeline(sent))
+
+    @staticmethod
+    def sentences_to_node_relationship_lists(nlp_pipeline, sentences: List[str], batch_size: int = PIPE_BATCH_SIZE,
+                                             n_process: int = 1) -> List[List[NodeRelationship]]:
+        """
+        Args:
+            batch_size, n_process: batching and process count of nlp.pipe
+        """
+        def parse(batch: List[str], pipe_batch_size: int = batch_size) -> List[List[NodeRelationship]]:
+            docs = nlp_pipeline.pipe(batch, batch_size=pipe_batch_size, n_process=n_process)
+            return [SpacyNlpPipeline._doc_to_node_relationship_list(doc) for doc in docs]
+
+        # sentences of similar length are batched together, so the batches are padded less,
+        # and the long outliers are parsed in small batches of their own
+        return parse_in_length_order(sentences, parse,
+                                     parse_long=partial(parse, pipe_batch_size=min(batch_size, LONG_PIPE_BATCH_SIZE)))
+
+    @staticmethod
+    def _doc_to_node_relationship_list(doc: Doc) -> List[NodeRelationship]:
         sents = [s for s in doc.sents]
         if str(sents[-1]) == '\n':
             del sents[-1]
@@ -94,5 +118,4 @@ class SpacyNlpPipeline(NlpPipelineBase):
     def _sentence_process_batch_to_node_relationship_list(process_batch: SentenceProcessBatch) \
             -> List[List[NodeRelationship]]:
         pipeline = process_batch.pipeline_constructor()
-        return [SpacyNlpPipeline.sentence_to_node_relationship_list(pipeline, sentence)
-                for sentence in process_batch.sentences]
+        return SpacyNlpPipeline.sentences_to_node_relationship_lists(pipeline, process_batch.sentences)
@@ -9,6 +9,7 @@ from stanza.pipeline.core import DownloadMethod
 
 from hu_nmt.data_augmentator.base.nlp_pipeline_base import NlpPipelineBase, NodeRelationship, \
     SentenceProcessUnit, SentenceProcessBatch
+from hu_nmt.data_augmentator.utils.length_buckets import parse_in_length_order
 from hu_nmt.data_augmentator.utils.logger import get_logger
 from hu_nmt.data_augmentator.utils.types.postag import Postag
 
@@ -32,7 +33,20 @@ class StanzaNlpPipeline(NlpPipelineBase):
 
     @staticmethod
     def sentence_to_node_relationship_list(nlp_pipeline, sent: str) -> List[NodeRelationship]:
-        doc = nlp_pipeline(sent)
+        return StanzaNlpPipeline._doc_to_node_relationship_list(nlp_pipeline(sent))
+
+    @staticmethod
+    def sentences_to_node_relationship_lists(nlp_pipeline, sentences: List[str]) -> List[List[NodeRelationship]]:
+        def parse(batch: List[str]) -> List[List[NodeRelationship]]:
+            # a list of documents is processed together, in the batches of the processors
+            docs = nlp_pipeline([stanza.Document([], text=sentence) for sentence in batch])
+            return [StanzaNlpPipeline._doc_to_node_relationship_list(doc) for doc in docs]
+
+        # sentences of similar length are batched together, so the batches are padded less
+        return parse_in_length_order(sentences, parse)
+
+    @staticmethod
+    def _doc_to_node_relationship_list(doc) -> List[NodeRelationship]:
         # We most likely will only pass single sentences.
         if len(doc.sentences) != 1:
             log.debug(f'Sample has multiple sentences: {[s.text for s in doc.sentences]}')
@@ -92,5 +106,4 @@ class StanzaNlpPipeline(NlpPipelineBase):
         log.info('Creating pipeline in process')
         pipeline = process_batch.pipeline_constructor()
         log.info('Processing sentences in process')
-        return [StanzaNlpPipeline.sentence_to_node_relationship_list(pipeline, sentence)
-                for sentence in process_batch.sentences]
+        return StanzaNlpPipeline.sentences_to_node_relationship_lists(pipeline, process_batch.sentences)
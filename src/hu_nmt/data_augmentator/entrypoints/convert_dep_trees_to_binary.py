@@ -0,0 +1,19 @@
+import click
+
+from hu_nmt.data_augmentator.utils.dependency_tree_store import convert_tsv_shards_to_binary
+from hu_nmt.data_augmentator.utils.logger import get_logger
+
+log = get_logger(__name__)
+
+
+@click.command()
+@click.argument('tsv_dep_tree_folder')
+@click.argument('binary_dep_tree_folder')
+@click.option('--remove_tsv', is_flag=True, default=False, help='Delete each TSV shard after converting it')
+def main(tsv_dep_tree_folder, binary_dep_tree_folder, remove_tsv):
+    tree_cnt = convert_tsv_shards_to_binary(tsv_dep_tree_folder, binary_dep_tree_folder, remove_tsv)
+    log.info(f'Converted {tree_cnt} dependency trees to {binary_dep_tree_folder}')
+
+
+if __name__ == '__main__':
+    main()
@@ -13,10 +13,12 @@ log = get_logger(__name__)
 @click.argument('src_input_path')
 @click.argument('dep_tree_output_path')
 @click.argument('file_batch_size')
-def main(src_lang_code, src_input_path, dep_tree_output_path, file_batch_size):
+@click.option('--storage_format', default='tsv', type=click.Choice(['tsv', 'binary']),
+              help='On-disk format of the dependency trees')
+def main(src_lang_code, src_input_path, dep_tree_output_path, file_batch_size, storage_format):
     src_dep_parser = NlpPipelineFactory.get_dependency_parser(src_lang_code)
     src_sentence_generator: Iterator = src_dep_parser.get_file_line_generator(src_input_path)
-    src_dep_parser.sentences_to_serialized_dep_graph_files(src_sentence_generator, os.path.join(dep_tree_output_path, src_lang_code), int(file_batch_size))
+    src_dep_parser.sentences_to_serialized_dep_graph_files(src_sentence_generator, os.path.join(dep_tree_output_path, src_lang_code), int(file_batch_size), storage_format)
 
 
 if __name__ == '__main__':
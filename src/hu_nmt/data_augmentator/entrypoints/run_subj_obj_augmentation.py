@@ -5,8 +5,8 @@ from hu_nmt.data_augmentator.augmentators.graph_based_augmentator import GraphBa
 from hu_nmt.data_augmentator.augmentators.subject_object_augmentator import SubjectObjectAugmentator
 from hu_nmt.data_augmentator.base.nlp_pipeline_base import NlpPipelineBase
 from hu_nmt.data_augmentator.filters.bleu_filter import BleuFilter
+from hu_nmt.data_augmentator.utils.dependency_tree_store import DependencyTreeStore
 from hu_nmt.data_augmentator.utils.logger import get_logger
-from hu_nmt.data_augmentator.wrapper.dependency_graph_wrapper import DependencyGraphWrapper
 
 log = get_logger(__name__)
 
@@ -19,7 +19,7 @@ log = get_logger(__name__)
 @click.argument('augmentation_output_path')
 @click.argument('augmented_data_ratio', default=0.5)
 @click.argument('augmented_data_size', default=None)
-@click.argument('random_seed')
+@click.argument('random_seed', type=int)
 # used by filtering
 @click.option('--use_filters', is_flag=True, default=False, help='Use filters after the augmentation')
 @click.option('--filter_quantile', default=0.0,
@@ -28,6 +28,8 @@ log = get_logger(__name__)
 @click.option('--tgt_model_path', default='', help='Path to model to translate the target sentences with')
 @click.option('--sp_model_path', default='', help='Sentencepiece model path')
 @click.option('--filter_batch_size', default=512, help='Batch size for the translations in the filter.')
+@click.option('--filter_chunk_size', default=100000,
+              help='Number of augmented sentence pairs per method that are filtered at once before writing.')
 # --------
 @click.option('--output_format', default='basic', help='Supported output formats: basic (default), tsv')
 @click.option('--save_original/--dont_save_original', default=False)
@@ -37,17 +39,35 @@ log = get_logger(__name__)
 @click.option('--filter_for_noun_tags', default=False)
 @click.option('--augmentation_type', default='base', type=click.Choice(['base', 'ged', 'edge_mapper']))
 @click.option('--similarity_threshold', default=0.5)
+@click.option('--ged_backend', default='networkx', type=click.Choice(['networkx', 'tree']),
+              help='Graph edit distance (networkx) or polynomial tree edit distance (tree) for ged augmentation, '
+                   'the backends give different similarities, so thresholds do not carry over between them')
+@click.option('--similarity_cutoff/--exact_similarity', default=True,
+              help='Stop scoring a pair as soon as it is proven to be below the similarity threshold')
+@click.option('--similarity_cache_size', default=100000,
+              help='Number of subtree signature pairs whose similarity is cached, 0 disables the cache')
+@click.option('--similarity_cache_path', default=None,
+              help='File to load the similarity cache from and save it to, so it is shared across runs')
+@click.option('--similarity_pair_timeout', default=10.0,
+              help='Time budget in seconds for scoring a subtree pair, pairs over it are scored by the fallback')
+@click.option('--similarity_time_budget', default=None, type=float,
+              help='Total wall-clock budget in seconds for similarity scoring, pairs get a fair share of the rest')
+@click.option('--similarity_fallback', default='edge_mapper', type=click.Choice(['edge_mapper', 'label_histogram', 'none']),
+              help='Cheaper similarity of the pairs that run out of their time, none gives them a similarity of 0')
+@click.option('--num_workers', default=1, help='Number of processes used for similarity scoring and subtree swapping')
 def main(src_language, tgt_language, src_data_folder, tgt_data_folder, augmentation_output_path,
          augmented_data_ratio, augmented_data_size, random_seed, use_filters, filter_quantile, src_model_path,
-         tgt_model_path, sp_model_path, filter_batch_size, output_format, save_original, separate_augmentation,
-         filter_same_ancestor, filter_same_pos_tag, filter_for_noun_tags, augmentation_type, similarity_threshold):
+         tgt_model_path, sp_model_path, filter_batch_size, filter_chunk_size, output_format, save_original, separate_augmentation,
+         filter_same_ancestor, filter_same_pos_tag, filter_for_noun_tags, augmentation_type, similarity_threshold, num_workers,
+         ged_backend, similarity_cutoff, similarity_cache_size, similarity_cache_path, similarity_pair_timeout,
+         similarity_time_budget, similarity_fallback):
 
     if not separate_augmentation and augmentation_type != 'base':
         raise ValueError('Graph based augmentation only works with separate augmentation!')
 
-    src_dep_tree_generator = NlpPipelineBase.read_parsed_dep_trees_from_files(src_data_folder, per_file=True)
+    src_dep_tree_generator = NlpPipelineBase.read_dependency_trees_from_files(src_data_folder, per_file=True)
     # log.info(f'Number of source sentences used for augmentation: {len(eng_wrappers)}')
-    tgt_dep_tree_generator = NlpPipelineBase.read_parsed_dep_trees_from_files(tgt_data_folder, per_file=True)
+    tgt_dep_tree_generator = NlpPipelineBase.read_dependency_trees_from_files(tgt_data_folder, per_file=True)
     # log.info(f'Number of target sentences used for augmentation: {len(eng_wrappers)}')
 
     filters = []
@@ -56,6 +76,12 @@ def main(src_language, tgt_language, src_data_folder, tgt_data_folder, augmentat
             BleuFilter(filter_quantile, src_model_path, tgt_model_path, sp_model_path, tgt_language, filter_batch_size))
 
     if augmentation_type == 'ged' or augmentation_type == 'edge_mapper':
+        expected_sentence_count = None
+        if similarity_time_budget is not None:
+            # the time budget is shared among the shards by their number of sentences
+            tree_store = DependencyTreeStore(src_data_folder)
+            expected_sentence_count = len(tree_store)
+            tree_store.close()
         augmentator = GraphBasedAugmentator(src_language, tgt_language, similarity_threshold, None, None,
                                             augmented_data_ratio, augmented_data_size=augmented_data_size, random_seed=random_seed,
                                             filters=filters, output_path=augmentation_output_path,
@@ -64,7 +90,17 @@ def main(src_language, tgt_language, src_data_folder, tgt_data_folder, augmentat
                                             similarity_type=augmentation_type,
                                             filter_nsub_and_obj_have_same_ancestor=filter_same_ancestor,
                                             filter_same_pos_tag=filter_same_pos_tag,
-                                            filter_for_noun_tags=filter_for_noun_tags)
+                                            filter_for_noun_tags=filter_for_noun_tags,
+                                            filter_chunk_size=filter_chunk_size,
+                                            num_workers=num_workers,
+                                            ged_backend=ged_backend,
+                                            use_similarity_cutoff=similarity_cutoff,
+                                            similarity_cache_size=similarity_cache_size,
+                                            similarity_cache_path=similarity_cache_path,
+                                            similarity_pair_timeout=similarity_pair_timeout,
+                                            similarity_time_budget=similarity_time_budget,
+                                            similarity_fallback=None if similarity_fallback == 'none' else similarity_fallback,
+                                            expected_sentence_count=expected_sentence_count)
     elif augmentation_type == 'base':
         augmentator = SubjectObjectAugmentator(None, None, augmented_data_ratio, augmented_data_size=augmented_data_size,
                                                random_seed=random_seed, filters=filters, output_path=augmentation_output_path,
@@ -72,7 +108,9 @@ def main(src_language, tgt_language, src_data_folder, tgt_data_folder, augmentat
                                                separate_augmentation=separate_augmentation,
                                                filter_nsub_and_obj_have_same_ancestor=filter_same_ancestor,
                                                filter_same_pos_tag=filter_same_pos_tag,
-                                               filter_for_noun_tags=filter_for_noun_tags)
+                                               filter_for_noun_tags=filter_for_noun_tags,
+                                               filter_chunk_size=filter_chunk_size,
+                                               num_workers=num_workers)
     else:
         raise ValueError(
             f'Augmentation type must be one of ("ged", "edge_mapper", "base") but found: {augmentation_type}')
@@ -80,14 +118,11 @@ def main(src_language, tgt_language, src_data_folder, tgt_data_folder, augmentat
     graph_cnt = 0
     with tqdm() as pbar:
         for src_dep_tree_batch, tgt_dep_tree_batch in zip(src_dep_tree_generator, tgt_dep_tree_generator):
-            src_wrapper_batch = [DependencyGraphWrapper(tree) for tree in src_dep_tree_batch]
-            tgt_wrapper_batch = [DependencyGraphWrapper(tree) for tree in tgt_dep_tree_batch]
+            graph_cnt += len(src_dep_tree_batch)
 
-            graph_cnt += len(src_wrapper_batch)
+            augmentator.add_augmentable_candidates(src_dep_tree_batch, tgt_dep_tree_batch)
 
-            augmentator.add_augmentable_candidates(src_wrapper_batch, tgt_wrapper_batch)
-
-            pbar.update(len(src_wrapper_batch))
+            pbar.update(len(src_dep_tree_batch))
 
     log.info(f'Have parsed {graph_cnt} sentence graphs')
 
@@ -1,10 +1,11 @@
-from collections import defaultdict, Counter
-from typing import List
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
 
 import networkx as nx
-import nltk
+import numpy as np
 
-from hu_nmt.data_augmentator.graph_mappers.graph_similarity_base import GraphSimilarityBase, Edge, Node
+from hu_nmt.data_augmentator.graph_mappers.graph_similarity_base import GraphSimilarityBase, Edge, Node, \
+    get_main_dep
 from hu_nmt.data_augmentator.wrapper.dependency_graph_wrapper import DependencyGraphWrapper
 
 """
@@ -16,7 +17,10 @@ as the intersection.
 
 class EdgeMapper(GraphSimilarityBase):
     def __init__(self):
-        self.dep_weights = defaultdict(lambda: 1)
+        # a plain dict with a default weight instead of a defaultdict with a lambda,
+        # so the mapper can be pickled to the scoring worker processes
+        self.default_dep_weight = 1
+        self.dep_weights = {}
 
         # important dependency relations
         self.dep_weights['nmod'] = 2
@@ -25,55 +29,76 @@ class EdgeMapper(GraphSimilarityBase):
         self.dep_weights['amod'] = 2
         self.dep_weights['advmod'] = 2
 
-    def map_edges(self, g1: DependencyGraphWrapper, g2: DependencyGraphWrapper):
+    def preprocess_graph(self, graph: DependencyGraphWrapper) -> 'EdgeMapperTree':
+        edges = list(sorted(graph.graph.edges(data=True), key=lambda x: -self._get_weight(x[2])))
+        return EdgeMapperTree(edges)
+
+    def map_edges(self, g1: DependencyGraphWrapper, g2: DependencyGraphWrapper,
+                  tree1: Optional['EdgeMapperTree'] = None, tree2: Optional['EdgeMapperTree'] = None):
         """
         maps the edges of g1 to the most similar edge in g2 based on
         edge label, node label, root-edge route, children
+        The graphs are not modified, only the main dependency relations of the edges are compared.
+        Args:
+            tree1, tree2: preprocessed g1 and g2
         """
-        g1 = DependencyGraphWrapper(self.add_weight(g1.graph))
-        g2 = DependencyGraphWrapper(self.add_weight(g2.graph))
+        tree1 = tree1 if tree1 is not None else self.preprocess_graph(g1)
+        tree2 = tree2 if tree2 is not None else self.preprocess_graph(g2)
         mapping = {}
 
-        g1_edges = list(sorted(g1.graph.edges(data=True), key=lambda x: -x[2]['weight']))
-        g2_edges = list(sorted(g2.graph.edges(data=True), key=lambda x: -x[2]['weight']))
+        # unmapped edges of g2 grouped by dependency label, in weight order
+        g2_edges_by_dep: Dict[str, Dict[Tuple[Node, Node], Edge]] = {
+            dep: {(edge[0], edge[1]): edge for edge in edges} for dep, edges in tree2.edges_by_dep.items()}
 
-        for i, (s1, d1, data1) in enumerate(g1_edges):
+        for (s1, d1, data1), dep1 in zip(tree1.edges, tree1.main_deps):
             # edges with the same dependency label
-            cands = list(filter(lambda x: x[2]['dep'] == data1['dep'], g2_edges))
+            unmapped_edges = g2_edges_by_dep.get(dep1, {})
+            cands = list(unmapped_edges.values())
             if len(cands) == 1:
                 # map the only candidate's source and target node
-                mapping[(s1, d1)] = (cands[0][0], cands[0][1])
-                g2_edges.remove(cands[0])
+                mapped = cands[0]
             elif len(cands) > 1:
                 # edges with the most similar node labels
                 max_cands = self._get_cands_by_node_labels((s1, d1, data1), cands, g1.graph, g2.graph)
                 if len(max_cands) == 1:
-                    mapping[(s1, d1)] = (max_cands[0][0], max_cands[0][1])
-                    g2_edges.remove(max_cands[0])
+                    mapped = max_cands[0]
                 else:
                     # edges with the most similar root-edge routes
-                    min_routes = self._get_cands_by_route((s1, d1, data1), max_cands, g1, g2)
+                    min_routes = self._get_cands_by_route((s1, d1, data1), max_cands, g1, g2,
+                                                          tree1.get_routes(g1), tree2.get_routes(g2))
                     if len(min_routes) == 1:
-                        mapping[(s1, d1)] = (min_routes[0][0], min_routes[0][1])
-                        g2_edges.remove(min_routes[0])
+                        mapped = min_routes[0]
                     else:
                         # edges with the most similar children (source's and target's children)
                         max_children = self._get_cands_by_children((s1, d1, data1), min_routes, g1.graph, g2.graph)
-                        mapping[(s1, d1)] = (max_children[0][0], max_children[0][1])
-                        g2_edges.remove(max_children[0])
+                        mapped = max_children[0]
+            else:
+                continue
+            mapping[(s1, d1)] = (mapped[0], mapped[1])
+            del unmapped_edges[(mapped[0], mapped[1])]
         return mapping
 
+    def _get_weight(self, data: Dict) -> int:
+        # weights are looked up with the full dependency relation
+        return self.dep_weights.get(data['dep'], self.default_dep_weight)
+
     def add_weight(self, graph: nx.DiGraph) -> nx.DiGraph:
+        """
+        Returns a copy of graph with weighted edges and only the main dependency relations
+        """
+        weighted = self.adjust_deps(graph)
         for (n1, n2, data) in graph.edges(data=True):
-            w = self.dep_weights[data['dep']]
-            graph.add_weighted_edges_from([(n1, n2, w)])
-        return self.adjust_deps(graph)
+            weighted.edges[n1, n2]['weight'] = self._get_weight(data)
+        return weighted
 
     def adjust_deps(self, graph: nx.DiGraph) -> nx.DiGraph:
-        for (n1, n2, data) in graph.edges(data=True):
-            # use only the main dependency type
-            data['dep'] = data['dep'].split(':')[0].lower()
-        return graph
+        """
+        Returns a copy of graph with only the main dependency relations
+        """
+        adjusted = nx.DiGraph(graph)
+        for (n1, n2, data) in adjusted.edges(data=True):
+            data['dep'] = get_main_dep(data['dep'])
+        return adjusted
 
     def _get_cands_by_node_labels(self, edge: Edge, cands: List[Edge], g1: nx.DiGraph, g2: nx.DiGraph):
         """Returns edges with the most similar node labels"""
@@ -96,34 +121,58 @@ class EdgeMapper(GraphSimilarityBase):
         return max_edges
 
     def _get_cands_by_route(self, edge: Edge, cands: List[Edge], g1: DependencyGraphWrapper,
-                            g2: DependencyGraphWrapper) -> List[Edge]:
+                            g2: DependencyGraphWrapper, routes1: Optional[Dict[Node, List[str]]] = None,
+                            routes2: Optional[Dict[Node, List[str]]] = None) -> List[Edge]:
         """most similar root-edge route based on the Levenshtein-distance"""
         (s1, d1, data1) = edge
-        node_route1 = nx.shortest_path(g1.graph, g1.get_root(), s1)
-        edge_route1 = self._get_edge_route_from_nodes(g1.graph, node_route1)
+        routes1 = routes1 if routes1 is not None else self._get_edge_routes(g1)
+        routes2 = routes2 if routes2 is not None else self._get_edge_routes(g2)
 
-        min_dist = float('inf')
-        min_edges = []
+        dists = self._get_edit_distances(routes1[s1], [routes2[s2] for (s2, d2, data2) in cands])
 
         # find edges with minimal distance
-        for (s2, d2, data2) in cands:
-            node_route2 = nx.shortest_path(g2.graph, g2.get_root(), s2)
-            edge_route2 = self._get_edge_route_from_nodes(g2.graph, node_route2)
-
-            dist = nltk.edit_distance(edge_route1, edge_route2)
-
-            if dist == min_dist:
-                min_edges.append((s2, d2, data2))
-            elif dist < min_dist:
-                min_dist = dist
-                min_edges = [(s2, d2, data2)]
-        return min_edges
+        min_dist = dists.min()
+        return [cand for cand, dist in zip(cands, dists) if dist == min_dist]
+
+    @staticmethod
+    def _get_edge_routes(g: DependencyGraphWrapper) -> Dict[Node, List[str]]:
+        """Dependency labels on the route from the root to every node, with one breadth-first search"""
+        root = g.get_root()
+        routes = {root: []}
+        for parent, child in nx.bfs_edges(g.graph, root):
+            routes[child] = routes[parent] + [get_main_dep(g.graph.edges[parent, child]['dep'])]
+        return routes
+
+    @staticmethod
+    def _get_edit_distances(route: List[str], other_routes: List[List[str]]) -> np.ndarray:
+        """
+        Levenshtein distances of route and every route of other_routes, computed for all of them at once
+        """
+        labels = {}
+        encoded_route = np.array([labels.setdefault(dep, len(labels)) for dep in route], dtype=np.int64)
+        lengths = np.array([len(other_route) for other_route in other_routes], dtype=np.int64)
+        # other routes padded with a label that is not in route
+        encoded_others = np.full((len(other_routes), lengths.max(initial=0)), -1, dtype=np.int64)
+        for idx, other_route in enumerate(other_routes):
+            encoded_others[idx, :len(other_route)] = [labels.get(dep, -1) for dep in other_route]
+
+        positions = np.arange(encoded_others.shape[1] + 1)
+        # distances of the empty prefix of route and the prefixes of the other routes
+        row = np.tile(positions, (len(other_routes), 1))
+        for i, label in enumerate(encoded_route, 1):
+            substitution = row[:, :-1] + (encoded_others != label)
+            deletion = row[:, 1:] + 1
+            candidates = np.concatenate([np.full((len(other_routes), 1), i), np.minimum(substitution, deletion)],
+                                        axis=1)
+            # insertions: row[j] = min over k <= j of candidates[k] + (j - k)
+            row = np.minimum.accumulate(candidates - positions, axis=1) + positions
+        return row[np.arange(len(other_routes)), lengths]
 
     def _get_edge_route_from_nodes(self, graph: nx.DiGraph, nodes: List[Node]):
         edge_route = []
 
         for i in range(len(nodes) - 1):
-            dep = graph.edges[nodes[i], nodes[i + 1]]['dep']
+            dep = get_main_dep(graph.edges[nodes[i], nodes[i + 1]]['dep'])
             edge_route.append(dep)
 
         return edge_route
@@ -145,14 +194,14 @@ class EdgeMapper(GraphSimilarityBase):
     def _get_edges_with_max_children(self, n1: Node, node_type: str, cands: List[Edge], g1: nx.DiGraph,
                                      g2: nx.DiGraph) -> List[Edge]:
         """Returns edges with most similar children of n1"""
-        children1 = [e[2]['dep'] for e in g1.out_edges(n1, data=True)]
+        children1 = [get_main_dep(e[2]['dep']) for e in g1.out_edges(n1, data=True)]
         counter1 = Counter(children1)
         max_edges = []
         max_children = 0
 
         for (s2, t2, data2) in cands:
             n2 = s2 if node_type == 'source' else t2
-            children2 = [e[2]['dep'] for e in g2.out_edges(n2, data=True)]
+            children2 = [get_main_dep(e[2]['dep']) for e in g2.out_edges(n2, data=True)]
             counter2 = Counter(children2)
 
             intersection = counter1 & counter2
@@ -178,5 +227,61 @@ class EdgeMapper(GraphSimilarityBase):
         mapping = self.map_edges(g1, g2)
         return self.get_jaccard_index_from_mapping(g1.graph, g2.graph, mapping)
 
-    def get_similarity_from_graphs(self, g1: DependencyGraphWrapper, g2: DependencyGraphWrapper):
-        return self.get_jaccard_index(g1, g2)
+    @staticmethod
+    def _get_jaccard_index_of_label_counts(labels1: Counter, labels2: Counter) -> float:
+        edges1 = sum(labels1.values())
+        edges2 = sum(labels2.values())
+        if edges1 == 0 and edges2 == 0:
+            return 1
+        intersect = sum((labels1 & labels2).values())
+        return intersect / (edges1 + edges2 - intersect)
+
+    @staticmethod
+    def get_jaccard_index_upper_bound(g1: DependencyGraphWrapper, g2: DependencyGraphWrapper) -> float:
+        """
+        Edges are only mapped to edges with the same main dependency label,
+        so the mapping is at most as large as the intersection of the label multisets
+        """
+        labels1 = Counter(get_main_dep(data['dep']) for _, _, data in g1.graph.edges(data=True))
+        labels2 = Counter(get_main_dep(data['dep']) for _, _, data in g2.graph.edges(data=True))
+        return EdgeMapper._get_jaccard_index_of_label_counts(labels1, labels2)
+
+    def get_similarity_upper_bound(self, g1: DependencyGraphWrapper, g2: DependencyGraphWrapper) -> float:
+        return self.get_jaccard_index_upper_bound(g1, g2)
+
+    def get_similarity_from_preprocessed(self, g1: DependencyGraphWrapper, g2: DependencyGraphWrapper,
+                                         tree1: 'EdgeMapperTree', tree2: 'EdgeMapperTree',
+                                         cutoff: Optional[float] = None) -> float:
+        if cutoff is not None:
+            upper_bound = self._get_jaccard_index_of_label_counts(tree1.dep_counts, tree2.dep_counts)
+            if upper_bound < cutoff:
+                return upper_bound
+        mapping = self.map_edges(g1, g2, tree1, tree2)
+        return self.get_jaccard_index_from_mapping(g1.graph, g2.graph, mapping)
+
+    def get_similarity_from_graphs(self, g1: DependencyGraphWrapper, g2: DependencyGraphWrapper,
+                                   cutoff: Optional[float] = None):
+        return self.get_similarity_from_preprocessed(g1, g2, self.preprocess_graph(g1), self.preprocess_graph(g2),
+                                                     cutoff=cutoff)
+
+
+class EdgeMapperTree:
+    """
+    Edges of a tree in mapping order with their main dependency relations,
+    the root-edge routes are only computed when a mapping needs them
+    """
+    __slots__ = ['edges', 'main_deps', 'edges_by_dep', 'dep_counts', '_routes']
+
+    def __init__(self, edges: List[Edge]):
+        self.edges = edges
+        self.main_deps = [get_main_dep(data['dep']) for _, _, data in edges]
+        self.edges_by_dep: Dict[str, List[Edge]] = {}
+        for edge, dep in zip(edges, self.main_deps):
+            self.edges_by_dep.setdefault(dep, []).append(edge)
+        self.dep_counts = Counter(self.main_deps)
+        self._routes: Optional[Dict[Node, List[str]]] = None
+
+    def get_routes(self, graph: DependencyGraphWrapper) -> Dict[Node, List[str]]:
+        if self._routes is None:
+            self._routes = EdgeMapper._get_edge_routes(graph)
+        return self._routes
@@ -1,8 +1,12 @@
-from typing import Dict
+import time
+from collections import defaultdict
+from typing import Dict, Optional, Callable, Iterable, Tuple, List
 
 from networkx import graph_edit_distance
 
-from hu_nmt.data_augmentator.graph_mappers.graph_similarity_base import GraphSimilarityBase
+from hu_nmt.data_augmentator.graph_mappers.graph_similarity_base import GraphSimilarityBase, get_main_dep, \
+    SimilarityTimeoutError
+from hu_nmt.data_augmentator.graph_mappers.tree_edit_distance import tree_edit_distance
 from hu_nmt.data_augmentator.wrapper.dependency_graph_wrapper import DependencyGraphWrapper
 
 """
@@ -11,15 +15,35 @@ represent a similarity between 0 and 1:
 sim = ( d_max - ged(g1, g2) ) / d_max
 d_max: the maximum distance (deletes the source graph
 and add the target graph)
+
+Backends:
+    networkx: general graph edit distance, exponential and capped by timeout
+    tree: Zhang-Shasha tree edit distance of the dependency subtrees ordered by token position,
+          polynomial, where a node is edited together with its incoming edge
+
+The backends compute different distances, the tree backend is not an exact version of the networkx one:
+Zhang-Shasha respects the order of the children, and deleting an internal node re-attaches its children
+to its parent for free. The backends produce different similarities, so thresholds tuned for one backend
+do not carry over to the other.
 """
 
+BACKENDS = ['networkx', 'tree']
+# seconds networkx searches for the edit distance of a pair before returning the best one found
+DEFAULT_GED_TIMEOUT = 5
+# tolerance of comparing distances with the distance budget of a cutoff
+_EPSILON = 1e-9
+
 
 class GED(GraphSimilarityBase):
     _src_dep_parser = None
     _tgt_dep_parser = None
 
-    def __init__(self, node_cost=1, edge_cost=1, node_subt=2, edge_subt=2, timeout=5):
+    def __init__(self, node_cost=1, edge_cost=1, node_subt=2, edge_subt=2, timeout=DEFAULT_GED_TIMEOUT,
+                 backend='networkx'):
+        if backend not in BACKENDS:
+            raise ValueError(f'GED backend must be one of {BACKENDS} but found: {backend}')
 
+        self.backend = backend
         self.timeout = timeout
         self.node_subt = node_subt
         self.edge_subt = edge_subt
@@ -30,7 +54,7 @@ class GED(GraphSimilarityBase):
         return n1['postag'] == n2['postag']
 
     def _edge_match(self, e1: Dict[str, str], e2: Dict[str, str]):
-        return e1['dep'].split(':')[0].lower() == e2['dep'].split(':')[0].lower()
+        return get_main_dep(e1['dep']) == get_main_dep(e2['dep'])
 
     def _node_del_or_add(self, n: Dict[str, str]):
         if n['postag'] == 'PUNCT':
@@ -56,25 +80,193 @@ class GED(GraphSimilarityBase):
         else:
             return self.edge_subt
 
-    def get_ged(self, graph1: DependencyGraphWrapper, graph2: DependencyGraphWrapper):
-        return graph_edit_distance(graph1.graph, graph2.graph, self._node_match, self._edge_match,
-                                   node_subst_cost=self._node_subst_cost, node_del_cost=self._node_del_or_add,
-                                   node_ins_cost=self._node_del_or_add, edge_subst_cost=self._edge_subs_cost,
+    def _get_node_costs(self, graph1: DependencyGraphWrapper, root_postag: Optional[str]) \
+            -> Tuple[Callable, Callable, Callable]:
+        """
+        Node substitution, deletion and insertion costs that read the postag of the root of graph1 as root_postag,
+        without writing it to the graph
+        Returns:
+            node_subst_cost, node_del_cost, node_ins_cost
+        """
+        if root_postag is None:
+            return self._node_subst_cost, self._node_del_or_add, self._node_del_or_add
+        # the attribute dicts of the nodes are passed to the cost functions, the root is recognized by identity
+        root_data = graph1.graph.nodes[graph1.get_root()]
+
+        def relabel(n: Dict[str, str]) -> Dict[str, str]:
+            return {**n, 'postag': root_postag} if n is root_data else n
+
+        return (lambda n1, n2: self._node_subst_cost(relabel(n1), n2)), \
+               (lambda n: self._node_del_or_add(relabel(n))), self._node_del_or_add
+
+    def get_ged(self, graph1: DependencyGraphWrapper, graph2: DependencyGraphWrapper,
+                upper_bound: Optional[float] = None, root_postag: Optional[str] = None) -> Optional[float]:
+        """
+        Args:
+            root_postag: postag of the root of graph1 to use instead of its own
+        Returns:
+            The edit distance, or None if it is larger than upper_bound
+        Raises:
+            SimilarityTimeoutError: if the networkx timeout stopped the search before any edit path was found
+        """
+        if self.backend == 'tree':
+            return self.get_tree_edit_distance(graph1, graph2, upper_bound, root_postag)
+        node_subst_cost, node_del_cost, node_ins_cost = self._get_node_costs(graph1, root_postag)
+        start = time.monotonic()
+        dist = graph_edit_distance(graph1.graph, graph2.graph, self._node_match, self._edge_match,
+                                   node_subst_cost=node_subst_cost, node_del_cost=node_del_cost,
+                                   node_ins_cost=node_ins_cost, edge_subst_cost=self._edge_subs_cost,
                                    edge_del_cost=self._edge_del_or_add, edge_ins_cost=self._edge_del_or_add,
-                                   roots=(graph1.get_root(), graph2.get_root()), upper_bound=None,
+                                   roots=(graph1.get_root(), graph2.get_root()), upper_bound=upper_bound,
                                    timeout=self.timeout)
+        # networkx returns None both if the distance is over upper_bound and if its timeout pruned the search
+        if dist is None and self.timeout is not None and time.monotonic() - start >= self.timeout:
+            raise SimilarityTimeoutError(f'No edit path was found within the GED timeout of {self.timeout}s')
+        return dist
+
+    def get_tree_edit_distance(self, graph1: DependencyGraphWrapper, graph2: DependencyGraphWrapper,
+                               upper_bound: Optional[float] = None, root_postag: Optional[str] = None) \
+            -> Optional[float]:
+        node_subst_cost, node_del_cost, node_ins_cost = self._get_node_costs(graph1, root_postag)
+        return tree_edit_distance(graph1.graph, graph1.get_root(), graph2.graph, graph2.get_root(),
+                                  node_subst_cost=node_subst_cost, node_del_cost=node_del_cost,
+                                  node_ins_cost=node_ins_cost, edge_subst_cost=self._edge_subs_cost,
+                                  edge_del_cost=self._edge_del_or_add, edge_ins_cost=self._edge_del_or_add,
+                                  order_children1=self.order_children_by_position(graph1),
+                                  order_children2=self.order_children_by_position(graph2),
+                                  upper_bound=upper_bound)
+
+    @staticmethod
+    def _get_label_costs(items: Iterable[Dict], get_label: Callable, get_cost: Callable) -> Dict[str, List[float]]:
+        """
+        Returns:
+            label --> costs of the items with the label in increasing order
+        """
+        costs = defaultdict(list)
+        for item in items:
+            costs[get_label(item)].append(get_cost(item))
+        return {label: sorted(label_costs) for label, label_costs in costs.items()}
+
+    @staticmethod
+    def _label_assignment_lower_bound(costs1: Dict[str, List[float]], costs2: Dict[str, List[float]]) -> float:
+        """
+        Lower bound of the cost of assigning the labeled items of two graphs to each other,
+        where items with the same label are matched for free and the surplus items of every label
+        are deleted, inserted or substituted (sharing the cost of the substitution between two items)
+        Args:
+            costs1, costs2: the item costs of the graphs by label, see _get_label_costs
+        """
+        bound = 0
+        for label in set(costs1) | set(costs2):
+            label_costs1, label_costs2 = costs1.get(label, []), costs2.get(label, [])
+            surplus_costs = label_costs1 if len(label_costs1) > len(label_costs2) else label_costs2
+            bound += sum(surplus_costs[:abs(len(label_costs1) - len(label_costs2))])
+        return bound
+
+    def _get_node_bound_cost(self, n: Dict[str, str]) -> float:
+        return min(self._node_del_or_add(n), self.node_subt / 2)
+
+    def _get_edge_bound_cost(self, e: Dict[str, str]) -> float:
+        return min(self._edge_del_or_add(e), self.edge_subt / 2)
 
-    def get_similarity_from_graphs(self, graph1: DependencyGraphWrapper, graph2: DependencyGraphWrapper):
-        init_distance = 0
+    def preprocess_graph(self, graph: DependencyGraphWrapper) -> 'GEDTree':
+        root = graph.get_root()
+        node_costs = self._get_label_costs([data for _, data in graph.graph.nodes(data=True)],
+                                           get_label=lambda n: n['postag'], get_cost=self._get_node_bound_cost)
+        edge_costs = self._get_label_costs([data for _, _, data in graph.graph.edges(data=True)],
+                                           get_label=lambda e: get_main_dep(e['dep']),
+                                           get_cost=self._get_edge_bound_cost)
+        return GEDTree(graph.graph.nodes[root], len(graph.graph.nodes), node_costs, edge_costs)
 
-        # if the root pos tags are not the same
-        if graph1.graph.nodes[graph1.get_root()]['postag'] != graph2.graph.nodes[graph2.get_root()]['postag']:
-            graph1.graph.nodes[graph1.get_root()]['postag'] = graph2.graph.nodes[graph2.get_root()]['postag']
-            init_distance += 1
+    def _get_lower_bound_of_trees(self, tree1: 'GEDTree', tree2: 'GEDTree', root_postag: Optional[str] = None) \
+            -> float:
+        node_costs1 = tree1.node_costs
+        if root_postag is not None:
+            # move the cost of the root of tree1 under its new label
+            node_costs1 = dict(node_costs1)
+            root_label_costs = list(node_costs1[tree1.root_data['postag']])
+            root_label_costs.remove(self._get_node_bound_cost(tree1.root_data))
+            node_costs1[tree1.root_data['postag']] = root_label_costs
+            node_costs1[root_postag] = sorted(node_costs1.get(root_postag, []) + [
+                self._get_node_bound_cost({**tree1.root_data, 'postag': root_postag})])
+        return self._label_assignment_lower_bound(node_costs1, tree2.node_costs) + \
+            self._label_assignment_lower_bound(tree1.edge_costs, tree2.edge_costs)
 
-        dist = self.get_ged(graph1, graph2) + init_distance
+    def get_ged_lower_bound(self, graph1: DependencyGraphWrapper, graph2: DependencyGraphWrapper,
+                            root_postag: Optional[str] = None) -> float:
+        """
+        Label multiset lower bound of the edit distance, the node and edge assignments are bounded separately
+        Args:
+            root_postag: postag of the root of graph1 to use instead of its own
+        """
+        return self._get_lower_bound_of_trees(self.preprocess_graph(graph1), self.preprocess_graph(graph2),
+                                              root_postag)
+
+    @staticmethod
+    def _get_max_distance(tree1: 'GEDTree', tree2: 'GEDTree') -> int:
         # distance of deleting source graph and adding target graph
         # delete: n - 1 edges + n nodes
         # add: n - 1 edges + n nodes
-        max_dist = len(graph1.graph.nodes) * 2 - 1 + 2 * len(graph2.graph.nodes) - 1
+        return tree1.size * 2 - 1 + 2 * tree2.size - 1
+
+    @staticmethod
+    def _distance_to_similarity(dist: float, max_dist: float) -> float:
         return float(max_dist - dist) / float(max_dist)
+
+    @staticmethod
+    def _get_root_postag(tree1: 'GEDTree', tree2: 'GEDTree') -> Optional[str]:
+        """
+        Returns:
+            postag of the root of tree2 if it differs from the root of tree1, otherwise None
+        """
+        root_postag = tree2.root_data['postag']
+        if tree1.root_data['postag'] != root_postag:
+            return root_postag
+        return None
+
+    def get_similarity_from_preprocessed(self, graph1: DependencyGraphWrapper, graph2: DependencyGraphWrapper,
+                                         tree1: 'GEDTree', tree2: 'GEDTree', cutoff: Optional[float] = None) -> float:
+        # if the root pos tags are not the same, the root of graph1 is relabeled for a cost of 1
+        root_postag = self._get_root_postag(tree1, tree2)
+        init_distance = 0 if root_postag is None else 1
+
+        max_dist = self._get_max_distance(tree1, tree2)
+        if cutoff is None:
+            dist = self.get_ged(graph1, graph2, root_postag=root_postag) + init_distance
+            return self._distance_to_similarity(dist, max_dist)
+
+        # largest edit distance with a similarity of at least cutoff
+        distance_budget = max_dist * (1 - cutoff) - init_distance + _EPSILON
+        lower_bound = self._get_lower_bound_of_trees(tree1, tree2, root_postag)
+        if lower_bound > distance_budget:
+            return self._below_cutoff(self._distance_to_similarity(lower_bound + init_distance, max_dist), cutoff)
+        dist = self.get_ged(graph1, graph2, upper_bound=distance_budget, root_postag=root_postag)
+        if dist is None:
+            return self._below_cutoff(self._distance_to_similarity(lower_bound + init_distance, max_dist), cutoff)
+        return self._distance_to_similarity(dist + init_distance, max_dist)
+
+    def get_similarity_from_graphs(self, graph1: DependencyGraphWrapper, graph2: DependencyGraphWrapper,
+                                   cutoff: Optional[float] = None):
+        return self.get_similarity_from_preprocessed(graph1, graph2, self.preprocess_graph(graph1),
+                                                     self.preprocess_graph(graph2), cutoff=cutoff)
+
+    def get_similarity_upper_bound(self, graph1: DependencyGraphWrapper, graph2: DependencyGraphWrapper) -> float:
+        tree1, tree2 = self.preprocess_graph(graph1), self.preprocess_graph(graph2)
+        root_postag = self._get_root_postag(tree1, tree2)
+        init_distance = 0 if root_postag is None else 1
+        lower_bound = self._get_lower_bound_of_trees(tree1, tree2, root_postag)
+        return self._distance_to_similarity(lower_bound + init_distance, self._get_max_distance(tree1, tree2))
+
+
+class GEDTree:
+    """
+    Root, size and label costs of a tree for the edit distance bounds
+    """
+    __slots__ = ['root_data', 'size', 'node_costs', 'edge_costs']
+
+    def __init__(self, root_data: Dict[str, str], size: int, node_costs: Dict[str, List[float]],
+                 edge_costs: Dict[str, List[float]]):
+        self.root_data = root_data
+        self.size = size
+        self.node_costs = node_costs
+        self.edge_costs = edge_costs
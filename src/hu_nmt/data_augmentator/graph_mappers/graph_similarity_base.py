@@ -1,14 +1,94 @@
 from abc import ABC, abstractmethod
-from typing import Tuple, Dict
+from functools import lru_cache
+from typing import Any, Tuple, Dict, Optional, List, Callable
+
+import numpy as np
 
 from hu_nmt.data_augmentator.wrapper.dependency_graph_wrapper import DependencyGraphWrapper
 
 Edge = Tuple[str, str, Dict]
 Node = str
+GraphPair = Tuple[DependencyGraphWrapper, DependencyGraphWrapper]
+
+
+class SimilarityTimeoutError(Exception):
+    """
+    The similarity measure ran out of its own time limit before the similarity of the pair was known
+    """
+    pass
+
+
+@lru_cache(maxsize=None)
+def get_main_dep(dep: str) -> str:
+    """
+    Main dependency relation of a (sub)type, e.g. nmod for nmod:poss, interned once per distinct label
+    """
+    return dep.split(':')[0].lower()
 
 
 class GraphSimilarityBase(ABC):
 
     @abstractmethod
-    def get_similarity_from_graphs(self, src_graph: DependencyGraphWrapper, tgt_graph: DependencyGraphWrapper) -> float:
+    def get_similarity_from_graphs(self, src_graph: DependencyGraphWrapper, tgt_graph: DependencyGraphWrapper,
+                                   cutoff: Optional[float] = None) -> float:
+        """
+        Args:
+            cutoff: pairs that are proven to be less similar than cutoff are rejected early,
+                    and an upper bound of their similarity below the cutoff is returned instead of the exact value
+        """
         raise NotImplementedError
+
+    def preprocess_graph(self, graph: DependencyGraphWrapper) -> Any:
+        """
+        Per-tree data of the measure (normalized labels, weights, routes) that does not depend on the other tree
+        """
+        return None
+
+    def get_similarity_from_preprocessed(self, src_graph: DependencyGraphWrapper, tgt_graph: DependencyGraphWrapper,
+                                         src_data: Any, tgt_data: Any, cutoff: Optional[float] = None) -> float:
+        """
+        Args:
+            src_data, tgt_data: the results of preprocess_graph for src_graph and tgt_graph
+        """
+        return self.get_similarity_from_graphs(src_graph, tgt_graph, cutoff=cutoff)
+
+    def get_similarity_batch(self, pairs: List[GraphPair], cutoff: Optional[float] = None) -> np.ndarray:
+        """
+        Scores many pairs at once, every distinct tree (graph object) is only preprocessed once
+        Returns:
+            similarities of the (src graph, tgt graph) pairs in the same order
+        """
+        preprocessed = {}
+
+        def get_preprocessed(graph: DependencyGraphWrapper) -> Any:
+            # keyed by identity, the pairs keep the graphs alive during the batch
+            if id(graph) not in preprocessed:
+                preprocessed[id(graph)] = self.preprocess_graph(graph)
+            return preprocessed[id(graph)]
+
+        similarities = np.empty(len(pairs), dtype=np.float64)
+        for idx, (src_graph, tgt_graph) in enumerate(pairs):
+            similarities[idx] = self.get_similarity_from_preprocessed(
+                src_graph, tgt_graph, get_preprocessed(src_graph), get_preprocessed(tgt_graph), cutoff=cutoff)
+        return similarities
+
+    def get_similarity_upper_bound(self, src_graph: DependencyGraphWrapper, tgt_graph: DependencyGraphWrapper) -> float:
+        """
+        Cheap upper bound of the similarity, computed from the label histograms of the graphs
+        """
+        return 1.0
+
+    @staticmethod
+    def _below_cutoff(similarity_upper_bound: float, cutoff: float) -> float:
+        # the returned similarity of a rejected pair must not pass the cutoff
+        return min(similarity_upper_bound, float(np.nextafter(cutoff, -np.inf)))
+
+    @staticmethod
+    def order_children_by_position(graph: DependencyGraphWrapper) -> Callable[[List[Node]], List[Node]]:
+        def order_children(children: List[Node]) -> List[Node]:
+            try:
+                return sorted(children, key=graph.get_node_position)
+            except ValueError:
+                # node ids without positions keep the edge insertion order
+                return children
+        return order_children
@@ -0,0 +1,19 @@
+from typing import Optional
+
+from hu_nmt.data_augmentator.graph_mappers.graph_similarity_base import GraphSimilarityBase
+from hu_nmt.data_augmentator.wrapper.dependency_graph_wrapper import DependencyGraphWrapper
+
+"""
+LabelHistogramSimilarity approximates a similarity measure with the upper bound
+it derives from the postag and dependency label histograms of the graphs,
+in time linear in the size of the graphs.
+"""
+
+
+class LabelHistogramSimilarity(GraphSimilarityBase):
+    def __init__(self, similarity: GraphSimilarityBase):
+        self.similarity = similarity
+
+    def get_similarity_from_graphs(self, src_graph: DependencyGraphWrapper, tgt_graph: DependencyGraphWrapper,
+                                   cutoff: Optional[float] = None) -> float:
+        return self.similarity.get_similarity_upper_bound(src_graph, tgt_graph)
@@ -0,0 +1,273 @@
+import multiprocessing as mp
+import signal
+import threading
+import time
+from typing import List, Optional, Tuple
+
+from tqdm import tqdm
+
+from hu_nmt.data_augmentator.graph_mappers.graph_similarity_base import GraphSimilarityBase, GraphPair, \
+    SimilarityTimeoutError
+from hu_nmt.data_augmentator.graph_mappers.similarity_cache import CachedGraphSimilarity
+from hu_nmt.data_augmentator.utils.logger import get_logger
+from hu_nmt.data_augmentator.wrapper.dependency_graph_wrapper import DependencyGraphWrapper
+
+"""
+Scores the similarity of subtree pairs on a pool of worker processes.
+
+The pairs are sent to the workers in batches and the scores are merged back in the order of the pairs.
+Every pair gets a time slice, enforced with a SIGALRM timer in the process that scores it:
+the per-pair timeout, or with a total time budget, the fair share of the remaining budget
+among the remaining pairs of the scored batch, whichever is shorter.
+When the pairs of a run are scored in several calls (e.g. one per shard), every call gets the share
+of the remaining run budget given by the caller, and the time a call does not use is left for the later ones.
+A pair that exceeds its slice or the own time limit of the measure (timed out), or that is reached
+after the budget is spent (fallback), is scored by the cheaper fallback measure, or gets a similarity of 0
+without one. Only exact similarities are cached.
+"""
+
+log = get_logger(__name__)
+
+# number of pairs sent to a worker at once
+SCORING_BATCH_SIZE = 256
+TIMED_OUT_SIMILARITY = 0.0
+
+# how the similarity of a pair was computed
+EXACT = 'exact'
+TIMED_OUT = 'timed_out'
+FALLBACK = 'fallback'
+
+
+class PairTimeoutError(Exception):
+    pass
+
+
+def _raise_pair_timeout(signum, frame):
+    raise PairTimeoutError()
+
+
+def get_similarity_with_timeout(similarity: GraphSimilarityBase, src_graph: DependencyGraphWrapper,
+                                tgt_graph: DependencyGraphWrapper, cutoff: Optional[float] = None,
+                                timeout: Optional[float] = None) -> Optional[float]:
+    """
+    Args:
+        timeout: time budget of the pair in seconds, no budget if None, if the platform has no interval timers
+                 or outside of the main thread, where signal handlers cannot be installed
+    Returns:
+        similarity of the graphs, or None if it could not be computed within the time budget
+        or the own time limit of the measure
+    """
+    if timeout is not None and timeout <= 0:
+        return None
+    if timeout is None or not hasattr(signal, 'setitimer') or \
+            threading.current_thread() is not threading.main_thread():
+        try:
+            return similarity.get_similarity_from_graphs(src_graph, tgt_graph, cutoff=cutoff)
+        except SimilarityTimeoutError:
+            return None
+    previous_handler = signal.signal(signal.SIGALRM, _raise_pair_timeout)
+    try:
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+        return similarity.get_similarity_from_graphs(src_graph, tgt_graph, cutoff=cutoff)
+    except (PairTimeoutError, SimilarityTimeoutError):
+        return None
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous_handler)
+
+
+class ScoringSchedule:
+    """
+    Time slices of the pairs, shared by the processes through the wall-clock deadline of the budget
+    """
+
+    def __init__(self, pair_timeout: Optional[float] = None, deadline: Optional[float] = None, num_workers: int = 1):
+        self.pair_timeout = pair_timeout
+        self.deadline = deadline
+        self.num_workers = num_workers
+
+    def is_unlimited(self) -> bool:
+        return self.pair_timeout is None and self.deadline is None
+
+    def get_pair_slice(self, remaining_pairs: int) -> Optional[float]:
+        if self.deadline is None:
+            return self.pair_timeout
+        remaining_time = self.deadline - time.time()
+        if remaining_time <= 0:
+            return 0
+        # the workers score the remaining pairs concurrently
+        fair_share = remaining_time * self.num_workers / max(1, remaining_pairs)
+        return fair_share if self.pair_timeout is None else min(self.pair_timeout, fair_share)
+
+
+def score_pairs(similarity: GraphSimilarityBase, fallback: Optional[GraphSimilarityBase], graph_pairs: List[GraphPair],
+                cutoff: Optional[float], schedule: ScoringSchedule, remaining_pairs: int) -> List[Tuple[float, str]]:
+    """
+    Args:
+        remaining_pairs: number of pairs left to score, including graph_pairs
+    Returns:
+        (similarity, how it was computed) of the pairs
+    """
+    if schedule.is_unlimited():
+        # without time slices the pairs are scored with the batch API of the measure
+        try:
+            return [(similarity_value, EXACT) for similarity_value in
+                    similarity.get_similarity_batch(graph_pairs, cutoff).tolist()]
+        except SimilarityTimeoutError:
+            # the batch is scored pair by pair, so only the pairs that ran out of time fall back
+            pass
+    results = []
+    for idx, (src_graph, tgt_graph) in enumerate(graph_pairs):
+        pair_slice = schedule.get_pair_slice(remaining_pairs - idx)
+        similarity_value = get_similarity_with_timeout(similarity, src_graph, tgt_graph, cutoff, pair_slice)
+        if similarity_value is not None:
+            results.append((similarity_value, EXACT))
+            continue
+        status = FALLBACK if pair_slice == 0 else TIMED_OUT
+        if fallback is None:
+            results.append((TIMED_OUT_SIMILARITY, status))
+        else:
+            results.append((fallback.get_similarity_from_graphs(src_graph, tgt_graph, cutoff=cutoff), status))
+    return results
+
+
+# state of the scoring worker processes, set by init_scoring_worker
+_worker_similarity: Optional[GraphSimilarityBase] = None
+_worker_fallback: Optional[GraphSimilarityBase] = None
+
+
+def init_scoring_worker(similarity: GraphSimilarityBase, fallback: Optional[GraphSimilarityBase]):
+    global _worker_similarity, _worker_fallback
+    _worker_similarity = similarity
+    _worker_fallback = fallback
+
+
+def score_worker_batch(task: Tuple[List[GraphPair], Optional[float], ScoringSchedule, int]) \
+        -> List[Tuple[float, str]]:
+    """
+    Args:
+        task: (subtree pairs, similarity cutoff, schedule, number of pairs left to score from the first pair)
+    """
+    graph_pairs, cutoff, schedule, remaining_pairs = task
+    return score_pairs(_worker_similarity, _worker_fallback, graph_pairs, cutoff, schedule, remaining_pairs)
+
+
+class ParallelSimilarityScorer:
+    """
+    Scores subtree pairs with a similarity measure on num_workers processes, or inline with a single worker.
+    If the measure is a CachedGraphSimilarity, the cache is queried and filled in the main process
+    and only the pairs that are not cached are sent to the workers.
+    """
+
+    def __init__(self, similarity: GraphSimilarityBase, num_workers: int = 1, pair_timeout: Optional[float] = None,
+                 batch_size: int = SCORING_BATCH_SIZE, total_budget: Optional[float] = None,
+                 fallback: Optional[GraphSimilarityBase] = None):
+        """
+        Args:
+            pair_timeout: longest time in seconds a pair is scored with the similarity measure
+            total_budget: wall-clock time in seconds for scoring every pair of the run with the similarity measure,
+                          counted from the first scored pair
+            fallback: cheaper measure of the pairs that run out of their time
+        """
+        self.similarity = similarity
+        self.num_workers = num_workers
+        self.pair_timeout = pair_timeout
+        self.batch_size = batch_size
+        self.total_budget = total_budget
+        self.fallback = fallback
+        self.counts = {EXACT: 0, TIMED_OUT: 0, FALLBACK: 0}
+        # wall-clock deadline of the total budget of the run
+        self._run_deadline = None
+        self._pool = None
+
+    def _get_measure(self) -> GraphSimilarityBase:
+        if isinstance(self.similarity, CachedGraphSimilarity):
+            return self.similarity.similarity
+        return self.similarity
+
+    def _get_pool(self):
+        # the pool is kept alive between the shards, so the workers are only started once
+        if self._pool is None:
+            log.info(f'Starting {self.num_workers} similarity scoring workers')
+            self._pool = mp.get_context('spawn').Pool(self.num_workers, initializer=init_scoring_worker,
+                                                      initargs=(self._get_measure(), self.fallback))
+        return self._pool
+
+    def _get_schedule(self, budget_share: Optional[float] = None) -> ScoringSchedule:
+        """
+        Args:
+            budget_share: share of the remaining run budget the scored pairs may use, all of it if None
+        """
+        if self.total_budget is None:
+            return ScoringSchedule(self.pair_timeout, None, max(1, self.num_workers))
+        now = time.time()
+        if self._run_deadline is None:
+            self._run_deadline = now + self.total_budget
+        deadline = self._run_deadline
+        if budget_share is not None:
+            deadline = now + max(0.0, self._run_deadline - now) * min(1.0, budget_share)
+        return ScoringSchedule(self.pair_timeout, deadline, max(1, self.num_workers))
+
+    def _score_uncached(self, graph_pairs: List[GraphPair], cutoff: Optional[float],
+                        with_progress_bar: bool, budget_share: Optional[float] = None) -> List[Tuple[float, str]]:
+        schedule = self._get_schedule(budget_share)
+        if self.num_workers <= 1:
+            batch_results = (score_pairs(self._get_measure(), self.fallback, graph_pairs[start:start + self.batch_size],
+                                         cutoff, schedule, len(graph_pairs) - start)
+                             for start in range(0, len(graph_pairs), self.batch_size))
+        else:
+            tasks = [(graph_pairs[start:start + self.batch_size], cutoff, schedule, len(graph_pairs) - start)
+                     for start in range(0, len(graph_pairs), self.batch_size)]
+            # imap returns the batches in order
+            batch_results = self._get_pool().imap(score_worker_batch, tasks)
+        if with_progress_bar:
+            batch_results = tqdm(batch_results, total=-(-len(graph_pairs) // self.batch_size))
+        return [result for batch_result in batch_results for result in batch_result]
+
+    def score(self, graph_pairs: List[GraphPair], cutoff: Optional[float] = None,
+              with_progress_bar: bool = False, budget_share: Optional[float] = None) -> List[float]:
+        """
+        Args:
+            budget_share: share of the remaining total budget of the run these pairs may use,
+                          e.g. the share of the pairs of the run that are still to be scored. All of it if None,
+                          so a run scored in several calls should give the share of every call.
+        Returns:
+            similarities of the (src subtree, tgt subtree) pairs in the same order
+        """
+        if isinstance(self.similarity, CachedGraphSimilarity):
+            keys = [self.similarity.get_key(src_graph, tgt_graph, cutoff) for src_graph, tgt_graph in graph_pairs]
+            similarities = [self.similarity.get_cached(key) for key in keys]
+            # structurally identical pairs of the batch are only scored once
+            uncached = {}
+            for idx, (key, similarity) in enumerate(zip(keys, similarities)):
+                if similarity is None and key not in uncached:
+                    uncached[key] = idx
+        else:
+            keys = None
+            similarities = [None] * len(graph_pairs)
+            uncached = {idx: idx for idx in range(len(graph_pairs))}
+
+        results = self._score_uncached([graph_pairs[idx] for idx in uncached.values()], cutoff, with_progress_bar,
+                                       budget_share)
+        scored = {}
+        for key, (similarity, status) in zip(uncached.keys(), results):
+            self.counts[status] += 1
+            # only exact similarities are cached, the others do not describe the pair
+            if keys is not None and status == EXACT:
+                self.similarity.add(key, similarity)
+            scored[key] = similarity
+
+        if keys is None:
+            return [scored[idx] for idx in range(len(graph_pairs))]
+        return [similarity if similarity is not None else scored[key] for key, similarity in zip(keys, similarities)]
+
+    def log_stats(self):
+        log.info(f'Similarity scoring: {self.counts[EXACT]} exact, {self.counts[TIMED_OUT]} timed out '
+                 f'(longer than {self.pair_timeout}s or their share of the {self.total_budget}s budget), '
+                 f'{self.counts[FALLBACK]} scored by the fallback after the budget was spent')
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
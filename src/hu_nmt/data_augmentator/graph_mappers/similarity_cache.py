@@ -0,0 +1,147 @@
+import hashlib
+import os
+import pickle
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from hu_nmt.data_augmentator.graph_mappers.graph_similarity_base import GraphSimilarityBase, GraphPair, \
+    get_main_dep
+from hu_nmt.data_augmentator.utils.logger import get_logger
+from hu_nmt.data_augmentator.wrapper.dependency_graph_wrapper import DependencyGraphWrapper
+
+"""
+The similarity measures only look at the UPOS tags and dependency labels of the subtrees,
+so structurally identical subtrees (e.g. every 'DET NOUN' object) get the same similarity.
+CachedGraphSimilarity keys the similarity of a pair on the canonical signatures of the two labeled
+ordered trees and keeps the most recently used pairs.
+"""
+
+log = get_logger(__name__)
+
+Signature = bytes
+CacheKey = Tuple[Signature, Signature, Optional[float]]
+
+
+def _get_edge_label(dep: str) -> str:
+    main_dep = get_main_dep(dep)
+    # GED deletes and inserts exactly 'punct' for free, other spellings of punct are kept apart
+    if main_dep == 'punct' and dep != 'punct':
+        return dep
+    return main_dep
+
+
+def get_subtree_signature(graph: DependencyGraphWrapper) -> Signature:
+    """
+    Hash of the canonical string of the tree, where a node is written as postag(dep:child, ...)
+    with the children in token order
+    """
+    order_children = GraphSimilarityBase.order_children_by_position(graph)
+
+    def to_canonical_string(node) -> str:
+        children = order_children(list(graph.graph.successors(node)))
+        child_strings = [f'{_get_edge_label(graph.graph.edges[node, child]["dep"])}:{to_canonical_string(child)}'
+                         for child in children]
+        return f'{graph.graph.nodes[node]["postag"]}({",".join(child_strings)})'
+
+    return hashlib.blake2b(to_canonical_string(graph.get_root()).encode('utf-8'), digest_size=16).digest()
+
+
+def get_similarity_config(similarity: GraphSimilarityBase) -> str:
+    """
+    Identifies the similarity measure and its parameters, so persisted caches are not shared between measures
+    """
+    params = sorted((name, value) for name, value in vars(similarity).items()
+                    if isinstance(value, (bool, int, float, str)))
+    return f'{type(similarity).__name__}{params}'
+
+
+class CachedGraphSimilarity(GraphSimilarityBase):
+    """
+    Bounded LRU cache of the similarity of subtree signature pairs in front of a similarity measure
+    """
+
+    def __init__(self, similarity: GraphSimilarityBase, max_size: int = 100000, cache_path: Optional[str] = None):
+        self.similarity = similarity
+        self.max_size = max_size
+        self.cache_path = cache_path
+        self.hits = 0
+        self.misses = 0
+        self._cache: 'OrderedDict[CacheKey, float]' = OrderedDict()
+        if self.cache_path is not None and os.path.exists(self.cache_path):
+            self.load(self.cache_path)
+
+    def get_similarity_from_graphs(self, src_graph: DependencyGraphWrapper, tgt_graph: DependencyGraphWrapper,
+                                   cutoff: Optional[float] = None) -> float:
+        key = self.get_key(src_graph, tgt_graph, cutoff)
+        similarity = self.get_cached(key)
+        if similarity is None:
+            similarity = self.similarity.get_similarity_from_graphs(src_graph, tgt_graph, cutoff=cutoff)
+            self.add(key, similarity)
+        return similarity
+
+    def get_similarity_batch(self, pairs: List[GraphPair], cutoff: Optional[float] = None) -> np.ndarray:
+        keys = [self.get_key(src_graph, tgt_graph, cutoff) for src_graph, tgt_graph in pairs]
+        similarities = np.array([self.get_cached(key) for key in keys], dtype=np.float64)
+        # the uncached pairs are scored in one batch, structurally identical pairs only once
+        uncached = {}
+        for idx, key in enumerate(keys):
+            if np.isnan(similarities[idx]) and key not in uncached:
+                uncached[key] = idx
+        scored = dict(zip(uncached.keys(),
+                          self.similarity.get_similarity_batch([pairs[idx] for idx in uncached.values()], cutoff)))
+        for key, similarity in scored.items():
+            self.add(key, similarity)
+        for idx, key in enumerate(keys):
+            if np.isnan(similarities[idx]):
+                similarities[idx] = scored[key]
+        return similarities
+
+    def get_similarity_upper_bound(self, src_graph: DependencyGraphWrapper, tgt_graph: DependencyGraphWrapper) -> float:
+        return self.similarity.get_similarity_upper_bound(src_graph, tgt_graph)
+
+    @staticmethod
+    def get_key(src_graph: DependencyGraphWrapper, tgt_graph: DependencyGraphWrapper,
+                cutoff: Optional[float] = None) -> CacheKey:
+        # similarities of rejected pairs depend on the cutoff
+        return get_subtree_signature(src_graph), get_subtree_signature(tgt_graph), cutoff
+
+    def get_cached(self, key: CacheKey) -> Optional[float]:
+        similarity = self._cache.get(key)
+        if similarity is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self._cache.move_to_end(key)
+        return similarity
+
+    def add(self, key: CacheKey, similarity: float):
+        self._cache[key] = similarity
+        if len(self._cache) > self.max_size:
+            self._cache.popitem(last=False)
+
+    def get_hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups > 0 else 0
+
+    def log_stats(self):
+        log.info(f'Similarity cache: {self.hits} hits, {self.misses} misses '
+                 f'(hit rate: {self.get_hit_rate():.2%}), {len(self._cache)} cached pairs')
+
+    def save(self, cache_path: Optional[str] = None):
+        cache_path = cache_path or self.cache_path
+        log.info(f'Saving {len(self._cache)} cached similarities to {cache_path}')
+        with open(cache_path, 'wb') as f:
+            pickle.dump({'config': get_similarity_config(self.similarity), 'entries': list(self._cache.items())}, f)
+
+    def load(self, cache_path: str):
+        with open(cache_path, 'rb') as f:
+            cached = pickle.load(f)
+        if cached['config'] != get_similarity_config(self.similarity):
+            log.warning(f'Ignoring the similarity cache at {cache_path}, it was created by {cached["config"]}')
+            return
+        # the most recently used entries are at the end
+        for key, similarity in cached['entries'][-self.max_size:]:
+            self._cache[key] = similarity
+        log.info(f'Loaded {len(self._cache)} cached similarities from {cache_path}')
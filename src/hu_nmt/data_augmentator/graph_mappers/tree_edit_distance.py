@@ -0,0 +1,145 @@
+from typing import Callable, Dict, Hashable, List, Optional, Tuple
+
+import networkx as nx
+
+"""
+Zhang-Shasha edit distance of rooted ordered trees, O(n^2 * m^2) in the worst case
+and O(n * m * depth(t1) * depth(t2)) in general, instead of the exponential general graph edit distance.
+
+The trees are directed networkx graphs. Every non-root node has exactly one incoming edge, so the edge costs are
+folded into the costs of the node below them: deleting (inserting) a node deletes (inserts) its incoming edge,
+and substituting a node substitutes its incoming edge as well.
+"""
+
+Node = Hashable
+NodeCost = Callable[[Dict], float]
+NodePairCost = Callable[[Dict, Dict], float]
+
+
+def _postorder(graph: nx.DiGraph, root: Node, order_children: Callable[[List[Node]], List[Node]]) \
+        -> Tuple[List[Node], List[int]]:
+    """
+    Returns:
+        nodes in postorder and the postorder index of the leftmost leaf descendant of every node
+    """
+    nodes = []
+    leftmost_leaves = []
+    # (node, ordered children, index of the next child, postorder index of the first node of the subtree)
+    stack = [(root, order_children(list(graph.successors(root))), 0, 0)]
+    while stack:
+        node, children, child_idx, first_idx = stack.pop()
+        if child_idx < len(children):
+            stack.append((node, children, child_idx + 1, first_idx))
+            child = children[child_idx]
+            stack.append((child, order_children(list(graph.successors(child))), 0, len(nodes)))
+        else:
+            nodes.append(node)
+            # the leftmost leaf is the first node of the subtree in postorder
+            leftmost_leaves.append(first_idx)
+    return nodes, leftmost_leaves
+
+
+def _get_key_roots(leftmost_leaves: List[int]) -> List[int]:
+    # the highest node of every leftmost leaf, i.e. the root and the nodes that have a left sibling
+    return sorted({leftmost_leaf: idx for idx, leftmost_leaf in enumerate(leftmost_leaves)}.values())
+
+
+def _sequence_edit_distance_exceeds(del_costs: List[float], ins_costs: List[float], subst_costs: List[List[float]],
+                                    upper_bound: float) -> bool:
+    """
+    Tests if the edit distance of the postorder node sequences is larger than upper_bound.
+    Tree edit mappings preserve the postorder, so this distance is a lower bound of the tree edit distance.
+    The row minimums of the dynamic programming table do not decrease, so the test stops
+    as soon as a row exceeds upper_bound.
+    """
+    previous_row = [0.0]
+    for ins_cost in ins_costs:
+        previous_row.append(previous_row[-1] + ins_cost)
+    for idx1, del_cost in enumerate(del_costs):
+        row = [previous_row[0] + del_cost]
+        for idx2, ins_cost in enumerate(ins_costs):
+            row.append(min(previous_row[idx2 + 1] + del_cost, row[idx2] + ins_cost,
+                           previous_row[idx2] + subst_costs[idx1][idx2]))
+        if min(row) > upper_bound:
+            return True
+        previous_row = row
+    return previous_row[-1] > upper_bound
+
+
+def tree_edit_distance(graph1: nx.DiGraph, root1: Node, graph2: nx.DiGraph, root2: Node,
+                       node_subst_cost: NodePairCost, node_del_cost: NodeCost, node_ins_cost: NodeCost,
+                       edge_subst_cost: NodePairCost, edge_del_cost: NodeCost, edge_ins_cost: NodeCost,
+                       order_children1: Optional[Callable[[List[Node]], List[Node]]] = None,
+                       order_children2: Optional[Callable[[List[Node]], List[Node]]] = None,
+                       upper_bound: Optional[float] = None) -> Optional[float]:
+    """
+    Args:
+        graph1, graph2: trees whose children are ordered by order_children1 and order_children2,
+                        by default by edge insertion order
+        root1, root2: roots of the trees
+        *_cost: cost functions of node and edge attribute dicts, as for networkx.graph_edit_distance
+        upper_bound: maximum distance to consider
+    Returns:
+        Minimal cost of editing graph1 into graph2, or None if it is larger than upper_bound
+    """
+    nodes1, leftmost_leaves1 = _postorder(graph1, root1, order_children1 or list)
+    nodes2, leftmost_leaves2 = _postorder(graph2, root2, order_children2 or list)
+
+    def get_in_edge(graph: nx.DiGraph, root: Node, node: Node) -> Optional[Dict]:
+        if node == root:
+            return None
+        parent = next(iter(graph.predecessors(node)))
+        return graph.edges[parent, node]
+
+    in_edges1 = [get_in_edge(graph1, root1, node) for node in nodes1]
+    in_edges2 = [get_in_edge(graph2, root2, node) for node in nodes2]
+    del_costs = [node_del_cost(graph1.nodes[node]) + (edge_del_cost(edge) if edge is not None else 0)
+                 for node, edge in zip(nodes1, in_edges1)]
+    ins_costs = [node_ins_cost(graph2.nodes[node]) + (edge_ins_cost(edge) if edge is not None else 0)
+                 for node, edge in zip(nodes2, in_edges2)]
+
+    def get_subst_cost(idx1: int, idx2: int) -> float:
+        cost = node_subst_cost(graph1.nodes[nodes1[idx1]], graph2.nodes[nodes2[idx2]])
+        edge1, edge2 = in_edges1[idx1], in_edges2[idx2]
+        if edge1 is not None and edge2 is not None:
+            cost += edge_subst_cost(edge1, edge2)
+        elif edge1 is not None:
+            cost += edge_del_cost(edge1)
+        elif edge2 is not None:
+            cost += edge_ins_cost(edge2)
+        return cost
+
+    subst_costs = [[get_subst_cost(idx1, idx2) for idx2 in range(len(nodes2))] for idx1 in range(len(nodes1))]
+    if upper_bound is not None and _sequence_edit_distance_exceeds(del_costs, ins_costs, subst_costs, upper_bound):
+        return None
+
+    tree_distances = [[0.0] * len(nodes2) for _ in range(len(nodes1))]
+    for key_root1 in _get_key_roots(leftmost_leaves1):
+        for key_root2 in _get_key_roots(leftmost_leaves2):
+            leftmost1, leftmost2 = leftmost_leaves1[key_root1], leftmost_leaves2[key_root2]
+            rows, cols = key_root1 - leftmost1 + 2, key_root2 - leftmost2 + 2
+            # forest distances of the prefixes of the two subtrees in postorder
+            forest_distances = [[0.0] * cols for _ in range(rows)]
+            for x in range(1, rows):
+                forest_distances[x][0] = forest_distances[x - 1][0] + del_costs[leftmost1 + x - 1]
+            for y in range(1, cols):
+                forest_distances[0][y] = forest_distances[0][y - 1] + ins_costs[leftmost2 + y - 1]
+            for x in range(1, rows):
+                idx1 = leftmost1 + x - 1
+                for y in range(1, cols):
+                    idx2 = leftmost2 + y - 1
+                    delete = forest_distances[x - 1][y] + del_costs[idx1]
+                    insert = forest_distances[x][y - 1] + ins_costs[idx2]
+                    if leftmost_leaves1[idx1] == leftmost1 and leftmost_leaves2[idx2] == leftmost2:
+                        # both prefixes are whole trees
+                        distance = min(delete, insert, forest_distances[x - 1][y - 1] + subst_costs[idx1][idx2])
+                        tree_distances[idx1][idx2] = distance
+                    else:
+                        distance = min(delete, insert,
+                                       forest_distances[leftmost_leaves1[idx1] - leftmost1]
+                                       [leftmost_leaves2[idx2] - leftmost2] + tree_distances[idx1][idx2])
+                    forest_distances[x][y] = distance
+    distance = tree_distances[-1][-1]
+    if upper_bound is not None and distance > upper_bound:
+        return None
+    return distance
@@ -1,11 +1,72 @@
+from collections import OrderedDict
+from typing import List, Optional
+
 import fasttext
 
+from hu_nmt.data_augmentator.utils.logger import get_logger
+
+log = get_logger(__name__)
+
 
 class LanguageDetector:
-    def __init__(self, model_path='/tmp/lid.176.bin'):
+    """
+    fastText language identification with a bounded LRU cache of the predicted languages,
+    keyed on the whitespace-normalized text, since crawled corpora repeat lines heavily
+    """
+
+    def __init__(self, model_path='/tmp/lid.176.bin', cache_size: int = 1000000):
         self.model = fasttext.load_model(model_path)
+        self.cache_size = cache_size
+        self.hits = 0
+        self.misses = 0
+        self._cache: 'OrderedDict[str, str]' = OrderedDict()
 
     def predict(self, text):
-        # Extract ISO language code from model response
-        return self.model.predict(text)[0][0].rpartition('__')[-1]
+        return self.predict_batch([text])[0]
+
+    def predict_batch(self, texts: List[str]) -> List[str]:
+        """
+        Returns:
+            ISO language codes of the texts in the same order
+        """
+        # fastText predicts per line, so the text must not contain line breaks
+        normalized_texts = [self.normalize(text) for text in texts]
+        languages = [self._get_cached(text) for text in normalized_texts]
+        # the uncached texts are passed to fastText in one call, repeated texts only once
+        uncached = list(dict.fromkeys(text for text, language in zip(normalized_texts, languages) if language is None))
+        if uncached:
+            labels, _ = self.model.predict(uncached)
+            predicted = {}
+            for text, text_labels in zip(uncached, labels):
+                # Extract ISO language code from model response
+                predicted[text] = text_labels[0].rpartition('__')[-1]
+                self._add(text, predicted[text])
+            languages = [predicted[text] if language is None else language
+                         for text, language in zip(normalized_texts, languages)]
+        return languages
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        return ' '.join(text.split())
+
+    def _get_cached(self, text: str) -> Optional[str]:
+        language = self._cache.get(text)
+        if language is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self._cache.move_to_end(text)
+        return language
+
+    def _add(self, text: str, language: str):
+        if self.cache_size <= 0:
+            return
+        self._cache[text] = language
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
 
+    def log_stats(self):
+        lookups = self.hits + self.misses
+        hit_rate = self.hits / lookups if lookups > 0 else 0
+        log.info(f'Language detection cache: {self.hits} hits, {self.misses} misses (hit rate: {hit_rate:.2%}), '
+                 f'{len(self._cache)} cached texts')
@@ -1,6 +1,8 @@
 import multiprocessing as mp
 import os.path
+from collections import Counter, deque
 from itertools import islice
+from typing import Optional, List, Tuple, Iterable, Iterator
 
 from sacremoses import MosesPunctNormalizer
 from tqdm import tqdm
@@ -9,11 +11,45 @@ from hu_nmt.data_augmentator.base.nlp_pipeline_base import NlpPipelineBase
 from hu_nmt.data_augmentator.dependency_parsers.nlp_pipeline_factory import NlpPipelineFactory
 from hu_nmt.data_augmentator.preprocessor.language_detector import LanguageDetector
 from hu_nmt.data_augmentator.utils.data_helpers import get_config_from_yaml
+from hu_nmt.data_augmentator.utils.dependency_tree_store import get_shard_files
 from hu_nmt.data_augmentator.utils.logger import get_logger
 from hu_nmt.data_augmentator.utils.preprocessing import create_mini_batches
 
 log = get_logger(__name__)
 
+# stages of _filter_batch that reject sentence pairs, in the order they run
+EMPTY = 'empty'
+WORD_COUNT = 'word_count'
+WORD_COUNT_RATIO = 'word_count_ratio'
+MULTIPLE_SENTENCES = 'multiple_sentences'
+LANGUAGE = 'language'
+PARSED_LENGTH = 'parsed_length'
+FILTER_STAGES = [EMPTY, WORD_COUNT, WORD_COUNT_RATIO, MULTIPLE_SENTENCES, LANGUAGE, PARSED_LENGTH]
+
+# how far the whitespace token counts may be off from the token counts of the parse
+DEFAULT_SCREENING_SLACK = 1.5
+_OPENING_QUOTES = '"\'“„«('
+_CLOSING_QUOTES = '"\'”»)'
+
+# a line batch is split into this many worker batches per process, so the workers finish at about the same time
+WORKER_BATCHES_PER_PROCESS = 8
+
+# state of the preprocessing worker processes, set by init_preprocessing_worker
+_worker_preprocessor: Optional['Preprocessor'] = None
+
+
+def init_preprocessing_worker(preprocessor: 'Preprocessor'):
+    """
+    Loads the models of the worker once, they are reused for every batch of the run
+    """
+    global _worker_preprocessor
+    preprocessor._init_models()
+    _worker_preprocessor = preprocessor
+
+
+def filter_worker_batch(process_batch: List[Tuple[str, str]]):
+    return _worker_preprocessor._filter_batch(process_batch)
+
 
 class Preprocessor:
     """
@@ -29,8 +65,13 @@ class Preprocessor:
         self._source_output_path = source_output_path
         self._target_output_path = target_output_path
         self._dep_tree_output_path = dep_tree_output_path
+        self._dep_tree_format = self._config.preprocessor.get('dep_tree_format', 'tsv')
         self.moses_punct_normalizer_src = MosesPunctNormalizer(lang=self._config.preprocessor.source_language)
         self.moses_punct_normalizer_tgt = MosesPunctNormalizer(lang=self._config.preprocessor.target_language)
+        self._screening_slack = self._config.preprocessor.get('screening_slack', DEFAULT_SCREENING_SLACK)
+        # the multiple sentence heuristic is approximate, it changes which pairs are kept, so it is opt-in
+        self._screen_multiple_sentences = self._config.preprocessor.get('screen_multiple_sentences', False)
+        self.rejected_counts = Counter()
         self.skip_batches = 0
 
     def preprocess_simple(self):
@@ -39,31 +80,41 @@ class Preprocessor:
 
         log.info('Starting preprocessing...')
         number_of_lines_saved_to_file = 0
-        with open(self._source_data_path) as source_file, \
-                open(self._target_data_path) as target_file, \
-                open(self._source_output_path, 'w') as source_output_file, \
+        all_lines = 0
+        # the languages of a batch are detected together
+        line_batch_generator = self._get_file_line_batch_generator(
+            self._source_data_path, self._target_data_path, self._config.preprocessor.get('batch_size', 10000))
+        with open(self._source_output_path, 'w') as source_output_file, \
                 open(self._target_output_path, 'w') as target_output_file:
 
-            for i, (source_line, target_line) in tqdm(enumerate(zip(source_file, target_file))):
-                source_sentence, target_sentence = source_line.strip(), target_line.strip()
-                source_sentence = self.clean_sentence(source_sentence)
-                source_sentence = self.moses_punct_normalizer_src.normalize(source_sentence)
+            for line_batch in tqdm(line_batch_generator):
+                candidate_sentences = []
+                for source_line, target_line in line_batch:
+                    source_sentence, target_sentence = source_line.strip(), target_line.strip()
+                    source_sentence = self.clean_sentence(source_sentence)
+                    source_sentence = self.moses_punct_normalizer_src.normalize(source_sentence)
 
-                target_sentence = self.clean_sentence(target_sentence)
-                target_sentence = self.moses_punct_normalizer_src.normalize(target_sentence)
+                    target_sentence = self.clean_sentence(target_sentence)
+                    target_sentence = self.moses_punct_normalizer_src.normalize(target_sentence)
 
-                src_word_count = len(source_sentence.split())
-                tgt_word_count = len(target_sentence.split())
+                    src_word_count = len(source_sentence.split())
+                    tgt_word_count = len(target_sentence.split())
 
-                if self.is_good_length(src_word_count, tgt_word_count) and \
-                        self.is_correct_language(source_sentence, target_sentence):
-                    source_output_file.write(source_sentence + '\n')
-                    target_output_file.write(target_sentence + '\n')
+                    if self.is_good_length(src_word_count, tgt_word_count):
+                        candidate_sentences.append((source_sentence, target_sentence))
 
-                    number_of_lines_saved_to_file += 1
+                for (source_sentence, target_sentence), is_correct_language in \
+                        zip(candidate_sentences, self.get_correct_language_mask(candidate_sentences)):
+                    if is_correct_language:
+                        source_output_file.write(source_sentence + '\n')
+                        target_output_file.write(target_sentence + '\n')
+
+                        number_of_lines_saved_to_file += 1
+                all_lines += len(line_batch)
 
         log.info(
-            f'Finished processing sentences. Number of sentences before and after: {i + 1} -> {number_of_lines_saved_to_file}')
+            f'Finished processing sentences. Number of sentences before and after: {all_lines} -> {number_of_lines_saved_to_file}')
+        self.langdetect.log_stats()
 
     def preprocess_and_precompute(self):
         log.info('Starting preprocessing...')
@@ -85,46 +136,33 @@ class Preprocessor:
 
         if self._config.preprocessor.use_multiprocessing:
             process_count = self._config.preprocessor.process_count
-            for line_batch in line_batch_generator:
-                mini_batches_of_sentences = create_mini_batches(process_count, line_batch)
-                process_batches = [mini_batch for mini_batch in mini_batches_of_sentences]
-
-                # map to processes
-                log.info('Mapping sentences to processes')
-                proc_pool = mp.get_context('spawn').Pool(process_count)
-                list_of_results = proc_pool.map(self._init_models_and_filter_batch, process_batches)
+            # the workers are started and load their models once, then take the batches of the whole run
+            log.info(f'Starting {process_count} preprocessing workers')
+            proc_pool = mp.get_context('spawn').Pool(process_count, initializer=init_preprocessing_worker,
+                                                     initargs=(self,))
+            try:
+                for line_count, list_of_results in self._map_line_batches(proc_pool, process_count,
+                                                                          line_batch_generator):
+                    # unpack results
+                    log.info('Unpacking results')
+                    src_sents, tgt_sents, src_dep_rel_lists, tgt_dep_rel_lists = self._unpack_results(list_of_results)
+
+                    self.write_preprocessed_sentences_to_files(src_sents, tgt_sents,
+                                                               src_dep_rel_lists, tgt_dep_rel_lists,
+                                                               file_idx)
+
+                    file_idx += 1
+                    number_of_lines_saved_to_file += len(src_sents)
+                    all_lines += line_count
+            finally:
                 proc_pool.close()
                 proc_pool.join()
 
-                # unpack results
-                log.info('Unpacking results')
-                src_list_of_dep_rel_lists = []
-                tgt_list_of_dep_rel_lists = []
-                src_list_of_sentences = []
-                tgt_list_of_sentences = []
-
-                for sents, dep_rel_lists in list_of_results:
-                    src_sents, tgt_sents = zip(*sents)
-                    src_dep_rel_lists, tgt_dep_rel_lists = zip(*dep_rel_lists)
-                    src_list_of_dep_rel_lists.extend(src_dep_rel_lists)
-                    tgt_list_of_dep_rel_lists.extend(tgt_dep_rel_lists)
-                    src_list_of_sentences.extend(src_sents)
-                    tgt_list_of_sentences.extend(tgt_sents)
-
-                self.write_preprocessed_sentences_to_files(src_list_of_sentences, tgt_list_of_sentences,
-                                                           src_list_of_dep_rel_lists, tgt_list_of_dep_rel_lists,
-                                                           file_idx)
-
-                file_idx += 1
-                number_of_lines_saved_to_file += len(src_list_of_sentences)
-                all_lines += len(line_batch)
-
         else:
             self._init_models()
             for line_batch in line_batch_generator:
-                sentences, dep_rel_lists = self._filter_batch(line_batch)
-                src_sents, tgt_sents = zip(*sentences)
-                src_dep_rel_lists, tgt_dep_rel_lists = zip(*dep_rel_lists)
+                src_sents, tgt_sents, src_dep_rel_lists, tgt_dep_rel_lists = self._unpack_results(
+                    [self._filter_batch(line_batch)])
 
                 self.write_preprocessed_sentences_to_files(src_sents, tgt_sents,
                                                            src_dep_rel_lists, tgt_dep_rel_lists,
@@ -132,9 +170,55 @@ class Preprocessor:
                 file_idx += 1
                 number_of_lines_saved_to_file += len(src_sents)
                 all_lines += len(line_batch)
+            self.langdetect.log_stats()
 
         log.info(
             f'Finished processing sentences. Number of sentences before and after: {all_lines} -> {number_of_lines_saved_to_file}')
+        self.log_rejected_counts()
+
+    @staticmethod
+    def _map_line_batches(proc_pool, process_count: int, line_batch_generator: Iterable[List[Tuple[str, str]]]) \
+            -> Iterator[Tuple[int, Iterator]]:
+        """
+        Maps the worker batches of the line batches to the pool in order.
+        The next line batch is queued before the results of the current one are returned,
+        so the workers keep parsing while the results are written.
+        Yields:
+            number of lines and the ordered results of the worker batches of every line batch
+        """
+        pending_results = deque()
+        for line_batch in line_batch_generator:
+            worker_batches = [worker_batch for worker_batch in
+                              create_mini_batches(process_count * WORKER_BATCHES_PER_PROCESS, line_batch)
+                              if worker_batch]
+            log.info(f'Mapping {len(line_batch)} sentence pairs to the workers in {len(worker_batches)} batches')
+            pending_results.append((len(line_batch), proc_pool.imap(filter_worker_batch, worker_batches)))
+            if len(pending_results) > 1:
+                yield pending_results.popleft()
+        yield from pending_results
+
+    def _unpack_results(self, list_of_results) -> Tuple[List[str], List[str], List, List]:
+        """
+        Returns:
+            the kept source and target sentences and their node relationship lists of the _filter_batch results
+        """
+        src_sents, tgt_sents, src_dep_rel_lists, tgt_dep_rel_lists = [], [], [], []
+        for sents, dep_rel_lists, rejected_counts in list_of_results:
+            self.rejected_counts.update(rejected_counts)
+            # every pair of a batch may have been rejected
+            if not sents:
+                continue
+            batch_src_sents, batch_tgt_sents = zip(*sents)
+            batch_src_dep_rel_lists, batch_tgt_dep_rel_lists = zip(*dep_rel_lists)
+            src_sents.extend(batch_src_sents)
+            tgt_sents.extend(batch_tgt_sents)
+            src_dep_rel_lists.extend(batch_src_dep_rel_lists)
+            tgt_dep_rel_lists.extend(batch_tgt_dep_rel_lists)
+        return src_sents, tgt_sents, src_dep_rel_lists, tgt_dep_rel_lists
+
+    def log_rejected_counts(self):
+        log.info('Rejected sentence pairs by filter stage: ' +
+                 ', '.join(f'{stage}: {self.rejected_counts[stage]}' for stage in FILTER_STAGES))
 
     def _get_file_line_batch_generator(self, src_file, tgt_file, batch_size):
         with open(src_file, 'r') as src, open(tgt_file, 'r') as tgt:
@@ -150,17 +234,18 @@ class Preprocessor:
         self.target_parser = NlpPipelineFactory.get_dependency_parser(self._config.preprocessor.target_language)
         self.langdetect = LanguageDetector(self._config.preprocessor.langdetect_model_path)
 
-    def _init_models_and_filter_batch(self, process_batch):
-        # init models separately for processes
-        self._init_models()
-        return self._filter_batch(process_batch)
-
     def _filter_batch(self, process_batch):
+        """
+        Returns:
+            kept (source, target) sentence pairs, their (source, target) node relationship lists
+            and the number of rejected pairs per filter stage
+        """
         preprocessed_sentences = []
         list_of_dep_rel_list = []
+        rejected_counts = Counter()
 
-        number_of_lines_saved_to_file = 0
-
+        # cheap checks first, so only the surviving pairs are parsed, in one batch per language
+        candidate_sentences = []
         for i, (source_line, target_line) in tqdm(enumerate(process_batch)):
             source_sentence, target_sentence = source_line.strip(), target_line.strip()
             source_sentence = self.clean_sentence(source_sentence)
@@ -169,48 +254,129 @@ class Preprocessor:
             target_sentence = self.clean_sentence(target_sentence)
             target_sentence = self.moses_punct_normalizer_src.normalize(target_sentence)
 
-            if self.is_correct_language(source_sentence, target_sentence) and source_sentence and target_sentence:
-                source_dep_rel_list = self.source_parser.sentence_to_node_relationship_list(
-                    self.source_parser.nlp_pipeline, source_sentence)
-                target_dep_rel_list = self.target_parser.sentence_to_node_relationship_list(
-                    self.target_parser.nlp_pipeline, target_sentence)
-
-                source_dep_tree = self.source_parser.node_relationship_list_to_dep_parse_tree(source_dep_rel_list)
-                target_dep_tree = self.target_parser.node_relationship_list_to_dep_parse_tree(target_dep_rel_list)
-
-                source_word_count = self.source_parser.count_tokens_from_graph(source_dep_tree)
-                target_word_count = self.target_parser.count_tokens_from_graph(target_dep_tree)
-
-                if self.is_good_length(source_word_count, target_word_count):
-                    preprocessed_sentences.append((source_sentence, target_sentence))
-                    list_of_dep_rel_list.append((source_dep_rel_list, target_dep_rel_list))
-
-                    number_of_lines_saved_to_file += 1
-        return preprocessed_sentences, list_of_dep_rel_list
+            rejecting_stage = self.screen_pair(source_sentence, target_sentence)
+            if rejecting_stage is not None:
+                rejected_counts[rejecting_stage] += 1
+                continue
+            candidate_sentences.append((source_sentence, target_sentence))
+
+        # the languages of the screened pairs are detected together
+        language_mask = self.get_correct_language_mask(candidate_sentences)
+        rejected_counts[LANGUAGE] += language_mask.count(False)
+        candidate_sentences = [sentences for sentences, is_correct_language in zip(candidate_sentences, language_mask)
+                               if is_correct_language]
+        if not candidate_sentences:
+            return preprocessed_sentences, list_of_dep_rel_list, rejected_counts
+
+        source_sentences, target_sentences = zip(*candidate_sentences)
+        source_dep_rel_lists = self.source_parser.sentences_to_node_relationship_lists(
+            self.source_parser.nlp_pipeline, list(source_sentences))
+        target_dep_rel_lists = self.target_parser.sentences_to_node_relationship_lists(
+            self.target_parser.nlp_pipeline, list(target_sentences))
+
+        for sentences, source_dep_rel_list, target_dep_rel_list in zip(candidate_sentences, source_dep_rel_lists,
+                                                                       target_dep_rel_lists):
+            source_dep_tree = self.source_parser.node_relationship_list_to_dep_parse_tree(source_dep_rel_list)
+            target_dep_tree = self.target_parser.node_relationship_list_to_dep_parse_tree(target_dep_rel_list)
+
+            source_word_count = self.source_parser.count_tokens_from_graph(source_dep_tree)
+            target_word_count = self.target_parser.count_tokens_from_graph(target_dep_tree)
+
+            if self.is_good_length(source_word_count, target_word_count):
+                preprocessed_sentences.append(sentences)
+                list_of_dep_rel_list.append((source_dep_rel_list, target_dep_rel_list))
+            else:
+                rejected_counts[PARSED_LENGTH] += 1
+        return preprocessed_sentences, list_of_dep_rel_list, rejected_counts
+
+    def screen_pair(self, source_sentence: str, target_sentence: str) -> Optional[str]:
+        """
+        Cheap checks of a sentence pair before parsing, the token counts are estimated by whitespace splitting.
+        The estimates may be off by the screening slack, so the pairs rejected by the word count checks would fail
+        the exact checks as well. The multiple sentence check (screen_multiple_sentences, off by default)
+        is approximate: it may reject pairs that the sentence splitter of the parser would keep.
+        Returns:
+            the filter stage that rejects the pair, None if the pair needs to be parsed
+        """
+        if not source_sentence or not target_sentence:
+            return EMPTY
+        source_word_count = len(source_sentence.split())
+        target_word_count = len(target_sentence.split())
+        if not (self._may_be_good_word_count(source_word_count) and self._may_be_good_word_count(target_word_count)):
+            return WORD_COUNT
+        if not self._may_be_good_ratio(source_word_count, target_word_count):
+            return WORD_COUNT_RATIO
+        if self._screen_multiple_sentences and \
+                (self.has_multiple_sentences(source_sentence) or self.has_multiple_sentences(target_sentence)):
+            return MULTIPLE_SENTENCES
+        return None
+
+    def _may_be_good_word_count(self, whitespace_word_count) -> bool:
+        return (whitespace_word_count * self._screening_slack > self._config.preprocessor.total_wordcount_min) and \
+               (whitespace_word_count / self._screening_slack < self._config.preprocessor.total_wordcount_max)
+
+    def _may_be_good_ratio(self, source_len, target_len) -> bool:
+        ratio_threshold = self._config.preprocessor.wordcount_ratio_threshold * self._screening_slack
+        return (abs(source_len - target_len) < self._config.preprocessor.wordcount_diff * self._screening_slack) or \
+               (source_len / target_len < ratio_threshold and target_len / source_len < ratio_threshold)
+
+    @staticmethod
+    def has_multiple_sentences(sentence: str) -> bool:
+        """
+        Quick heuristic for a sentence boundary inside the line: a word followed by a capitalized word,
+        ending with ! or ?, or with a period after at least 4 lowercase letters, so short abbreviations
+        and ordinals (e.g. 'Mr.', 'stb.', '2.') are not boundaries. Longer abbreviations before a capitalized word
+        (e.g. 'incl. VAT', 'kapcs. Ügyintéző') are false positives.
+        """
+        tokens = sentence.split()
+        for token, next_token in zip(tokens, tokens[1:]):
+            if not next_token.lstrip(_OPENING_QUOTES)[:1].isupper():
+                continue
+            word = token.rstrip(_CLOSING_QUOTES)
+            if word.endswith(('!', '?')):
+                return True
+            if word.endswith('.') and len(word) > 4 and word[:-1].isalpha() and word[:-1].islower():
+                return True
+        return False
 
     def write_preprocessed_sentences_to_files(self, src_sents, tgt_sents, src_dep_rel_lists, tgt_dep_rel_lists,
                                               file_idx):
         src_dep_tree_output = os.path.join(self._dep_tree_output_path, self._config.preprocessor.source_language)
         tgt_dep_tree_output = os.path.join(self._dep_tree_output_path, self._config.preprocessor.target_language)
 
-        with open(self._source_output_path, 'a+') as source_output_file:
-            source_output_file.write('\n'.join(src_sents) + '\n')
+        # the dependency tree shards are written even if empty, so the batches of a resumed run stay aligned
+        if src_sents:
+            with open(self._source_output_path, 'a+') as source_output_file:
+                source_output_file.write('\n'.join(src_sents) + '\n')
 
-        with open(self._target_output_path, 'a+') as target_output_file:
-            target_output_file.write('\n'.join(tgt_sents) + '\n')
+            with open(self._target_output_path, 'a+') as target_output_file:
+                target_output_file.write('\n'.join(tgt_sents) + '\n')
 
         NlpPipelineBase.write_dep_graphs_to_file(src_dep_tree_output, file_idx,
-                                                 src_dep_rel_lists)
+                                                 src_dep_rel_lists, self._dep_tree_format)
         NlpPipelineBase.write_dep_graphs_to_file(tgt_dep_tree_output, file_idx,
-                                                 tgt_dep_rel_lists)
+                                                 tgt_dep_rel_lists, self._dep_tree_format)
 
     def is_good_length(self, source_word_count, target_word_count) -> bool:
         return self._is_good_word_count(source_word_count) and self._is_good_word_count(target_word_count) and \
                self._is_good_ratio(source_word_count, target_word_count)
 
     def is_correct_language(self, source_sentence, target_sentence) -> bool:
-        return (self.langdetect.predict(source_sentence) == self._config.preprocessor.source_language) and \
-               (self.langdetect.predict(target_sentence) == self._config.preprocessor.target_language)
+        return self.get_correct_language_mask([(source_sentence, target_sentence)])[0]
+
+    def get_correct_language_mask(self, sentence_pairs: List[Tuple[str, str]]) -> List[bool]:
+        """
+        Returns:
+            whether the source and target sentences of the pairs are in the configured languages
+        """
+        if not sentence_pairs:
+            return []
+        source_sentences, target_sentences = zip(*sentence_pairs)
+        source_languages = self.langdetect.predict_batch(list(source_sentences))
+        target_languages = self.langdetect.predict_batch(list(target_sentences))
+        return [source_language == self._config.preprocessor.source_language and
+                target_language == self._config.preprocessor.target_language
+                for source_language, target_language in zip(source_languages, target_languages)]
 
     def _is_good_word_count(self, length):
         return (length > self._config.preprocessor.total_wordcount_min) and \
@@ -255,7 +421,7 @@ class Preprocessor:
     def _find_num_of_preprocessed_batches(self) -> int:
         src_dep_tree_output = os.path.join(self._dep_tree_output_path, self._config.preprocessor.source_language)
         if os.path.exists(src_dep_tree_output):
-            tsv_files = os.listdir(src_dep_tree_output)
-            max_tsv_number = max(map(lambda f: int(f.split('.')[0]), tsv_files), default=0)
+            shard_files = get_shard_files(src_dep_tree_output)
+            max_tsv_number = max(map(lambda f: int(f.split('.')[0]), shard_files), default=0)
             return max_tsv_number
         return 0
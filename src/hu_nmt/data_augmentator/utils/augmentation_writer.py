@@ -0,0 +1,161 @@
+import os
+from typing import Dict, List, Iterable, Optional
+
+from hu_nmt.data_augmentator.filters.filter import Filter
+from hu_nmt.data_augmentator.utils.logger import get_logger
+
+log = get_logger(__name__)
+
+LANGUAGES = ['src', 'tgt']
+# size of the write buffer of every output file
+WRITE_BUFFER_SIZE = 1 << 20
+
+
+class AugmentationSink:
+    """
+    Receives the augmented (and original) sentence pairs of each augmentation method as they are produced
+    """
+
+    def add(self, augmentation_type: str, src_sents: List[str], tgt_sents: List[str]):
+        raise NotImplementedError()
+
+    def add_original(self, augmentation_type: str, src_sents: List[str], tgt_sents: List[str]):
+        raise NotImplementedError()
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class InMemoryAugmentationSink(AugmentationSink):
+    """
+    Collects the sentence pairs into {augmentation_type: {'src': [...], 'tgt': [...]}} dictionaries
+    """
+
+    def __init__(self, sentence_pairs: Dict[str, Dict[str, List[str]]],
+                 original_sentence_pairs: Optional[Dict[str, Dict[str, List[str]]]] = None):
+        self.sentence_pairs = sentence_pairs
+        self.original_sentence_pairs = original_sentence_pairs
+
+    def add(self, augmentation_type: str, src_sents: List[str], tgt_sents: List[str]):
+        self.sentence_pairs[augmentation_type]['src'].extend(src_sents)
+        self.sentence_pairs[augmentation_type]['tgt'].extend(tgt_sents)
+
+    def add_original(self, augmentation_type: str, src_sents: List[str], tgt_sents: List[str]):
+        if self.original_sentence_pairs is not None:
+            self.original_sentence_pairs[augmentation_type]['src'].extend(src_sents)
+            self.original_sentence_pairs[augmentation_type]['tgt'].extend(tgt_sents)
+
+
+class StreamingAugmentationWriter(AugmentationSink):
+    """
+    Writes the sentence pairs to buffered output files as they are produced, so memory usage does not
+    depend on the number of augmented sentences.
+    With filters, the pairs of each augmentation method are filtered in chunks of filter_chunk_size before writing.
+    The leftover pairs at closing are folded into the last chunk, so no chunk is filtered with fewer pairs
+    than filter_chunk_size, unless there are fewer pairs in total.
+
+    Output layout:
+        tsv: <output_path>/<augmentation_type>.tsv with tab separated src and tgt sentences
+        basic: <output_path>/<augmentation_type>/<augmentation_type>.<lang>
+               and <output_path>/original_<augmentation_type>/<augmentation_type>.<lang> with save_original
+    """
+
+    def __init__(self, output_path: str, output_format: str, augmentation_types: Iterable[str],
+                 save_original: bool = False, filters: Optional[List[Filter]] = None, filter_chunk_size: int = 100000):
+        self._output_path = output_path
+        self.output_format = output_format
+        self.augmentation_types = list(augmentation_types)
+        self.save_original = save_original
+        self.filters = filters or []
+        self.filter_chunk_size = filter_chunk_size
+
+        self._files = {}
+        self._original_files = {}
+        self._pending = {augmentation_type: {lang: [] for lang in LANGUAGES}
+                         for augmentation_type in self.augmentation_types}
+        self.pre_filter_counts = {augmentation_type: 0 for augmentation_type in self.augmentation_types}
+        self.written_counts = {augmentation_type: 0 for augmentation_type in self.augmentation_types}
+        self._open_files()
+
+    def _open_file(self, path: str):
+        return open(path, 'w+', buffering=WRITE_BUFFER_SIZE)
+
+    def _open_files(self):
+        # a writer may be opened again on an existing output, e.g. by dump_augmented_sentences_to_files
+        os.makedirs(self._output_path, exist_ok=True)
+        for augmentation_type in self.augmentation_types:
+            if self.output_format == 'tsv':
+                self._files[augmentation_type] = self._open_file(f'{self._output_path}/{augmentation_type}.tsv')
+            else:
+                os.makedirs(f'{self._output_path}/{augmentation_type}', exist_ok=True)
+                self._files[augmentation_type] = {
+                    lang: self._open_file(f'{self._output_path}/{augmentation_type}/{augmentation_type}.{lang}')
+                    for lang in LANGUAGES}
+                if self.save_original:
+                    os.makedirs(f'{self._output_path}/original_{augmentation_type}', exist_ok=True)
+                    self._original_files[augmentation_type] = {
+                        lang: self._open_file(
+                            f'{self._output_path}/original_{augmentation_type}/{augmentation_type}.{lang}')
+                        for lang in LANGUAGES}
+
+    def add(self, augmentation_type: str, src_sents: List[str], tgt_sents: List[str]):
+        self.pre_filter_counts[augmentation_type] += len(src_sents)
+        if not self.filters:
+            self._write(augmentation_type, src_sents, tgt_sents)
+            return
+        pending = self._pending[augmentation_type]
+        pending['src'].extend(src_sents)
+        pending['tgt'].extend(tgt_sents)
+        # a full chunk is only filtered once the next one is full as well, so the last chunk takes the leftover
+        while len(self._pending[augmentation_type]['src']) >= 2 * self.filter_chunk_size:
+            self._flush(augmentation_type, self.filter_chunk_size)
+
+    def add_original(self, augmentation_type: str, src_sents: List[str], tgt_sents: List[str]):
+        # the tsv format does not keep the original sentences
+        if augmentation_type not in self._original_files:
+            return
+        for lang, sents in zip(LANGUAGES, [src_sents, tgt_sents]):
+            self._original_files[augmentation_type][lang].writelines(f'{sent}\n' for sent in sents)
+
+    def _flush(self, augmentation_type: str, chunk_size: Optional[int] = None):
+        """
+        Filters and writes the first chunk_size pending pairs, or every pending pair if chunk_size is None
+        """
+        pending = self._pending[augmentation_type]
+        if chunk_size is None:
+            chunk_size = len(pending['src'])
+        src_sents, tgt_sents = pending['src'][:chunk_size], pending['tgt'][:chunk_size]
+        self._pending[augmentation_type] = {lang: pending[lang][chunk_size:] for lang in LANGUAGES}
+        if not src_sents:
+            return
+        for filter in self.filters:
+            src_sents, tgt_sents = filter.filter(src_sents, tgt_sents)
+        self._write(augmentation_type, src_sents, tgt_sents)
+
+    def _write(self, augmentation_type: str, src_sents: List[str], tgt_sents: List[str]):
+        self.written_counts[augmentation_type] += len(src_sents)
+        if self.output_format == 'tsv':
+            self._files[augmentation_type].writelines(
+                f'{src_sent}\t{tgt_sent}\n' for src_sent, tgt_sent in zip(src_sents, tgt_sents))
+        else:
+            for lang, sents in zip(LANGUAGES, [src_sents, tgt_sents]):
+                self._files[augmentation_type][lang].writelines(f'{sent}\n' for sent in sents)
+
+    def close(self):
+        for augmentation_type in self.augmentation_types:
+            self._flush(augmentation_type)
+        for files in [self._files, self._original_files]:
+            for augmentation_type_files in files.values():
+                if isinstance(augmentation_type_files, dict):
+                    for f in augmentation_type_files.values():
+                        f.close()
+                else:
+                    augmentation_type_files.close()
+        self._files = {}
+        self._original_files = {}
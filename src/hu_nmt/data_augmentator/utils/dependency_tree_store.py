@@ -0,0 +1,553 @@
+import json
+import mmap
+import os
+import re
+import struct
+from typing import List, Tuple, Iterator, Iterable, Dict, Optional, Union
+
+import networkx as nx
+import numpy as np
+
+from hu_nmt.data_augmentator.utils.data_helpers import get_files_in_folder
+from hu_nmt.data_augmentator.utils.logger import get_logger
+
+"""
+Binary, columnar on-disk format for precomputed dependency trees.
+
+A shard (<file_idx>.dtb) stores every tree of a batch in flat arrays:
+token forms, head indices, interned deprel/UPOS codes and lemma ids.
+Trees are delimited by tree_offsets, which index into the token arrays,
+so a single tree can be decoded from a memory-mapped shard.
+
+Layout:
+    MAGIC | uint64 header length | JSON header | padding | arrays
+The header holds the deprel/UPOS vocabularies and the dtype, offset and
+length of every array. Offsets are relative to the start of the arrays
+and are 8-byte aligned.
+
+The tree counts of the shards of a folder are kept in a shard index
+(shard_index.json), so the sentence offsets of a store are known without
+opening the shards. An entry is only used while the size and modification
+time of its shard match.
+"""
+
+log = get_logger(__name__)
+
+BINARY_SHARD_EXTENSION = 'dtb'
+MAGIC = b'HUDTREE\x01'
+FORMAT_VERSION = 1
+ROOT_KEY = 'root_0'
+# The TSV format writes the missing attributes of the artificial ROOT node as 'None'
+ROOT_LABEL = 'None'
+SHARD_INDEX_FILE_NAME = 'shard_index.json'
+
+_ALIGNMENT = 8
+_HEADER_LENGTH_FORMAT = '<Q'
+
+_ARRAY_DTYPES = {
+    'tree_offsets': '<i8',
+    'heads': '<i4',
+    'deprels': '<u2',
+    'upos': '<u2',
+    'lemmas': '<i4',
+    'form_offsets': '<i8',
+    'form_bytes': 'u1',
+    'lemma_offsets': '<i8',
+    'lemma_bytes': 'u1',
+}
+
+# forms, heads (1-based, 0 is ROOT), deprels, upos tags, lemmas
+TreeColumns = Tuple[List[str], List[int], List[str], List[str], List[str]]
+
+
+def natural_keys(text):
+    """
+    alist.sort(key=natural_keys) sorts in human order
+    http://nedbatchelder.com/blog/200712/human_sorting.html
+    (See Toothy's implementation in the comments)
+    """
+    return [int(c) if c.isdigit() else c for c in re.split(r'(\d+)', text)]
+
+
+def is_binary_shard(file_name: str) -> bool:
+    return file_name.endswith(f'.{BINARY_SHARD_EXTENSION}')
+
+
+def get_shard_file_name(file_idx) -> str:
+    return f'{file_idx}.{BINARY_SHARD_EXTENSION}'
+
+
+def get_shard_file_idx(file_name: str) -> str:
+    return file_name.rpartition('.')[0] if '.' in file_name else file_name
+
+
+def get_shard_files(data_dir: str) -> List[str]:
+    """
+    Shard files of a dependency tree folder in natural-sort order.
+    A TSV shard that has a binary copy with the same index (e.g. converted in place without removing it) is skipped,
+    so every tree is read once. The shard index is not a shard.
+    """
+    files = [f for f in get_files_in_folder(data_dir) if not f.startswith(SHARD_INDEX_FILE_NAME)]
+    binary_file_indices = {get_shard_file_idx(f) for f in files if is_binary_shard(f)}
+    shard_files = [f for f in files if is_binary_shard(f) or get_shard_file_idx(f) not in binary_file_indices]
+    shard_files.sort(key=natural_keys)
+    return shard_files
+
+
+def records_to_tree_columns(records: Iterable[Tuple[str, str, str, str, str]]) -> TreeColumns:
+    """
+    Args:
+        records: (target_key, target_postag, target_lemma, target_deprel, source_key) tuples of one tree,
+                 where the keys are formatted as '<form>_<position>'
+    Returns:
+        The columns of the tree ordered by token position
+    """
+    tokens = []
+    for target_key, target_postag, target_lemma, target_deprel, source_key in records:
+        form, _, position = target_key.rpartition('_')
+        head = int(source_key.rpartition('_')[-1])
+        tokens.append((int(position), form, head, str(target_deprel), str(target_postag), str(target_lemma)))
+    tokens.sort(key=lambda x: x[0])
+
+    for expected_position, token in enumerate(tokens, start=1):
+        if token[0] != expected_position:
+            raise ValueError(f'Token positions of the tree are not consecutive: {[t[0] for t in tokens]}')
+
+    forms = [t[1] for t in tokens]
+    heads = [t[2] for t in tokens]
+    deprels = [t[3] for t in tokens]
+    upos = [t[4] for t in tokens]
+    lemmas = [t[5] for t in tokens]
+    return forms, heads, deprels, upos, lemmas
+
+
+def node_relationship_list_to_tree_columns(dep_rel_list) -> TreeColumns:
+    return records_to_tree_columns((dep_rel.target_key, dep_rel.target_postag, dep_rel.target_lemma,
+                                    dep_rel.target_deprel, dep_rel.source_key) for dep_rel in dep_rel_list)
+
+
+def tsv_lines_to_tree_columns(lines: List[str]) -> TreeColumns:
+    records = []
+    for line in lines:
+        target_key, target_postag, target_lemma, target_deprel, source_key, _, _ = line.rstrip('\n').split('\t')
+        records.append((target_key, target_postag, target_lemma, target_deprel, source_key))
+    return records_to_tree_columns(records)
+
+
+def tree_columns_to_dep_graph(columns: TreeColumns) -> nx.DiGraph:
+    """
+    Builds the same networkx graph as the one read from the TSV format
+    """
+    forms, heads, deprels, upos, lemmas = columns
+    graph = nx.DiGraph()
+    for idx in range(len(forms)):
+        head = heads[idx]
+        target_key = f'{forms[idx]}_{idx + 1}'
+        if head == 0:
+            source_key, source_postag, source_lemma = ROOT_KEY, ROOT_LABEL, ROOT_LABEL
+        else:
+            source_key = f'{forms[head - 1]}_{head}'
+            source_postag, source_lemma = upos[head - 1], lemmas[head - 1]
+        graph.add_node(source_key, postag=source_postag, lemma=source_lemma)
+        graph.add_node(target_key, postag=upos[idx], lemma=lemmas[idx])
+        graph.add_edge(source_key, target_key, dep=deprels[idx])
+    return graph
+
+
+def _encode_strings(strings: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+    encoded = [s.encode('utf-8') for s in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=_ARRAY_DTYPES['form_offsets'])
+    np.cumsum([len(s) for s in encoded], out=offsets[1:])
+    return offsets, np.frombuffer(b''.join(encoded), dtype=np.uint8)
+
+
+def _intern(value: str, vocabulary: List[str], index: Dict[str, int]) -> int:
+    code = index.get(value)
+    if code is None:
+        code = len(vocabulary)
+        index[value] = code
+        vocabulary.append(value)
+    return code
+
+
+def _align(position: int) -> int:
+    return (position + _ALIGNMENT - 1) // _ALIGNMENT * _ALIGNMENT
+
+
+class DependencyTreeShardWriter:
+    """
+    Collects the columns of dependency trees and serializes them into a binary shard
+    """
+
+    def __init__(self):
+        self._tree_offsets = [0]
+        self._forms = []
+        self._heads = []
+        self._deprel_codes = []
+        self._upos_codes = []
+        self._lemma_ids = []
+        self._deprels: List[str] = []
+        self._deprel_index: Dict[str, int] = {}
+        self._upos: List[str] = []
+        self._upos_index: Dict[str, int] = {}
+        self._lemmas: List[str] = []
+        self._lemma_index: Dict[str, int] = {}
+
+    def __len__(self):
+        return len(self._tree_offsets) - 1
+
+    def add_tree(self, columns: TreeColumns):
+        forms, heads, deprels, upos, lemmas = columns
+        self._forms.extend(forms)
+        self._heads.extend(heads)
+        self._deprel_codes.extend(_intern(x, self._deprels, self._deprel_index) for x in deprels)
+        self._upos_codes.extend(_intern(x, self._upos, self._upos_index) for x in upos)
+        self._lemma_ids.extend(_intern(x, self._lemmas, self._lemma_index) for x in lemmas)
+        self._tree_offsets.append(len(self._forms))
+
+    def add_node_relationship_list(self, dep_rel_list):
+        self.add_tree(node_relationship_list_to_tree_columns(dep_rel_list))
+
+    def write(self, path: str):
+        form_offsets, form_bytes = _encode_strings(self._forms)
+        lemma_offsets, lemma_bytes = _encode_strings(self._lemmas)
+        arrays = {
+            'tree_offsets': self._tree_offsets,
+            'heads': self._heads,
+            'deprels': self._deprel_codes,
+            'upos': self._upos_codes,
+            'lemmas': self._lemma_ids,
+            'form_offsets': form_offsets,
+            'form_bytes': form_bytes,
+            'lemma_offsets': lemma_offsets,
+            'lemma_bytes': lemma_bytes,
+        }
+        arrays = {name: np.asarray(values, dtype=_ARRAY_DTYPES[name]) for name, values in arrays.items()}
+
+        array_specs = {}
+        position = 0
+        for name, array in arrays.items():
+            array_specs[name] = {'dtype': _ARRAY_DTYPES[name], 'offset': position, 'count': len(array)}
+            position = _align(position + array.nbytes)
+
+        header = json.dumps({
+            'version': FORMAT_VERSION,
+            'num_trees': len(self),
+            'deprels': self._deprels,
+            'upos': self._upos,
+            'arrays': array_specs
+        }).encode('utf-8')
+        payload_start = _align(len(MAGIC) + struct.calcsize(_HEADER_LENGTH_FORMAT) + len(header))
+
+        with open(path, 'wb') as f:
+            f.write(MAGIC)
+            f.write(struct.pack(_HEADER_LENGTH_FORMAT, len(header)))
+            f.write(header)
+            f.write(b'\0' * (payload_start - f.tell()))
+            for name, array in arrays.items():
+                f.write(array.tobytes())
+                f.write(b'\0' * (_align(array.nbytes) - array.nbytes))
+
+
+def _parse_header(buffer, path: str) -> Tuple[dict, int]:
+    """
+    Returns:
+        (header of a binary shard, position of its arrays)
+    """
+    if buffer[:len(MAGIC)] != MAGIC:
+        raise ValueError(f'{path} is not a binary dependency tree shard')
+    header_length_start = len(MAGIC)
+    header_start = header_length_start + struct.calcsize(_HEADER_LENGTH_FORMAT)
+    header_length, = struct.unpack_from(_HEADER_LENGTH_FORMAT, buffer, header_length_start)
+    header = json.loads(bytes(buffer[header_start:header_start + header_length]).decode('utf-8'))
+    if header['version'] != FORMAT_VERSION:
+        raise ValueError(f'Unsupported shard version {header["version"]} in {path}')
+    return header, _align(header_start + header_length)
+
+
+class DependencyTreeShard:
+    """
+    Reads a binary shard written by DependencyTreeShardWriter.
+    The file is memory-mapped, single trees can be decoded without touching the rest of the shard.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._load(self._mmap)
+
+    def _load(self, buffer):
+        header, payload_start = _parse_header(buffer, self.path)
+        self.num_trees: int = header['num_trees']
+        self.deprel_vocabulary: List[str] = header['deprels']
+        self.upos_vocabulary: List[str] = header['upos']
+        for name, spec in header['arrays'].items():
+            array = np.frombuffer(buffer, dtype=spec['dtype'], count=spec['count'],
+                                  offset=payload_start + spec['offset'])
+            setattr(self, name, array)
+
+    def __len__(self):
+        return self.num_trees
+
+    def close(self):
+        # arrays are views of the mapping, they have to be released first
+        for name in _ARRAY_DTYPES:
+            setattr(self, name, None)
+        self._mmap.close()
+
+    def _decode_strings(self, offsets: np.ndarray, data: np.ndarray, start: int, end: int) -> List[str]:
+        raw = data[offsets[start]:offsets[end]].tobytes()
+        base = offsets[start]
+        bounds = (offsets[start:end + 1] - base).tolist()
+        return [raw[bounds[i]:bounds[i + 1]].decode('utf-8') for i in range(end - start)]
+
+    def _decode_lemma(self, lemma_id: int) -> str:
+        return self.lemma_bytes[self.lemma_offsets[lemma_id]:self.lemma_offsets[lemma_id + 1]].tobytes().decode('utf-8')
+
+    def get_tree_columns(self, tree_idx: int) -> TreeColumns:
+        if not 0 <= tree_idx < self.num_trees:
+            raise IndexError(f'Tree index {tree_idx} is out of range for {self.path} with {self.num_trees} trees')
+        start, end = self.tree_offsets[tree_idx:tree_idx + 2].tolist()
+        forms = self._decode_strings(self.form_offsets, self.form_bytes, start, end)
+        heads = self.heads[start:end].tolist()
+        deprels = [self.deprel_vocabulary[code] for code in self.deprels[start:end].tolist()]
+        upos = [self.upos_vocabulary[code] for code in self.upos[start:end].tolist()]
+        lemmas = [self._decode_lemma(lemma_id) for lemma_id in self.lemmas[start:end].tolist()]
+        return forms, heads, deprels, upos, lemmas
+
+    def iter_tree_columns(self) -> Iterator[TreeColumns]:
+        forms = self._decode_strings(self.form_offsets, self.form_bytes, 0, len(self.form_offsets) - 1)
+        lemma_vocabulary = self._decode_strings(self.lemma_offsets, self.lemma_bytes, 0, len(self.lemma_offsets) - 1)
+        heads = self.heads.tolist()
+        deprels = [self.deprel_vocabulary[code] for code in self.deprels.tolist()]
+        upos = [self.upos_vocabulary[code] for code in self.upos.tolist()]
+        lemmas = [lemma_vocabulary[lemma_id] for lemma_id in self.lemmas.tolist()]
+        tree_offsets = self.tree_offsets.tolist()
+        for start, end in zip(tree_offsets[:-1], tree_offsets[1:]):
+            yield forms[start:end], heads[start:end], deprels[start:end], upos[start:end], lemmas[start:end]
+
+    def iter_dep_graphs(self) -> Iterator[nx.DiGraph]:
+        for columns in self.iter_tree_columns():
+            yield tree_columns_to_dep_graph(columns)
+
+
+class TsvDependencyTreeShard:
+    """
+    Random access to the trees of a TSV shard.
+    The byte offset of every tree is found with one vectorized scan of the memory-mapped file,
+    only the requested trees are split into fields.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._mmap = None
+        if os.path.getsize(path) == 0:
+            self.tree_offsets = np.zeros(1, dtype=np.int64)
+            return
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        content = np.frombuffer(self._mmap, dtype=np.uint8)
+        line_ends = np.flatnonzero(content == ord('\n'))
+        # a tree is closed by an empty line, i.e. a line break right after the previous one
+        is_empty_line = np.zeros(len(line_ends), dtype=bool)
+        if len(line_ends):
+            is_empty_line[0] = line_ends[0] == 0
+            is_empty_line[1:] = line_ends[1:] == line_ends[:-1] + 1
+        tree_ends = line_ends[is_empty_line] + 1
+        self.tree_offsets = np.concatenate([[0], tree_ends]).astype(np.int64)
+        del content
+
+    def __len__(self):
+        return len(self.tree_offsets) - 1
+
+    def close(self):
+        if self._mmap is not None:
+            self._mmap.close()
+
+    def get_tree_columns(self, tree_idx: int) -> TreeColumns:
+        if not 0 <= tree_idx < len(self):
+            raise IndexError(f'Tree index {tree_idx} is out of range for {self.path} with {len(self)} trees')
+        start, end = self.tree_offsets[tree_idx:tree_idx + 2].tolist()
+        # drop the closing empty line
+        lines = self._mmap[start:end - 1].decode('utf-8').splitlines(keepends=True)
+        return tsv_lines_to_tree_columns(lines)
+
+
+class DependencyTreeStore:
+    """
+    Sentence-indexed random access to a folder of dependency tree shards (binary or TSV).
+    Sentence indices follow the order of read_parsed_dep_trees_from_files.
+    Shards are opened lazily and kept memory-mapped, the tree counts come from the shard index of the folder.
+    """
+
+    def __init__(self, data_dir: str):
+        self.data_dir = data_dir
+        self._files = get_shard_files(data_dir)
+        self._shards: List[Optional[Union[DependencyTreeShard, TsvDependencyTreeShard]]] = [None] * len(self._files)
+        self._shard_offsets: Optional[np.ndarray] = None
+
+    def _get_shard(self, shard_idx: int) -> Union[DependencyTreeShard, TsvDependencyTreeShard]:
+        shard = self._shards[shard_idx]
+        if shard is None:
+            path = os.path.join(self.data_dir, self._files[shard_idx])
+            shard = DependencyTreeShard(path) if is_binary_shard(path) else TsvDependencyTreeShard(path)
+            self._shards[shard_idx] = shard
+        return shard
+
+    @property
+    def shard_offsets(self) -> np.ndarray:
+        """
+        Index of the first sentence of every shard, the last item is the number of sentences
+        """
+        if self._shard_offsets is None:
+            shard_index = load_shard_index(self.data_dir)
+            tree_counts = [self._get_tree_count(i, shard_index) for i in range(len(self._files))]
+            self._shard_offsets = np.zeros(len(tree_counts) + 1, dtype=np.int64)
+            np.cumsum(tree_counts, out=self._shard_offsets[1:])
+        return self._shard_offsets
+
+    def _get_tree_count(self, shard_idx: int, shard_index: Dict[str, dict]) -> int:
+        if self._shards[shard_idx] is not None:
+            return len(self._shards[shard_idx])
+        file = self._files[shard_idx]
+        path = os.path.join(self.data_dir, file)
+        entry = shard_index.get(file)
+        if entry is not None and entry['size'] == os.path.getsize(path) and \
+                entry['mtime_ns'] == os.stat(path).st_mtime_ns:
+            return entry['tree_count']
+        # the shard is counted without keeping it open, the index is only written by the shard writers
+        log.debug(f'{file} is missing from the shard index of {self.data_dir}, counting its trees')
+        return count_shard_trees(path)
+
+    def __len__(self):
+        return int(self.shard_offsets[-1])
+
+    def _locate(self, sentence_indices: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        if len(sentence_indices) and (sentence_indices.min() < 0 or sentence_indices.max() >= len(self)):
+            raise IndexError(f'Sentence indices must be in [0, {len(self)})')
+        shard_indices = np.searchsorted(self.shard_offsets, sentence_indices, side='right') - 1
+        return shard_indices, sentence_indices - self.shard_offsets[shard_indices]
+
+    def get_tree_columns(self, sentence_idx: int) -> TreeColumns:
+        return self.get_trees_columns([sentence_idx])[0]
+
+    def get_trees_columns(self, sentence_indices: Iterable[int]) -> List[TreeColumns]:
+        shard_indices, tree_indices = self._locate(np.asarray(list(sentence_indices), dtype=np.int64))
+        return [self._get_shard(shard_idx).get_tree_columns(tree_idx)
+                for shard_idx, tree_idx in zip(shard_indices.tolist(), tree_indices.tolist())]
+
+    def get_dep_graph(self, sentence_idx: int) -> nx.DiGraph:
+        return tree_columns_to_dep_graph(self.get_tree_columns(sentence_idx))
+
+    def get_dep_graphs(self, sentence_indices: Iterable[int]) -> List[nx.DiGraph]:
+        return [tree_columns_to_dep_graph(columns) for columns in self.get_trees_columns(sentence_indices)]
+
+    def close(self):
+        for shard in self._shards:
+            if shard is not None:
+                shard.close()
+        self._shards = [None] * len(self._files)
+
+
+def write_binary_shard(output_dir: str, file_idx, list_of_dep_rel_lists):
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+    writer = DependencyTreeShardWriter()
+    for dep_rel_list in list_of_dep_rel_lists:
+        writer.add_node_relationship_list(dep_rel_list)
+    writer.write(os.path.join(output_dir, get_shard_file_name(file_idx)))
+    update_shard_index(output_dir, {get_shard_file_name(file_idx): len(writer)})
+
+
+def count_shard_trees(path: str) -> int:
+    if is_binary_shard(path):
+        with open(path, 'rb') as f:
+            prefix = f.read(len(MAGIC) + struct.calcsize(_HEADER_LENGTH_FORMAT))
+            header_length, = struct.unpack_from(_HEADER_LENGTH_FORMAT, prefix, len(MAGIC))
+            header, _ = _parse_header(prefix + f.read(header_length), path)
+        return header['num_trees']
+    with open(path, 'rb') as f:
+        # every tree is closed by an empty line
+        return sum(1 for line in f if line == b'\n')
+
+
+def load_shard_index(data_dir: str) -> Dict[str, dict]:
+    """
+    Returns:
+        file name -> {'tree_count', 'size', 'mtime_ns'} of the indexed shards of the folder, empty without an index
+    """
+    index_path = os.path.join(data_dir, SHARD_INDEX_FILE_NAME)
+    if not os.path.exists(index_path):
+        return {}
+    try:
+        with open(index_path) as f:
+            return json.load(f)['shards']
+    except (ValueError, KeyError) as e:
+        log.warning(f'Ignoring the invalid shard index {index_path}: {e}')
+        return {}
+
+
+def update_shard_index(data_dir: str, tree_counts: Optional[Dict[str, int]] = None):
+    """
+    Records the tree counts of shards in the shard index of the folder and drops the entries of removed shards
+    Args:
+        tree_counts: file name -> tree count of the written shards, every shard of the folder is counted if None
+    """
+    if tree_counts is None:
+        tree_counts = {file: count_shard_trees(os.path.join(data_dir, file)) for file in get_shard_files(data_dir)}
+    shard_index = load_shard_index(data_dir)
+    shard_index.update({file: {'tree_count': tree_count} for file, tree_count in tree_counts.items()})
+    for file in list(shard_index):
+        path = os.path.join(data_dir, file)
+        if not os.path.exists(path):
+            del shard_index[file]
+        elif file in tree_counts:
+            stat = os.stat(path)
+            shard_index[file].update({'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns})
+    index_path = os.path.join(data_dir, SHARD_INDEX_FILE_NAME)
+    # replaced atomically, so a reader never sees a partially written index
+    with open(f'{index_path}.tmp', 'w') as f:
+        json.dump({'version': FORMAT_VERSION, 'shards': shard_index}, f)
+    os.replace(f'{index_path}.tmp', index_path)
+
+
+def read_tsv_shard_tree_columns(path: str) -> Iterator[TreeColumns]:
+    with open(path) as f:
+        lines = []
+        for line in f:
+            if line == '\n':
+                yield tsv_lines_to_tree_columns(lines)
+                lines = []
+            else:
+                lines.append(line)
+
+
+def convert_tsv_shards_to_binary(tsv_dir: str, output_dir: str, remove_tsv: bool = False) -> int:
+    """
+    Converts every TSV shard of a dependency tree folder into a binary shard with the same index
+    Returns:
+        The number of converted trees
+    """
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+    files_to_convert = [f for f in get_files_in_folder(tsv_dir)
+                        if not is_binary_shard(f) and not f.startswith(SHARD_INDEX_FILE_NAME)]
+    files_to_convert.sort(key=natural_keys)
+    tree_cnt = 0
+    tree_counts = {}
+    for file in files_to_convert:
+        writer = DependencyTreeShardWriter()
+        for columns in read_tsv_shard_tree_columns(os.path.join(tsv_dir, file)):
+            writer.add_tree(columns)
+        file_idx = get_shard_file_idx(file)
+        writer.write(os.path.join(output_dir, get_shard_file_name(file_idx)))
+        tree_cnt += len(writer)
+        tree_counts[get_shard_file_name(file_idx)] = len(writer)
+        log.info(f'Converted {file} with {len(writer)} trees')
+        if remove_tsv:
+            os.remove(os.path.join(tsv_dir, file))
+    update_shard_index(output_dir, tree_counts)
+    if remove_tsv and os.path.exists(os.path.join(tsv_dir, SHARD_INDEX_FILE_NAME)):
+        update_shard_index(tsv_dir, {})
+    return tree_cnt
@@ -0,0 +1,70 @@
+from typing import Callable, List, Optional, Tuple, TypeVar
+
+import numpy as np
+
+from hu_nmt.data_augmentator.utils.logger import get_logger
+
+"""
+Schedules sentences for the neural parsers by length, so their batches contain sentences of similar length
+and are padded less. Sentences are sorted by their whitespace token count within windows of the file order,
+so the reordering stays local, and the long outliers are parsed separately.
+The results are returned in the original order of the sentences.
+"""
+
+log = get_logger(__name__)
+
+# number of consecutive sentences that are sorted by length together
+LENGTH_SORT_WINDOW = 4096
+# sentences with more whitespace tokens are parsed in their own queue
+LONG_SENTENCE_LENGTH = 128
+
+T = TypeVar('T')
+
+
+def get_sentence_lengths(sentences: List[str]) -> np.ndarray:
+    return np.fromiter((len(sentence.split()) for sentence in sentences), dtype=np.int64, count=len(sentences))
+
+
+def get_length_schedule(lengths: np.ndarray, window_size: int = LENGTH_SORT_WINDOW,
+                        long_sentence_length: Optional[int] = LONG_SENTENCE_LENGTH) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Args:
+        lengths: token counts of the sentences in their original order
+        window_size: number of consecutive sentences sorted together
+        long_sentence_length: sentences longer than this are outliers, no outliers if None
+    Returns:
+        (indices of the regular sentences in parsing order, indices of the outliers in their original order)
+    """
+    indices = np.arange(len(lengths))
+    is_long = np.zeros(len(lengths), dtype=bool) if long_sentence_length is None else lengths > long_sentence_length
+    regular = indices[~is_long]
+    regular_lengths = lengths[regular]
+    # the window index is the primary key, so the sentences only move within their window
+    windows = np.arange(len(regular)) // max(1, window_size)
+    order = np.lexsort((regular_lengths, windows))
+    return regular[order], indices[is_long]
+
+
+def parse_in_length_order(sentences: List[str], parse: Callable[[List[str]], List[T]],
+                          parse_long: Optional[Callable[[List[str]], List[T]]] = None,
+                          window_size: int = LENGTH_SORT_WINDOW,
+                          long_sentence_length: Optional[int] = LONG_SENTENCE_LENGTH) -> List[T]:
+    """
+    Args:
+        parse: parses a list of sentences in one call, returning a result per sentence
+        parse_long: parses the long outliers, parse is used by default
+    Returns:
+        results of the sentences in their original order
+    """
+    regular_order, long_order = get_length_schedule(get_sentence_lengths(sentences), window_size,
+                                                    long_sentence_length)
+    results: List[Optional[T]] = [None] * len(sentences)
+    for order, parse_queue in [(regular_order, parse), (long_order, parse_long or parse)]:
+        if len(order) == 0:
+            continue
+        order = order.tolist()
+        for idx, result in zip(order, parse_queue([sentences[idx] for idx in order])):
+            results[idx] = result
+    if len(long_order) > 0:
+        log.debug(f'Parsed {len(long_order)} sentences longer than {long_sentence_length} tokens separately')
+    return results
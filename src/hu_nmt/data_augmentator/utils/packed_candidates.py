@@ -0,0 +1,145 @@
+import os
+from typing import List, Dict, Tuple, Optional
+
+import numpy as np
+
+from hu_nmt.data_augmentator.utils.translation_candidate import SentenceCandidate, TranslationCandidate
+
+"""
+Flat, memory-mappable representation of translation candidates for subtree swapping in worker processes.
+
+The sentences of each side are stored as their space joined UTF-8 text in one byte array, delimited by
+text_offsets. The swappable subtrees are kept as (start, end) byte spans of the text, so swapping two subtrees
+only concatenates three byte slices per sentence, the same as joining the swapped token lists.
+Missing subtrees have a (-1, -1) span.
+
+Layout of a packed candidate directory:
+    <side>_text.npy, <side>_offsets.npy, <side>_<dep>_spans.npy for side in (src, tgt) and dep in SWAPPABLE_DEPS
+"""
+
+SIDES = ['src', 'tgt']
+SWAPPABLE_DEPS = ['obj', 'nsubj']
+NO_SPAN = -1
+
+PackedSentences = Dict[str, np.ndarray]
+
+
+def pack_sentence_candidates(sentences: List[SentenceCandidate]) -> PackedSentences:
+    encoded_sentences = []
+    spans = {dep: np.full((len(sentences), 2), NO_SPAN, dtype=np.int64) for dep in SWAPPABLE_DEPS}
+    for idx, sentence in enumerate(sentences):
+        encoded_tokens = [token.encode('utf-8') for token in sentence.tokens]
+        # byte offset of the start of every token in the space joined sentence
+        token_starts = np.cumsum([0] + [len(token) + 1 for token in encoded_tokens])
+        for dep in SWAPPABLE_DEPS:
+            span = sentence.get_span(dep)
+            if span is not None:
+                start, end = span
+                spans[dep][idx] = (token_starts[start], token_starts[end] + len(encoded_tokens[end]))
+        encoded_sentences.append(b' '.join(encoded_tokens))
+
+    offsets = np.cumsum([0] + [len(sentence) for sentence in encoded_sentences], dtype=np.int64)
+    packed = {
+        'text': np.frombuffer(b''.join(encoded_sentences), dtype=np.uint8),
+        'offsets': offsets
+    }
+    for dep in SWAPPABLE_DEPS:
+        packed[f'{dep}_spans'] = spans[dep]
+    return packed
+
+
+def save_packed_candidates(translations: List[TranslationCandidate], output_dir: str):
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+    for side in SIDES:
+        packed = pack_sentence_candidates([getattr(translation, side) for translation in translations])
+        for name, array in packed.items():
+            np.save(os.path.join(output_dir, f'{side}_{name}.npy'), array)
+
+
+def load_packed_candidates(input_dir: str) -> Dict[str, PackedSentences]:
+    """
+    Returns:
+        {side: {array name: read-only memory-mapped array}}
+    """
+    names = ['text', 'offsets'] + [f'{dep}_spans' for dep in SWAPPABLE_DEPS]
+    return {side: {name: np.load(os.path.join(input_dir, f'{side}_{name}.npy'), mmap_mode='r') for name in names}
+            for side in SIDES}
+
+
+def get_packed_sentence(packed: PackedSentences, idx: int) -> bytes:
+    return packed['text'][packed['offsets'][idx]:packed['offsets'][idx + 1]].tobytes()
+
+
+def swap_packed_subtrees(packed: PackedSentences, idx_1: int, idx_2: int, dep: str) -> Tuple[str, str]:
+    sentence_1 = get_packed_sentence(packed, idx_1)
+    sentence_2 = get_packed_sentence(packed, idx_2)
+    start_1, end_1 = packed[f'{dep}_spans'][idx_1].tolist()
+    start_2, end_2 = packed[f'{dep}_spans'][idx_2].tolist()
+    if start_1 == NO_SPAN or start_2 == NO_SPAN:
+        raise ValueError(f'Candidates {idx_1} and {idx_2} must both have a {dep} subtree')
+
+    swapped_1 = sentence_1[:start_1] + sentence_2[start_2:end_2] + sentence_1[end_1:]
+    swapped_2 = sentence_2[:start_2] + sentence_1[start_1:end_1] + sentence_2[end_2:]
+    return swapped_1.decode('utf-8'), swapped_2.decode('utf-8')
+
+
+class SwapChunkResult:
+    __slots__ = ['src_sents', 'tgt_sents', 'original_src_sents', 'original_tgt_sents', 'error_cnt']
+
+    def __init__(self):
+        self.src_sents = []
+        self.tgt_sents = []
+        self.original_src_sents = []
+        self.original_tgt_sents = []
+        self.error_cnt = 0
+
+
+def swap_packed_pairs(candidates: Dict[str, PackedSentences], index_pairs: np.ndarray, dep: str,
+                      save_original: bool = False) -> SwapChunkResult:
+    """
+    Swaps the dep subtrees of the candidate index pairs on both sides,
+    with the same output order as SubjectObjectAugmentator.swap_dep_subtrees
+    """
+    result = SwapChunkResult()
+    for idx_1, idx_2 in index_pairs.tolist():
+        try:
+            src_sents = swap_packed_subtrees(candidates['src'], idx_1, idx_2, dep)
+            tgt_sents = swap_packed_subtrees(candidates['tgt'], idx_1, idx_2, dep)
+        except Exception:
+            result.error_cnt += 1
+            continue
+        if save_original:
+            for idx in [idx_1, idx_2]:
+                result.original_src_sents.append(get_packed_sentence(candidates['src'], idx).decode('utf-8'))
+                result.original_tgt_sents.append(get_packed_sentence(candidates['tgt'], idx).decode('utf-8'))
+        result.src_sents.extend(src_sents)
+        result.tgt_sents.extend(tgt_sents)
+    return result
+
+
+# state of the swapping worker processes, set by init_swap_worker
+_worker_candidates: Optional[Dict[str, Dict[str, PackedSentences]]] = None
+_worker_index_pairs: Optional[Dict[str, np.ndarray]] = None
+
+
+def init_swap_worker(candidate_dirs: Dict[str, str], index_pair_paths: Dict[str, str]):
+    """
+    Memory-maps the packed candidates and the sampled index pairs once per worker process
+    Args:
+        candidate_dirs: candidate set name --> packed candidate directory
+        index_pair_paths: task name --> .npy file of the (k, 2) sampled index pairs
+    """
+    global _worker_candidates, _worker_index_pairs
+    _worker_candidates = {name: load_packed_candidates(path) for name, path in candidate_dirs.items()}
+    _worker_index_pairs = {name: np.load(path, mmap_mode='r') for name, path in index_pair_paths.items()}
+
+
+def swap_worker_chunk(task: Tuple[str, str, str, int, int, bool]) -> SwapChunkResult:
+    """
+    Args:
+        task: (task name, candidate set name, dep, first pair, last pair + 1, save original)
+    """
+    task_name, candidate_set, dep, start, end, save_original = task
+    return swap_packed_pairs(_worker_candidates[candidate_set], _worker_index_pairs[task_name][start:end], dep,
+                             save_original)
@@ -0,0 +1,71 @@
+from typing import Tuple
+
+import numpy as np
+
+from hu_nmt.data_augmentator.utils.logger import get_logger
+
+log = get_logger(__name__)
+
+# extra draws per missing pair, so one batch is usually enough despite the collisions
+_OVERSAMPLING = 1.25
+
+
+def get_pair_count(item_count: int) -> int:
+    return item_count * (item_count - 1) // 2
+
+
+def _sorted_unique(values: np.ndarray) -> np.ndarray:
+    # sort based deduplication, np.unique is considerably slower on large int64 arrays in recent numpy versions
+    values = np.sort(values)
+    keep = np.empty(len(values), dtype=bool)
+    keep[:1] = True
+    np.not_equal(values[1:], values[:-1], out=keep[1:])
+    return values[keep]
+
+
+def decode_pair_indices(pair_indices: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Maps indices of the combinatorial pair space [0, n * (n - 1) / 2) to item index pairs (i, j) with i < j.
+    Pair k = j * (j - 1) / 2 + i, so the mapping does not depend on the number of items.
+    """
+    pair_indices = np.asarray(pair_indices, dtype=np.int64)
+    second = ((1 + np.sqrt(1 + 8 * pair_indices.astype(np.float64))) // 2).astype(np.int64)
+    # correct the rounding errors of the floating point square root
+    second -= second * (second - 1) // 2 > pair_indices
+    second += (second + 1) * second // 2 <= pair_indices
+    first = pair_indices - second * (second - 1) // 2
+    return first, second
+
+
+def sample_unordered_index_pairs(item_count: int, sample_count: int, rng: np.random.Generator) -> np.ndarray:
+    """
+    Samples distinct unordered pairs of item indices without replacement
+    Args:
+        item_count: number of items to pair
+        sample_count: number of pairs to sample, clamped to the number of possible pairs
+        rng: random generator, a seeded stream of the caller so the samples are reproducible
+    Returns:
+        (sample_count, 2) array of item indices in random order
+    """
+    pair_count = get_pair_count(item_count)
+    if sample_count > pair_count:
+        log.warning(f'Cannot sample {sample_count} distinct pairs from {item_count} items, '
+                    f'sampling all {pair_count} pairs instead')
+        sample_count = pair_count
+    if sample_count <= 0:
+        return np.empty((0, 2), dtype=np.int64)
+
+    if 2 * sample_count > pair_count:
+        # dense request, the pair space is at most twice as large as the sample
+        sampled = rng.permutation(pair_count)[:sample_count]
+    else:
+        sampled = np.empty(0, dtype=np.int64)
+        while len(sampled) < sample_count:
+            missing = sample_count - len(sampled)
+            draws = rng.integers(0, pair_count, size=int(missing * _OVERSAMPLING) + 16, dtype=np.int64)
+            sampled = _sorted_unique(np.concatenate([sampled, draws]))
+        # deduplication sorts, so the kept pairs are selected and ordered randomly
+        sampled = rng.choice(sampled, sample_count, replace=False)
+
+    first, second = decode_pair_indices(sampled)
+    return np.stack([first, second], axis=1)
@@ -0,0 +1,78 @@
+from typing import NamedTuple, Tuple, Optional, Iterable, List, Union
+
+from hu_nmt.data_augmentator.utils.translation_graph import TranslationGraph
+
+Span = Tuple[int, int]
+
+
+class SentenceCandidate(NamedTuple):
+    """
+    Tokens of a sentence with the (start, end) token index span of its swappable subtrees
+    and the index and lemma of the predicate (the head of the nsubj edge)
+    """
+    tokens: Tuple[str, ...]
+    obj_span: Optional[Span] = None
+    nsubj_span: Optional[Span] = None
+    predicate_index: Optional[int] = None
+    predicate_lemma: Optional[str] = None
+
+    def get_span(self, dep: str) -> Span:
+        if dep == 'obj':
+            return self.obj_span
+        elif dep == 'nsubj':
+            return self.nsubj_span
+        raise ValueError(f'No subtree span is kept for {dep}')
+
+    def get_subtree_tokens(self, dep: str) -> List[str]:
+        start, end = self.get_span(dep)
+        return list(self.tokens[start:end + 1])
+
+    @classmethod
+    def from_graph(cls, graph, deps: Iterable[str], with_predicate: bool = False) -> 'SentenceCandidate':
+        """
+        Args:
+            graph: DependencyGraphWrapper or DependencyTree
+            deps: dependency relations whose (single) subtree spans are kept
+            with_predicate: keep the predicate of the nsubj edge as well
+        """
+        spans = {}
+        for dep in deps:
+            edges = graph.get_edges_with_property('dep', dep)
+            if edges:
+                # token positions start from 1 after the artificial ROOT node
+                start, end = graph.get_subtree_span(edges[0].target_node)
+                spans[f'{dep}_span'] = (start - 1, end - 1)
+        if with_predicate:
+            nsubj_edges = graph.get_edges_with_property('dep', 'nsubj')
+            if nsubj_edges:
+                predicate = nsubj_edges[0].source_node
+                spans['predicate_index'] = graph.get_node_position(predicate) - 1
+                spans['predicate_lemma'] = graph.get_node_property(predicate, 'lemma').strip()
+        return cls(graph.get_sentence_tokens(), **spans)
+
+
+class TranslationCandidate(NamedTuple):
+    """
+    Compact replacement of TranslationGraph that does not keep the dependency trees alive.
+    similarity_bound is the upper bound of the similarity of a pair whose similarity was clipped below the
+    similarity cutoff, None otherwise
+    """
+    src: SentenceCandidate
+    tgt: SentenceCandidate
+    similarity: float = 0
+    similarity_bound: Optional[float] = None
+
+    @classmethod
+    def from_graphs(cls, src_graph, tgt_graph, deps: Iterable[str], similarity: float = 0,
+                    with_predicate: bool = False, similarity_bound: Optional[float] = None) -> 'TranslationCandidate':
+        deps = list(deps)
+        return cls(SentenceCandidate.from_graph(src_graph, deps, with_predicate),
+                   SentenceCandidate.from_graph(tgt_graph, deps, with_predicate),
+                   similarity, similarity_bound)
+
+
+def to_translation_candidate(translation: Union[TranslationCandidate, TranslationGraph]) -> TranslationCandidate:
+    if isinstance(translation, TranslationCandidate):
+        return translation
+    return TranslationCandidate.from_graphs(translation.src, translation.tgt, ['obj', 'nsubj'],
+                                            translation.similarity, with_predicate=True)
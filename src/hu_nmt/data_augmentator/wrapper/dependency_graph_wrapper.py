@@ -9,11 +9,40 @@ EdgeObject = namedtuple('Edge', 'source_node target_node edge')
 class DependencyGraphWrapper:
     def __init__(self, graph):
         self._graph = graph
+        # edge attribute -> attribute value -> edges, built on the first query of each attribute
+        self._edge_indices = {}
+        self._sentence_tokens = None
 
     @property
     def graph(self):
         return self._graph
 
+    def get_node_ids(self):
+        return list(self._graph.nodes)
+
+    def get_sentence_tokens(self):
+        """
+        Returns the tokens of the graph in sentence order without the artificial ROOT node
+        """
+        if self._sentence_tokens is None:
+            positions = sorted((self.get_node_position(x), self.get_token(x)) for x in self._graph.nodes)
+            self._sentence_tokens = tuple(token for position, token in positions if position != 0)
+        return self._sentence_tokens
+
+    @staticmethod
+    def get_token(node_id):
+        return node_id.rpartition('_')[0]
+
+    @staticmethod
+    def get_node_position(node_id):
+        return int(node_id.rpartition('_')[-1])
+
+    def get_subtree_tokens(self, node_id):
+        """
+        Returns the tokens of the subtree rooted at node_id in sentence order
+        """
+        return [self.get_token(x) for x in sorted(self.get_subtree_node_ids(node_id), key=self.get_node_position)]
+
     def get_root(self):
         # This should yield the artificial ROOT node on top of the dependency tree
         return [n for n, d in self._graph.in_degree() if d == 0][0]
@@ -45,22 +74,57 @@ class DependencyGraphWrapper:
     def get_nodes_with_property(self, attribute_key, attribute_value):
         return [x for x, y in self._graph.nodes(data=True) if y[attribute_key] == attribute_value]
 
+    def _get_edge_index(self, attribute_key):
+        edge_index = self._edge_indices.get(attribute_key)
+        if edge_index is None:
+            edge_index = {}
+            for source_node, target_node, edge in self._graph.edges(data=True):
+                edge_index.setdefault(edge[attribute_key], []).append(EdgeObject(source_node, target_node, edge))
+            self._edge_indices[attribute_key] = edge_index
+        return edge_index
+
     def get_edges_with_property(self, attribute_key, attribute_value):
-        edges_with_property = []
         attribute_value = attribute_value.lower()  # because of the different taxonomies
-        for source_node, target_node, edge in self._graph.edges(data=True):
-            if edge[attribute_key] == attribute_value:
-                edges_with_property.append(EdgeObject(source_node, target_node, edge))
-        return edges_with_property
+        return list(self._get_edge_index(attribute_key).get(attribute_value, []))
 
     def get_subtree_node_ids(self, node_id):
         sub_graph = list(nx.descendants(self._graph, node_id))
         sub_graph.append(node_id)
         return sub_graph
 
+    def _get_subtree_positions(self, node_id):
+        return [self.get_node_position(x) for x in self.get_subtree_node_ids(node_id)]
+
+    def get_subtree_span(self, node_id):
+        """
+        Returns the smallest and largest token position of the subtree rooted at node_id
+        """
+        positions = self._get_subtree_positions(node_id)
+        return min(positions), max(positions)
+
+    def get_subtree_size(self, node_id):
+        return len(nx.descendants(self._graph, node_id)) + 1
+
+    def is_subtree_contiguous(self, node_id):
+        positions = self._get_subtree_positions(node_id)
+        return max(positions) - min(positions) + 1 == len(positions)
+
     def get_subtree(self, node_id):
         return self._graph.subgraph(list(nx.descendants(self._graph, node_id)) + [node_id])
 
+    def get_subtree_graph(self, node_id):
+        """
+        Returns the subtree rooted at node_id as a new DependencyGraphWrapper
+        """
+        return DependencyGraphWrapper(nx.DiGraph(self.get_subtree(node_id)))
+
+    def get_subtree_view(self, node_id):
+        """
+        Returns the subtree rooted at node_id as a DependencyGraphWrapper of a read-only view of the graph,
+        without copying the nodes and edges
+        """
+        return DependencyGraphWrapper(self.get_subtree(node_id))
+
     def get_node_property(self, node_id, property):
         return self._graph.nodes[node_id][property]
 
@@ -0,0 +1,312 @@
+from typing import List, Dict, Optional, Iterable, Tuple
+
+import networkx as nx
+import numpy as np
+
+from hu_nmt.data_augmentator.utils.dependency_tree_store import TreeColumns, ROOT_KEY, ROOT_LABEL
+from hu_nmt.data_augmentator.wrapper.dependency_graph_wrapper import DependencyGraphWrapper, EdgeObject
+
+NO_LABEL = -1
+
+
+class LabelVocabulary:
+    """
+    Interns deprel and UPOS labels into process-wide integer codes
+    """
+
+    def __init__(self):
+        self._labels: List[str] = []
+        self._codes: Dict[str, int] = {}
+
+    def encode(self, label: str) -> int:
+        code = self._codes.get(label)
+        if code is None:
+            code = len(self._labels)
+            self._codes[label] = code
+            self._labels.append(label)
+        return code
+
+    def encode_all(self, labels: Iterable[str]) -> np.ndarray:
+        return np.array([self.encode(label) for label in labels], dtype=np.int32)
+
+    def find(self, label: str) -> int:
+        return self._codes.get(label, NO_LABEL)
+
+    def decode(self, code: int) -> Optional[str]:
+        return self._labels[code] if code != NO_LABEL else None
+
+    def decode_all(self, codes: np.ndarray) -> List[Optional[str]]:
+        return [self.decode(code) for code in codes.tolist()]
+
+
+DEPREL_VOCABULARY = LabelVocabulary()
+UPOS_VOCABULARY = LabelVocabulary()
+
+
+class DependencyTree:
+    """
+    Array-backed dependency tree with the interface of DependencyGraphWrapper.
+    Nodes are identified by their integer token position (0 is the artificial ROOT node) instead of
+    '<form>_<position>' strings. They are stored in sentence order, heads are indices into the node arrays
+    (-1 for the root of the tree),
+    deprels (label of the incoming edge) and UPOS tags are interned codes.
+    The first and last position and the size of every node's subtree are precomputed, so the contiguity
+    of any subtree is a constant time check.
+    The networkx representation is only built on demand (display, graph edit distance).
+    """
+    __slots__ = ('_forms', '_lemmas', '_positions', '_heads', '_deprels', '_upos', '_children', '_root',
+                 '_subtree_min', '_subtree_max', '_subtree_size', '_node_ids', '_node_index', '_edges_by_deprel',
+                 '_sentence_tokens', '_graph')
+
+    def __init__(self, forms: List[str], lemmas: List[str], positions: np.ndarray, heads: np.ndarray,
+                 deprels: np.ndarray, upos: np.ndarray):
+        self._forms = forms
+        self._lemmas = lemmas
+        self._positions = positions
+        self._heads = heads
+        self._deprels = deprels
+        self._upos = upos
+        self._node_ids: List[int] = positions.tolist()
+
+        self._children: List[List[int]] = [[] for _ in range(len(forms))]
+        self._root = -1
+        for node, head in enumerate(heads.tolist()):
+            if head == -1:
+                self._root = node
+            else:
+                self._children[head].append(node)
+        self._compute_subtree_spans()
+
+        self._node_index: Optional[Dict[int, int]] = None
+        self._edges_by_deprel: Optional[Dict[str, List[EdgeObject]]] = None
+        self._sentence_tokens: Optional[Tuple[str, ...]] = None
+        self._graph: Optional[nx.DiGraph] = None
+
+    def _compute_subtree_spans(self):
+        heads = self._heads.tolist()
+        self._subtree_min: List[int] = list(self._node_ids)
+        self._subtree_max: List[int] = list(self._subtree_min)
+        self._subtree_size: List[int] = [1] * len(heads)
+        # breadth-first order from the root, processed backwards every child comes before its head
+        order = [self._root] if self._root != -1 else []
+        for node in order:
+            order.extend(self._children[node])
+        for node in reversed(order):
+            head = heads[node]
+            if head != -1:
+                if self._subtree_min[node] < self._subtree_min[head]:
+                    self._subtree_min[head] = self._subtree_min[node]
+                if self._subtree_max[node] > self._subtree_max[head]:
+                    self._subtree_max[head] = self._subtree_max[node]
+                self._subtree_size[head] += self._subtree_size[node]
+
+    @classmethod
+    def from_tree_columns(cls, columns: TreeColumns) -> 'DependencyTree':
+        """
+        Builds the full sentence tree with the artificial ROOT node in the first position
+        """
+        forms, heads, deprels, upos, lemmas = columns
+        return cls([ROOT_KEY.rpartition('_')[0]] + list(forms),
+                   [ROOT_LABEL] + list(lemmas),
+                   np.arange(len(forms) + 1, dtype=np.int32),
+                   np.array([-1] + list(heads), dtype=np.int32),
+                   np.array([NO_LABEL] + DEPREL_VOCABULARY.encode_all(deprels).tolist(), dtype=np.int32),
+                   np.array([UPOS_VOCABULARY.encode(ROOT_LABEL)] + UPOS_VOCABULARY.encode_all(upos).tolist(),
+                            dtype=np.int32))
+
+    @classmethod
+    def from_dep_graph(cls, graph: nx.DiGraph) -> 'DependencyTree':
+        """
+        Converts a networkx dependency tree with '<form>_<position>' node ids
+        """
+        node_ids = sorted(graph.nodes, key=lambda x: int(x.rpartition('_')[-1]))
+        index = {node_id: i for i, node_id in enumerate(node_ids)}
+        heads = np.full(len(node_ids), -1, dtype=np.int32)
+        deprels = np.full(len(node_ids), NO_LABEL, dtype=np.int32)
+        for source, target, data in graph.edges(data=True):
+            heads[index[target]] = index[source]
+            deprels[index[target]] = DEPREL_VOCABULARY.encode(data['dep'])
+        return cls([x.rpartition('_')[0] for x in node_ids],
+                   [str(graph.nodes[x].get('lemma')).rstrip('\n') for x in node_ids],
+                   np.array([int(x.rpartition('_')[-1]) for x in node_ids], dtype=np.int32),
+                   heads,
+                   deprels,
+                   UPOS_VOCABULARY.encode_all(str(graph.nodes[x].get('postag')) for x in node_ids))
+
+    def __getstate__(self):
+        # codes are only valid in the process that interned them
+        return (self._forms, self._lemmas, self._positions, self._heads,
+                DEPREL_VOCABULARY.decode_all(self._deprels), UPOS_VOCABULARY.decode_all(self._upos))
+
+    def __setstate__(self, state):
+        forms, lemmas, positions, heads, deprels, upos = state
+        self.__init__(forms, lemmas, positions, heads,
+                      np.array([NO_LABEL if x is None else DEPREL_VOCABULARY.encode(x) for x in deprels],
+                               dtype=np.int32),
+                      UPOS_VOCABULARY.encode_all(upos))
+
+    def __len__(self):
+        return len(self._forms)
+
+    def _index_of(self, node_id: int) -> int:
+        # full sentence trees store the token at position i at index i
+        if 0 <= node_id < len(self._node_ids) and self._node_ids[node_id] == node_id:
+            return node_id
+        if self._node_index is None:
+            self._node_index = {position: i for i, position in enumerate(self._node_ids)}
+        return self._node_index[node_id]
+
+    @property
+    def graph(self) -> nx.DiGraph:
+        if self._graph is None:
+            self._graph = self.to_networkx()
+        return self._graph
+
+    def to_networkx(self) -> nx.DiGraph:
+        """
+        Nodes are keyed by position and inserted in the same order as by the TSV reader
+        """
+        node_ids = self._node_ids
+        upos = UPOS_VOCABULARY.decode_all(self._upos)
+        graph = nx.DiGraph()
+        for node, head in enumerate(self._heads.tolist()):
+            if head == -1:
+                if not self._children[node]:
+                    graph.add_node(node_ids[node], postag=upos[node], lemma=self._lemmas[node])
+                continue
+            graph.add_node(node_ids[head], postag=upos[head], lemma=self._lemmas[head])
+            graph.add_node(node_ids[node], postag=upos[node], lemma=self._lemmas[node])
+            graph.add_edge(node_ids[head], node_ids[node], dep=DEPREL_VOCABULARY.decode(int(self._deprels[node])))
+        return graph
+
+    def get_node_ids(self) -> List[int]:
+        return list(self._node_ids)
+
+    def get_sentence_tokens(self) -> Tuple[str, ...]:
+        """
+        Returns the tokens of the tree in sentence order without the artificial ROOT node
+        """
+        if self._sentence_tokens is None:
+            self._sentence_tokens = tuple(form for form, position in zip(self._forms, self._node_ids) if position != 0)
+        return self._sentence_tokens
+
+    def get_token(self, node_id: int) -> str:
+        return self._forms[self._index_of(node_id)]
+
+    def get_node_position(self, node_id: int) -> int:
+        return node_id
+
+    def get_subtree_tokens(self, node_id: int) -> List[str]:
+        """
+        Returns the tokens of the subtree rooted at node_id in sentence order
+        """
+        return [self._forms[i] for i in self._get_subtree_nodes(self._index_of(node_id))]
+
+    def get_root(self):
+        return self._node_ids[self._root]
+
+    def get_root_token(self):
+        # Get the token that is connected to the ROOT node with the root deplabel
+        return self.get_edges_with_property('dep', 'root')[0].target_node
+
+    def get_distances_from_root(self):
+        node_ids = self._node_ids
+        distances = {}
+        level = [self._root]
+        depth = 0
+        while level:
+            next_level = []
+            for node in level:
+                distances[node_ids[node]] = depth
+                next_level.extend(self._children[node])
+            level = next_level
+            depth += 1
+        return distances
+
+    def display_graph(self):
+        labels = {position: f'{form}_{position}' for form, position in zip(self._forms, self._node_ids)}
+        DependencyGraphWrapper(nx.relabel_nodes(self.graph, labels)).display_graph()
+
+    def get_nodes_with_property(self, attribute_key, attribute_value):
+        node_ids = self._node_ids
+        if attribute_key == 'postag':
+            nodes = np.flatnonzero(self._upos == UPOS_VOCABULARY.find(attribute_value)).tolist()
+        elif attribute_key == 'lemma':
+            nodes = [i for i, lemma in enumerate(self._lemmas) if lemma == attribute_value]
+        else:
+            raise KeyError(attribute_key)
+        return [node_ids[i] for i in nodes]
+
+    def _get_edges_by_deprel(self) -> Dict[str, List[EdgeObject]]:
+        if self._edges_by_deprel is None:
+            node_ids = self._node_ids
+            self._edges_by_deprel = {}
+            for node, (head, code) in enumerate(zip(self._heads.tolist(), self._deprels.tolist())):
+                if head != -1:
+                    deprel = DEPREL_VOCABULARY.decode(code)
+                    self._edges_by_deprel.setdefault(deprel, []).append(
+                        EdgeObject(node_ids[head], node_ids[node], {'dep': deprel}))
+        return self._edges_by_deprel
+
+    def get_edges_with_property(self, attribute_key, attribute_value):
+        if attribute_key != 'dep':
+            raise KeyError(attribute_key)
+        attribute_value = attribute_value.lower()  # because of the different taxonomies
+        return list(self._get_edges_by_deprel().get(attribute_value, []))
+
+    def _get_subtree_nodes(self, node: int) -> List[int]:
+        nodes = []
+        stack = [node]
+        while stack:
+            current = stack.pop()
+            nodes.append(current)
+            stack.extend(self._children[current])
+        nodes.sort()
+        return nodes
+
+    def get_subtree_node_ids(self, node_id):
+        node_ids = self._node_ids
+        return [node_ids[i] for i in self._get_subtree_nodes(self._index_of(node_id))]
+
+    def get_subtree_span(self, node_id) -> Tuple[int, int]:
+        """
+        Returns the smallest and largest token position of the subtree rooted at node_id
+        """
+        node = self._index_of(node_id)
+        return self._subtree_min[node], self._subtree_max[node]
+
+    def get_subtree_size(self, node_id) -> int:
+        return self._subtree_size[self._index_of(node_id)]
+
+    def is_subtree_contiguous(self, node_id) -> bool:
+        node = self._index_of(node_id)
+        return self._subtree_max[node] - self._subtree_min[node] + 1 == self._subtree_size[node]
+
+    def get_subtree_graph(self, node_id) -> 'DependencyTree':
+        """
+        Returns the subtree rooted at node_id as a new DependencyTree
+        """
+        nodes = self._get_subtree_nodes(self._index_of(node_id))
+        remap = np.full(len(self), -1, dtype=np.int32)
+        remap[nodes] = np.arange(len(nodes), dtype=np.int32)
+        heads = remap[self._heads[nodes]]
+        heads[remap[self._index_of(node_id)]] = -1
+        deprels = self._deprels[nodes].copy()
+        deprels[remap[self._index_of(node_id)]] = NO_LABEL
+        return DependencyTree([self._forms[i] for i in nodes], [self._lemmas[i] for i in nodes],
+                              self._positions[nodes], heads, deprels, self._upos[nodes])
+
+    def get_subtree_view(self, node_id) -> 'DependencyTree':
+        # the subtree arrays are cheap to slice, its graph is only built if it is accessed
+        return self.get_subtree_graph(node_id)
+
+    def get_subtree(self, node_id) -> nx.DiGraph:
+        return self.get_subtree_graph(node_id).graph
+
+    def get_node_property(self, node_id, property):
+        node = self._index_of(node_id)
+        if property == 'postag':
+            return UPOS_VOCABULARY.decode(int(self._upos[node]))
+        elif property == 'lemma':
+            return self._lemmas[node]
+        raise KeyError(property)
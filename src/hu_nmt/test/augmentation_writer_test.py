@@ -0,0 +1,124 @@
+import os
+import tempfile
+import unittest
+from typing import List, Tuple
+
+from hu_nmt.data_augmentator.augmentators.subject_object_augmentator import SubjectObjectAugmentator
+from hu_nmt.data_augmentator.filters.filter import Filter
+from hu_nmt.data_augmentator.utils.augmentation_writer import StreamingAugmentationWriter
+from hu_nmt.data_augmentator.utils.translation_candidate import TranslationCandidate, SentenceCandidate
+
+
+class EvenLengthFilter(Filter):
+    def __init__(self):
+        self.chunk_sizes = []
+
+    def filter(self, src_sentences: List[str], tgt_sentences: List[str]) -> Tuple[List[str], List[str]]:
+        self.chunk_sizes.append(len(src_sentences))
+        kept = [i for i, sent in enumerate(src_sentences) if len(sent) % 2 == 0]
+        return [src_sentences[i] for i in kept], [tgt_sentences[i] for i in kept]
+
+    def get_pre_filter_data_multiplier(self) -> float:
+        return 1
+
+
+def read_lines(path):
+    with open(path) as f:
+        return f.read().splitlines()
+
+
+class AugmentationWriterTest(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.output_path = os.path.join(self.tmp_dir.name, 'augmentations')
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    def test_tsv_output(self):
+        # action
+        with StreamingAugmentationWriter(self.output_path, 'tsv', ['obj_swapping', 'subj_swapping']) as writer:
+            writer.add('obj_swapping', ['a b', 'c d'], ['x y', 'z w'])
+            writer.add('obj_swapping', ['e'], ['v'])
+
+        # assert
+        self.assertListEqual(['a b\tx y', 'c d\tz w', 'e\tv'], read_lines(f'{self.output_path}/obj_swapping.tsv'))
+        self.assertListEqual([], read_lines(f'{self.output_path}/subj_swapping.tsv'))
+
+    def test_basic_output_with_originals(self):
+        # action
+        with StreamingAugmentationWriter(self.output_path, 'basic', ['obj_swapping'], save_original=True) as writer:
+            writer.add_original('obj_swapping', ['orig src'], ['orig tgt'])
+            writer.add('obj_swapping', ['aug src'], ['aug tgt'])
+
+        # assert
+        self.assertListEqual(['aug src'], read_lines(f'{self.output_path}/obj_swapping/obj_swapping.src'))
+        self.assertListEqual(['aug tgt'], read_lines(f'{self.output_path}/obj_swapping/obj_swapping.tgt'))
+        self.assertListEqual(['orig src'], read_lines(f'{self.output_path}/original_obj_swapping/obj_swapping.src'))
+        self.assertListEqual(['orig tgt'], read_lines(f'{self.output_path}/original_obj_swapping/obj_swapping.tgt'))
+
+    def test_filters_run_on_chunks(self):
+        # setup
+        even_length_filter = EvenLengthFilter()
+        src_sents = ['a' * length for length in range(1, 8)]
+
+        # action
+        with StreamingAugmentationWriter(self.output_path, 'tsv', ['obj_swapping'], filters=[even_length_filter],
+                                         filter_chunk_size=3) as writer:
+            for i in range(0, len(src_sents), 2):
+                writer.add('obj_swapping', src_sents[i:i + 2], src_sents[i:i + 2])
+
+        # assert
+        # the leftover pair is filtered with the last chunk
+        self.assertListEqual([3, 4], even_length_filter.chunk_sizes)
+        self.assertListEqual([f'{x}\t{x}' for x in ['aa', 'aaaa', 'aaaaaa']],
+                             read_lines(f'{self.output_path}/obj_swapping.tsv'))
+        self.assertEqual(7, writer.pre_filter_counts['obj_swapping'])
+        self.assertEqual(3, writer.written_counts['obj_swapping'])
+
+    def test_leftover_pairs_are_not_filtered_alone(self):
+        # setup
+        even_length_filter = EvenLengthFilter()
+        src_sents = ['a' * length for length in range(1, 11)]
+
+        # action
+        with StreamingAugmentationWriter(self.output_path, 'tsv', ['obj_swapping'], filters=[even_length_filter],
+                                         filter_chunk_size=3) as writer:
+            for sent in src_sents:
+                writer.add('obj_swapping', [sent], [sent])
+
+        # assert
+        self.assertListEqual([3, 3, 4], even_length_filter.chunk_sizes)
+        self.assertEqual(5, writer.written_counts['obj_swapping'])
+
+    def test_basic_output_can_be_reopened(self):
+        # setup
+        with StreamingAugmentationWriter(self.output_path, 'basic', ['obj_swapping'], save_original=True) as writer:
+            writer.add('obj_swapping', ['aug src'], ['aug tgt'])
+
+        # action
+        with StreamingAugmentationWriter(self.output_path, 'basic', ['obj_swapping'], save_original=True) as writer:
+            writer.add('obj_swapping', ['other src'], ['other tgt'])
+
+        # assert
+        self.assertListEqual(['other src'], read_lines(f'{self.output_path}/obj_swapping/obj_swapping.src'))
+
+    def test_augment_streams_to_files(self):
+        # setup
+        augmentator = SubjectObjectAugmentator(None, None, 1, filters=[], output_path=self.output_path,
+                                               output_format='tsv', separate_augmentation=True)
+        augmentator._pre_filter_sentence_count = 6
+        for i in range(3):
+            sentence = SentenceCandidate(('I', 'like', f'thing{i}'), obj_span=(2, 2))
+            augmentator._candidate_translations['obj'].append(TranslationCandidate(sentence, sentence))
+
+        # action
+        augmentator.augment()
+
+        # assert
+        lines = read_lines(f'{self.output_path}/obj_swapping.tsv')
+        self.assertEqual(6, len(lines))
+        self.assertSetEqual({f'I like thing{i}\tI like thing{i}' for i in range(3)}, set(lines))
+        self.assertListEqual([], augmentator._augmented_sentence_pairs['obj_swapping']['src'])
+        self.assertEqual(4, len(os.listdir(self.output_path)))
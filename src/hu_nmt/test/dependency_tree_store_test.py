@@ -0,0 +1,159 @@
+import json
+import os
+import pathlib
+import shutil
+import tempfile
+import unittest
+
+from hu_nmt.data_augmentator.base.nlp_pipeline_base import NlpPipelineBase, NodeRelationship
+from hu_nmt.data_augmentator.utils.dependency_tree_store import convert_tsv_shards_to_binary, DependencyTreeShard, \
+    write_binary_shard, DependencyTreeStore, get_shard_files, SHARD_INDEX_FILE_NAME, load_shard_index
+
+
+class DependencyTreeStoreTest(unittest.TestCase):
+    test_resource_dir = pathlib.Path(__file__).parent.resolve() / 'resources' / 'graph_test'
+
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.binary_dir = os.path.join(self.tmp_dir.name, 'binary')
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    def assertSameGraph(self, expected, actual):
+        self.assertListEqual(list(expected.nodes), list(actual.nodes))
+        self.assertListEqual(list(expected.edges(data=True)), list(actual.edges(data=True)))
+        for node, data in expected.nodes(data=True):
+            self.assertEqual(data['postag'], actual.nodes[node]['postag'])
+            # the TSV reader keeps the line break of the last column
+            self.assertEqual(data['lemma'].strip(), actual.nodes[node]['lemma'])
+
+    def test_convert_tsv_shards_to_binary(self):
+        # action
+        tree_cnt = convert_tsv_shards_to_binary(str(self.test_resource_dir), self.binary_dir)
+
+        # assert
+        self.assertEqual(2, tree_cnt)
+        self.assertListEqual(['edge_mapper_sents.dtb', SHARD_INDEX_FILE_NAME], sorted(os.listdir(self.binary_dir)))
+        tsv_graphs = next(NlpPipelineBase.read_parsed_dep_trees_from_files(str(self.test_resource_dir), per_file=True))
+        binary_graphs = next(NlpPipelineBase.read_parsed_dep_trees_from_files(self.binary_dir, per_file=True))
+        self.assertEqual(len(tsv_graphs), len(binary_graphs))
+        for tsv_graph, binary_graph in zip(tsv_graphs, binary_graphs):
+            self.assertSameGraph(tsv_graph, binary_graph)
+
+    def test_write_binary_shard(self):
+        # setup
+        dep_rel_lists = [
+            [NodeRelationship('I_1', 'PRON', 'I', 'nsubj', 'like_2', 'VERB', 'like'),
+             NodeRelationship('like_2', 'VERB', 'like', 'root', 'root_0', None, None),
+             NodeRelationship('ice_cream_3', 'NOUN', 'ice_cream', 'obj', 'like_2', 'VERB', 'like')],
+            [],
+            [NodeRelationship('Ők_1', 'PRON', 'ő', 'ROOT', 'root_0', None, None)],
+        ]
+
+        # action
+        write_binary_shard(self.binary_dir, 1, dep_rel_lists)
+        graphs = list(NlpPipelineBase.read_parsed_dep_trees_from_files(self.binary_dir))
+
+        # assert
+        self.assertEqual(3, len(DependencyTreeShard(os.path.join(self.binary_dir, '1.dtb'))))
+        self.assertEqual(3, len(graphs))
+        self.assertListEqual(['like_2', 'I_1', 'root_0', 'ice_cream_3'], list(graphs[0].nodes))
+        self.assertEqual('obj', graphs[0].edges['like_2', 'ice_cream_3']['dep'])
+        self.assertEqual(0, len(graphs[1].nodes))
+        self.assertEqual('ő', graphs[2].nodes['Ők_1']['lemma'])
+
+    def test_random_access_matches_sequential_read(self):
+        # setup
+        tsv_dir = str(self.test_resource_dir)
+        convert_tsv_shards_to_binary(tsv_dir, self.binary_dir)
+        expected_graphs = list(NlpPipelineBase.read_parsed_dep_trees_from_files(tsv_dir))
+
+        for data_dir in [tsv_dir, self.binary_dir]:
+            store = DependencyTreeStore(data_dir)
+
+            # action
+            graphs = store.get_dep_graphs([1, 0, 1])
+
+            # assert
+            self.assertEqual(2, len(store))
+            self.assertEqual(3, len(graphs))
+            self.assertSameGraph(expected_graphs[1], graphs[0])
+            self.assertSameGraph(expected_graphs[0], graphs[1])
+            self.assertSameGraph(expected_graphs[1], store.get_dep_graph(1))
+            with self.assertRaises(IndexError):
+                store.get_dep_graph(2)
+            store.close()
+
+    def test_random_access_across_shards(self):
+        # setup
+        dep_rel_lists = [
+            [NodeRelationship(f'word{i}_1', 'NOUN', f'lemma{i}', 'root', 'root_0', None, None)] for i in range(5)
+        ]
+        write_binary_shard(self.binary_dir, 1, dep_rel_lists[:2])
+        write_binary_shard(self.binary_dir, 2, dep_rel_lists[2:])
+        store = DependencyTreeStore(self.binary_dir)
+
+        # action
+        forms, heads, deprels, upos, lemmas = store.get_tree_columns(3)
+
+        # assert
+        self.assertListEqual([0, 2, 5], store.shard_offsets.tolist())
+        self.assertListEqual(['word3'], forms)
+        self.assertListEqual([0], heads)
+        self.assertListEqual(['lemma3'], lemmas)
+        store.close()
+
+    def test_tsv_shards_with_binary_copy_are_read_once(self):
+        # setup
+        shutil.copytree(str(self.test_resource_dir), self.binary_dir)
+        convert_tsv_shards_to_binary(self.binary_dir, self.binary_dir)
+        store = DependencyTreeStore(self.binary_dir)
+
+        # action
+        graphs = list(NlpPipelineBase.read_parsed_dep_trees_from_files(self.binary_dir))
+
+        # assert
+        self.assertListEqual(['edge_mapper_sents.dtb'], get_shard_files(self.binary_dir))
+        self.assertEqual(2, len(graphs))
+        self.assertEqual(2, len(store))
+        store.close()
+
+    def test_store_length_comes_from_the_shard_index(self):
+        # setup
+        dep_rel_lists = [
+            [NodeRelationship(f'word{i}_1', 'NOUN', f'lemma{i}', 'root', 'root_0', None, None)] for i in range(5)
+        ]
+        write_binary_shard(self.binary_dir, 1, dep_rel_lists[:2])
+        NlpPipelineBase.write_dep_graphs_to_file(self.binary_dir, 2, dep_rel_lists[2:])
+        store = DependencyTreeStore(self.binary_dir)
+
+        # action
+        sentence_count = len(store)
+
+        # assert
+        self.assertEqual(5, sentence_count)
+        self.assertDictEqual({'1.dtb': 2, '2.tsv': 3},
+                             {file: entry['tree_count'] for file, entry in load_shard_index(self.binary_dir).items()})
+        self.assertListEqual([None, None], store._shards)
+        store.close()
+
+    def test_stale_shard_index_entries_are_recounted(self):
+        # setup
+        dep_rel_lists = [
+            [NodeRelationship(f'word{i}_1', 'NOUN', f'lemma{i}', 'root', 'root_0', None, None)] for i in range(5)
+        ]
+        NlpPipelineBase.write_dep_graphs_to_file(self.binary_dir, 1, dep_rel_lists[:2])
+        shard_index = load_shard_index(self.binary_dir)
+        NlpPipelineBase.write_dep_graphs_to_file(self.binary_dir, 1, dep_rel_lists)
+        with open(os.path.join(self.binary_dir, SHARD_INDEX_FILE_NAME), 'w') as f:
+            json.dump({'version': 1, 'shards': shard_index}, f)
+        store = DependencyTreeStore(self.binary_dir)
+
+        # action
+        sentence_count = len(store)
+
+        # assert
+        self.assertEqual(5, sentence_count)
+        self.assertEqual('word4', store.get_tree_columns(4)[0][0])
+        store.close()
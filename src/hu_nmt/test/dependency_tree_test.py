@@ -0,0 +1,154 @@
+import pathlib
+import pickle
+import unittest
+
+import networkx as nx
+
+from hu_nmt.data_augmentator.base.nlp_pipeline_base import NlpPipelineBase
+from hu_nmt.data_augmentator.wrapper.dependency_graph_wrapper import DependencyGraphWrapper
+from hu_nmt.data_augmentator.wrapper.dependency_tree import DependencyTree
+
+
+def to_position(node_id):
+    return DependencyGraphWrapper.get_node_position(node_id)
+
+
+class DependencyTreeTest(unittest.TestCase):
+    test_resource_dir = str(pathlib.Path(__file__).parent.resolve() / 'resources' / 'graph_test')
+
+    def setUp(self) -> None:
+        self.wrappers = [DependencyGraphWrapper(x) for x in
+                         NlpPipelineBase.read_parsed_dep_trees_from_files(self.test_resource_dir)]
+        self.trees = list(NlpPipelineBase.read_dependency_trees_from_files(self.test_resource_dir))
+
+    def assertSameGraph(self, expected, actual):
+        # the tree keys its networkx nodes by position
+        self.assertListEqual([to_position(x) for x in expected.nodes], list(actual.nodes))
+        self.assertListEqual([(to_position(s), to_position(t), data) for s, t, data in expected.edges(data=True)],
+                             list(actual.edges(data=True)))
+        for node, data in expected.nodes(data=True):
+            self.assertEqual(data['postag'], actual.nodes[to_position(node)]['postag'])
+            self.assertEqual(data['lemma'].strip(), actual.nodes[to_position(node)]['lemma'])
+
+    def test_queries_match_graph_wrapper(self):
+        for wrapper, tree in zip(self.wrappers, self.trees):
+            self.assertEqual(to_position(wrapper.get_root()), tree.get_root())
+            self.assertEqual({to_position(k): v for k, v in wrapper.get_distances_from_root().items()},
+                             tree.get_distances_from_root())
+            self.assertListEqual(sorted(map(to_position, wrapper.get_node_ids())), tree.get_node_ids())
+            self.assertTupleEqual(wrapper.get_sentence_tokens(), tree.get_sentence_tokens())
+            self.assertListEqual(sorted(map(to_position, wrapper.get_nodes_with_property('postag', 'NOUN'))),
+                                 tree.get_nodes_with_property('postag', 'NOUN'))
+            for dep in ['nsubj', 'obj', 'punct', 'root', 'missing']:
+                expected_edges = wrapper.get_edges_with_property('dep', dep)
+                edges = tree.get_edges_with_property('dep', dep)
+                self.assertListEqual(sorted((to_position(s), to_position(t)) for s, t, _ in expected_edges),
+                                     sorted(e[:2] for e in edges))
+                for expected_edge in expected_edges:
+                    node_id = expected_edge.target_node
+                    self.assertListEqual(sorted(map(to_position, wrapper.get_subtree_node_ids(node_id))),
+                                         tree.get_subtree_node_ids(to_position(node_id)))
+                    self.assertListEqual(wrapper.get_subtree_tokens(node_id),
+                                         tree.get_subtree_tokens(to_position(node_id)))
+                    self.assertEqual(wrapper.get_token(node_id), tree.get_token(to_position(node_id)))
+                    self.assertEqual(wrapper.get_node_property(node_id, 'postag'),
+                                     tree.get_node_property(to_position(node_id), 'postag'))
+
+    def test_subtree_spans_match_graph_wrapper(self):
+        for wrapper, tree in zip(self.wrappers, self.trees):
+            for node_id in wrapper.get_node_ids():
+                position = to_position(node_id)
+                self.assertEqual(wrapper.get_subtree_span(node_id), tree.get_subtree_span(position))
+                self.assertEqual(wrapper.get_subtree_size(node_id), tree.get_subtree_size(position))
+                self.assertEqual(wrapper.is_subtree_contiguous(node_id), tree.is_subtree_contiguous(position))
+
+    def test_subtree_contiguity(self):
+        # assert
+        self.assertEqual((16, 19), self.trees[0].get_subtree_span(19))
+        self.assertTrue(self.trees[0].is_subtree_contiguous(19))
+        self.assertEqual((14, 23), self.trees[0].get_subtree_span(20))
+        self.assertEqual(10, self.trees[0].get_subtree_size(20))
+
+        # setup
+        graph = nx.DiGraph()
+        graph.add_edge('saw_2', 'I_1', dep='nsubj')
+        graph.add_edge('saw_2', 'man_4', dep='obj')
+        graph.add_edge('man_4', 'the_3', dep='det')
+        graph.add_edge('man_4', 'yesterday_6', dep='nmod')
+        graph.add_edge('saw_2', 'who_5', dep='advmod')
+        tree = DependencyTree.from_dep_graph(graph)
+
+        # assert
+        self.assertEqual((3, 6), tree.get_subtree_span(4))
+        self.assertFalse(tree.is_subtree_contiguous(4))
+        self.assertTrue(tree.is_subtree_contiguous(2))
+        self.assertListEqual(['the', 'man', 'yesterday'], tree.get_subtree_tokens(4))
+
+    def test_edge_lookups_are_not_affected_by_callers(self):
+        for graph in [self.wrappers[0], self.trees[0]]:
+            # action
+            edges = graph.get_edges_with_property('dep', 'PUNCT')
+            edges.clear()
+
+            # assert
+            self.assertEqual(4, len(graph.get_edges_with_property('dep', 'punct')))
+
+    def test_root_token(self):
+        self.assertEqual(4, self.trees[1].get_root_token())
+        self.assertEqual('realized', self.trees[1].get_token(self.trees[1].get_root_token()))
+
+    def test_networkx_conversion_matches_reader(self):
+        for wrapper, tree in zip(self.wrappers, self.trees):
+            self.assertSameGraph(wrapper.graph, tree.graph)
+
+    def test_subtree_graph(self):
+        # action
+        subtree = self.trees[0].get_subtree_graph(20)
+        expected = self.wrappers[0].get_subtree_graph('hagyja_20')
+
+        # assert
+        self.assertIsInstance(subtree, DependencyTree)
+        self.assertEqual(20, subtree.get_root())
+        # the node order of networkx subgraph views depends on set iteration
+        self.assertSetEqual(set(map(to_position, expected.graph.nodes)), set(subtree.graph.nodes))
+        self.assertSetEqual({(to_position(s), to_position(t)) for s, t in expected.graph.edges},
+                            set(subtree.graph.edges))
+        self.assertEqual(0, len(subtree.get_edges_with_property('dep', 'ccomp:obl')))
+        self.assertListEqual([19], [e.target_node for e in subtree.get_edges_with_property('dep', 'obj')])
+        self.assertTupleEqual(expected.get_sentence_tokens(), subtree.get_sentence_tokens())
+
+    def test_tokens_with_underscore(self):
+        # setup
+        graph = nx.DiGraph()
+        graph.add_node('ice_cream_2', postag='NOUN', lemma='ice_cream')
+        graph.add_edge('like_1', 'ice_cream_2', dep='obj')
+
+        # action
+        tree = DependencyTree.from_dep_graph(graph)
+
+        # assert
+        self.assertTupleEqual(('like', 'ice_cream'), tree.get_sentence_tokens())
+        self.assertEqual('ice_cream', tree.get_token(2))
+        self.assertEqual('ice_cream', tree.get_node_property(2, 'lemma'))
+
+    def test_from_dep_graph(self):
+        # setup
+        graph = nx.DiGraph()
+        graph.add_node('one_1', postag='VERB', lemma='one')
+        graph.add_node('two_2', postag='NOUN', lemma='two')
+        graph.add_edge('one_1', 'two_2', dep='obj')
+
+        # action
+        tree = DependencyTree.from_dep_graph(graph)
+
+        # assert
+        self.assertEqual(1, tree.get_root())
+        self.assertListEqual([1, 2], tree.get_subtree_node_ids(1))
+        self.assertEqual(2, tree.get_edges_with_property('dep', 'obj')[0].target_node)
+
+    def test_pickle_round_trip(self):
+        # action
+        tree = pickle.loads(pickle.dumps(self.trees[0]))
+
+        # assert
+        self.assertSameGraph(self.wrappers[0].graph, tree.graph)
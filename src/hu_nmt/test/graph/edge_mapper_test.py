@@ -101,6 +101,25 @@ class EdgeMapperTest(unittest.TestCase):
         expected = ['dep1', 'dep3']
         self.assertListEqual(edge_route, expected)
 
+    def test_get_edge_routes(self):
+        wrapper2 = DependencyGraphWrapper(self.graph2)
+
+        routes = self.edge_mapper._get_edge_routes(wrapper2)
+
+        # assert
+        expected = {'a': [], 'b': ['dep1'], 'c': ['dep1'], 'd': ['dep1', 'dep3'], 'e': ['dep1', 'dep4'],
+                    'f': ['dep1', 'dep3']}
+        self.assertDictEqual(routes, expected)
+
+    def test_get_edit_distances(self):
+        route = ['nmod', 'amod', 'det']
+        other_routes = [['nmod', 'amod', 'det'], [], ['amod', 'det'], ['case', 'nmod', 'det', 'amod'], ['obl']]
+
+        dists = self.edge_mapper._get_edit_distances(route, other_routes)
+
+        # assert
+        self.assertListEqual(list(dists), [0, 3, 1, 3, 3])
+
     def test_get_cands_by_children(self):
         edge1_data = self.graph1.edges['1', '2']
         edge1 = ('1', '2', edge1_data)
@@ -123,6 +142,19 @@ class EdgeMapperTest(unittest.TestCase):
         self.assertEqual(len(hun_edges), len(set(hun_edges)))
         self.assertEqual(len(eng_edges), len(set(eng_edges)))
 
+    def test_map_edges_does_not_modify_graphs(self):
+        graph1_subtypes = nx.DiGraph(self.graph1)
+        graph1_subtypes.edges['1', '2']['dep'] = 'DEP1:sub'
+        wrapper1 = DependencyGraphWrapper(graph1_subtypes.subgraph(['1', '2', '3', '4']))
+        wrapper2 = DependencyGraphWrapper(self.graph2)
+
+        mapping = self.edge_mapper.map_edges(wrapper1, wrapper2)
+
+        # assert
+        self.assertEqual(('a', 'b'), mapping[('1', '2')])
+        self.assertDictEqual({'dep': 'DEP1:sub'}, graph1_subtypes.edges['1', '2'])
+        self.assertDictEqual({'dep': 'dep1'}, self.graph2.edges['a', 'b'])
+
     def test_get_jaccard_index_from_mapping(self):
         wrapper1 = DependencyGraphWrapper(self.graph1)
         wrapper2 = DependencyGraphWrapper(self.graph2)
@@ -131,3 +163,26 @@ class EdgeMapperTest(unittest.TestCase):
         jaccard = self.edge_mapper.get_jaccard_index_from_mapping(self.graph1, self.graph2, mapping)
 
         self.assertAlmostEqual(jaccard, 0.4286, 4)
+
+    def test_get_similarity_from_graphs_with_cutoff(self):
+        wrapper1 = DependencyGraphWrapper(nx.DiGraph(self.graph1))
+        wrapper2 = DependencyGraphWrapper(nx.DiGraph(self.graph2))
+        exact = EdgeMapper().get_similarity_from_graphs(DependencyGraphWrapper(nx.DiGraph(self.graph1)),
+                                                        DependencyGraphWrapper(nx.DiGraph(self.graph2)))
+
+        # assert
+        self.assertAlmostEqual(exact, EdgeMapper.get_jaccard_index_upper_bound(wrapper1, wrapper2))
+        self.assertAlmostEqual(exact, EdgeMapper().get_similarity_from_graphs(wrapper1, wrapper2, cutoff=0.9))
+        self.assertAlmostEqual(exact, EdgeMapper().get_similarity_from_graphs(wrapper1, wrapper2, cutoff=0.1))
+
+    def test_get_similarity_batch(self):
+        wrapper1 = DependencyGraphWrapper(self.graph1)
+        wrapper2 = DependencyGraphWrapper(self.graph2)
+        subtree = wrapper2.get_subtree_view('c')
+        pairs = [(wrapper1, wrapper2), (wrapper1, subtree), (subtree, wrapper2), (wrapper1, wrapper2)]
+
+        sims = self.edge_mapper.get_similarity_batch(pairs)
+
+        # assert
+        self.assertListEqual([self.edge_mapper.get_similarity_from_graphs(g1, g2) for g1, g2 in pairs], sims.tolist())
+        self.assertAlmostEqual(sims[0], 0.4286, 4)
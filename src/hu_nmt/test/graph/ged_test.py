@@ -1,8 +1,12 @@
+import time
 import unittest
+from unittest.mock import patch
 
 import networkx as nx
+import numpy as np
 
 from hu_nmt.data_augmentator.graph_mappers.ged import GED
+from hu_nmt.data_augmentator.graph_mappers.graph_similarity_base import SimilarityTimeoutError
 from hu_nmt.data_augmentator.wrapper.dependency_graph_wrapper import DependencyGraphWrapper
 
 
@@ -89,4 +93,94 @@ class GEDTest(unittest.TestCase):
         # assert
         self.assertAlmostEqual(sim, 0.5909, 4)
 
+    def test_get_similarity_from_graphs_does_not_modify_graphs(self):
+        graph1_new_postag = nx.DiGraph(self.graph1)
+        graph1_new_postag.nodes['1']['postag'] = 'newtag'
+
+        for backend in ['networkx', 'tree']:
+            wrapper1 = DependencyGraphWrapper(graph1_new_postag.subgraph(['1', '2', '4', '5']))
+            wrapper2 = DependencyGraphWrapper(self.graph2)
+            ged = GED(backend=backend)
+
+            first = ged.get_similarity_from_graphs(wrapper1, wrapper2)
+            second = ged.get_similarity_from_graphs(wrapper1, wrapper2)
+
+            # assert
+            self.assertEqual('newtag', graph1_new_postag.nodes['1']['postag'])
+            self.assertEqual(first, second)
+
+    def test_get_similarity_from_graphs_tree_backend(self):
+        wrapper1 = DependencyGraphWrapper(self.graph1)
+        wrapper2 = DependencyGraphWrapper(self.graph2)
+
+        sim = GED(backend='tree').get_similarity_from_graphs(wrapper1, wrapper2)
 
+        # assert
+        # unlike graph edit distance, node 5 cannot be mapped to node e under a different parent
+        self.assertAlmostEqual(sim, 0.5455, 4)
+
+    def test_invalid_backend(self):
+        with self.assertRaises(ValueError):
+            GED(backend='exponential')
+
+    def test_lower_bound(self):
+        wrapper1 = DependencyGraphWrapper(nx.DiGraph(self.graph1))
+        wrapper2 = DependencyGraphWrapper(nx.DiGraph(self.graph2))
+
+        bound = self.ged.get_ged_lower_bound(wrapper1, wrapper2)
+
+        # assert
+        # tag6 and dep2, dep5 have no counterparts in graph2, tag2 and dep1, dep3 are surplus there
+        self.assertEqual(6, bound)
+        self.assertLessEqual(bound, self.ged.get_ged(wrapper1, wrapper2))
+        self.assertEqual(0, self.ged.get_ged_lower_bound(wrapper1, wrapper1))
+
+    def test_get_similarity_from_graphs_with_cutoff(self):
+        for backend in ['networkx', 'tree']:
+            ged = GED(backend=backend)
+            exact = ged.get_similarity_from_graphs(DependencyGraphWrapper(nx.DiGraph(self.graph1)),
+                                                   DependencyGraphWrapper(nx.DiGraph(self.graph2)))
+            for cutoff in [0.1, exact, exact + 0.01, 0.9]:
+                sim = ged.get_similarity_from_graphs(DependencyGraphWrapper(nx.DiGraph(self.graph1)),
+                                                     DependencyGraphWrapper(nx.DiGraph(self.graph2)), cutoff=cutoff)
+
+                # assert
+                if exact >= cutoff:
+                    self.assertAlmostEqual(exact, sim)
+                else:
+                    self.assertLess(sim, cutoff)
+                    self.assertGreaterEqual(sim, exact)
+
+    def test_get_similarity_batch(self):
+        wrapper1 = DependencyGraphWrapper(self.graph1)
+        wrapper2 = DependencyGraphWrapper(self.graph2)
+        subtree = wrapper2.get_subtree_view('c')
+        pairs = [(wrapper1, wrapper2), (wrapper1, subtree), (subtree, wrapper2), (wrapper1, wrapper2)]
+
+        for backend in ['networkx', 'tree']:
+            ged = GED(backend=backend)
+            for cutoff in [None, 0.6]:
+                sims = ged.get_similarity_batch(pairs, cutoff=cutoff)
+
+                # assert
+                self.assertIsInstance(sims, np.ndarray)
+                self.assertListEqual([ged.get_similarity_from_graphs(g1, g2, cutoff=cutoff) for g1, g2 in pairs],
+                                     sims.tolist())
+
+    def test_networkx_timeout_is_not_over_the_cutoff(self):
+        # setup
+        ged = GED(timeout=0.01)
+        wrapper1 = DependencyGraphWrapper(nx.DiGraph(self.graph1))
+        wrapper2 = DependencyGraphWrapper(nx.DiGraph(self.graph2))
+
+        def timed_out_search(*args, **kwargs):
+            time.sleep(0.02)
+            return None
+
+        # action
+        with patch('hu_nmt.data_augmentator.graph_mappers.ged.graph_edit_distance', timed_out_search):
+            # assert
+            with self.assertRaises(SimilarityTimeoutError):
+                ged.get_similarity_from_graphs(wrapper1, wrapper2, cutoff=0.1)
+            with self.assertRaises(SimilarityTimeoutError):
+                ged.get_similarity_from_graphs(wrapper1, wrapper2)
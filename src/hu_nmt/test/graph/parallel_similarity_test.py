@@ -0,0 +1,188 @@
+import pickle
+import threading
+import time
+import unittest
+
+from hu_nmt.data_augmentator.graph_mappers.edge_mapper import EdgeMapper
+from hu_nmt.data_augmentator.graph_mappers.ged import GED
+from hu_nmt.data_augmentator.graph_mappers.graph_similarity_base import GraphSimilarityBase, SimilarityTimeoutError
+from hu_nmt.data_augmentator.graph_mappers.label_histogram_similarity import LabelHistogramSimilarity
+from hu_nmt.data_augmentator.graph_mappers.parallel_similarity import ParallelSimilarityScorer
+from hu_nmt.data_augmentator.graph_mappers.similarity_cache import CachedGraphSimilarity
+from hu_nmt.test.graph.subtree_helpers import create_object
+
+
+class SlowSimilarity(GraphSimilarityBase):
+    """
+    Takes a second for subtrees with an adjective
+    """
+
+    def get_similarity_from_graphs(self, src_graph, tgt_graph, cutoff=None):
+        postags = [postag for graph in [src_graph, tgt_graph] for _, postag in graph.graph.nodes(data='postag')]
+        if 'ADJ' in postags:
+            time.sleep(1)
+        return 1.0
+
+
+class TimingOutSimilarity(GraphSimilarityBase):
+    """
+    Runs out of its own time limit for subtrees with an adjective
+    """
+
+    def get_similarity_from_graphs(self, src_graph, tgt_graph, cutoff=None):
+        postags = [postag for graph in [src_graph, tgt_graph] for _, postag in graph.graph.nodes(data='postag')]
+        if 'ADJ' in postags:
+            raise SimilarityTimeoutError()
+        return 1.0
+
+
+class ParallelSimilarityTest(unittest.TestCase):
+
+    def setUp(self) -> None:
+        the_dog = create_object([('the', 'DET'), ('dog', 'NOUN')], ['det'])
+        a_small_cat = create_object([('a', 'DET'), ('small', 'ADJ'), ('cat', 'NOUN')], ['det', 'amod'])
+        a_kutya = create_object([('a', 'DET'), ('kutyát', 'NOUN')], ['det:def'])
+        big_dogs = create_object([('big', 'ADJ'), ('dogs', 'NOUN')], ['amod'])
+        self.graph_pairs = [(the_dog, a_small_cat), (the_dog, a_kutya), (big_dogs, a_small_cat),
+                            (a_kutya, the_dog), (big_dogs, the_dog)]
+
+    def test_edge_mapper_is_picklable(self):
+        # setup
+        edge_mapper = pickle.loads(pickle.dumps(EdgeMapper()))
+
+        # assert
+        self.assertEqual(EdgeMapper().get_similarity_from_graphs(*self.graph_pairs[0]),
+                         edge_mapper.get_similarity_from_graphs(*self.graph_pairs[0]))
+
+    def test_parallel_scores_match_serial(self):
+        for similarity in [EdgeMapper(), GED(backend='tree'), CachedGraphSimilarity(GED(backend='tree'))]:
+            # setup
+            scorer = ParallelSimilarityScorer(similarity, num_workers=2, batch_size=2)
+            expected = [similarity.get_similarity_from_graphs(src, tgt, cutoff=0.5) for src, tgt in self.graph_pairs]
+
+            # action
+            scores = scorer.score(self.graph_pairs, cutoff=0.5)
+            scorer.close()
+
+            # assert
+            self.assertListEqual(expected, scores)
+
+    def test_structurally_identical_pairs_are_scored_once(self):
+        # setup
+        similarity = CachedGraphSimilarity(EdgeMapper())
+        scorer = ParallelSimilarityScorer(similarity)
+
+        # action
+        scorer.score(self.graph_pairs)
+
+        # assert
+        self.assertEqual(4, len(similarity._cache))
+
+    def test_pairs_over_the_time_budget(self):
+        for num_workers in [1, 2]:
+            # setup
+            scorer = ParallelSimilarityScorer(SlowSimilarity(), num_workers=num_workers, pair_timeout=0.1)
+
+            # action
+            scores = scorer.score(self.graph_pairs)
+            scorer.close()
+
+            # assert
+            self.assertListEqual([0.0, 1.0, 0.0, 1.0, 0.0], scores)
+            self.assertDictEqual({'exact': 2, 'timed_out': 3, 'fallback': 0}, scorer.counts)
+
+    def test_timed_out_pairs_are_scored_by_the_fallback(self):
+        # setup
+        fallback = EdgeMapper()
+        scorer = ParallelSimilarityScorer(SlowSimilarity(), pair_timeout=0.1, fallback=fallback)
+
+        # action
+        scores = scorer.score(self.graph_pairs)
+
+        # assert
+        self.assertEqual(fallback.get_similarity_from_graphs(*self.graph_pairs[0]), scores[0])
+        self.assertEqual(1.0, scores[1])
+
+    def test_timeouts_of_the_measure_are_not_exact(self):
+        for pair_timeout in [None, 1.0]:
+            # setup
+            similarity = CachedGraphSimilarity(TimingOutSimilarity())
+            fallback = EdgeMapper()
+            scorer = ParallelSimilarityScorer(similarity, pair_timeout=pair_timeout, fallback=fallback)
+
+            # action
+            scores = scorer.score(self.graph_pairs, cutoff=0.5)
+
+            # assert
+            self.assertEqual(fallback.get_similarity_from_graphs(*self.graph_pairs[0], cutoff=0.5), scores[0])
+            self.assertEqual(1.0, scores[1])
+            # the two exact pairs are structurally identical, they are scored once
+            self.assertDictEqual({'exact': 1, 'timed_out': 3, 'fallback': 0}, scorer.counts)
+            # only the exact similarities are cached
+            self.assertEqual(1, len(similarity._cache))
+
+    def test_total_time_budget(self):
+        # setup
+        scorer = ParallelSimilarityScorer(SlowSimilarity(), total_budget=0.3)
+
+        # action
+        start = time.time()
+        scorer.score(self.graph_pairs)
+
+        # assert
+        self.assertLess(time.time() - start, 1)
+        self.assertDictEqual({'exact': 2, 'timed_out': 3, 'fallback': 0}, scorer.counts)
+
+    def test_total_budget_is_shared_among_calls(self):
+        # setup
+        scorer = ParallelSimilarityScorer(SlowSimilarity(), total_budget=0.6)
+
+        # action
+        start = time.time()
+        scorer.score(self.graph_pairs, budget_share=0.5)
+        first_call_time = time.time() - start
+        scorer.score(self.graph_pairs, budget_share=1.0)
+
+        # assert
+        self.assertLess(first_call_time, 0.45)
+        self.assertLess(time.time() - start, 1)
+        # the slow pairs of the second call still get a time slice instead of the fallback
+        self.assertDictEqual({'exact': 4, 'timed_out': 6, 'fallback': 0}, scorer.counts)
+
+    def test_pairs_after_the_total_budget_are_scored_by_the_fallback(self):
+        # setup
+        fallback = LabelHistogramSimilarity(GED(backend='tree'))
+        scorer = ParallelSimilarityScorer(SlowSimilarity(), total_budget=0, fallback=fallback)
+
+        # action
+        scores = scorer.score(self.graph_pairs)
+
+        # assert
+        self.assertDictEqual({'exact': 0, 'timed_out': 0, 'fallback': 5}, scorer.counts)
+        self.assertListEqual([fallback.get_similarity_from_graphs(src, tgt) for src, tgt in self.graph_pairs], scores)
+
+    def test_pair_timeout_outside_of_the_main_thread(self):
+        # setup
+        similarity = EdgeMapper()
+        scorer = ParallelSimilarityScorer(similarity, pair_timeout=1.0)
+        results = []
+
+        # action
+        thread = threading.Thread(target=lambda: results.append(scorer.score(self.graph_pairs)))
+        thread.start()
+        thread.join()
+
+        # assert
+        self.assertListEqual([[similarity.get_similarity_from_graphs(src, tgt) for src, tgt in self.graph_pairs]],
+                             results)
+
+    def test_ged_upper_bound(self):
+        # setup
+        ged = GED(backend='tree')
+
+        for src, tgt in self.graph_pairs:
+            # action
+            upper_bound = ged.get_similarity_upper_bound(src, tgt)
+
+            # assert
+            self.assertGreaterEqual(upper_bound, ged.get_similarity_from_graphs(src, tgt))
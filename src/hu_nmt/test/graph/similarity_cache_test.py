@@ -0,0 +1,86 @@
+import os
+import tempfile
+import unittest
+
+from hu_nmt.data_augmentator.graph_mappers.edge_mapper import EdgeMapper
+from hu_nmt.data_augmentator.graph_mappers.ged import GED
+from hu_nmt.data_augmentator.graph_mappers.similarity_cache import CachedGraphSimilarity, get_subtree_signature
+from hu_nmt.test.graph.subtree_helpers import create_object
+
+
+class SimilarityCacheTest(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.the_dog = create_object([('the', 'DET'), ('dog', 'NOUN')], ['det'])
+        self.a_cat = create_object([('a', 'DET'), ('cat', 'NOUN')], ['det'])
+        self.a_small_cat = create_object([('a', 'DET'), ('small', 'ADJ'), ('cat', 'NOUN')], ['det', 'amod'])
+        self.a_kutya = create_object([('a', 'DET'), ('kutyát', 'NOUN')], ['det:def'])
+
+    def test_signature(self):
+        # assert
+        self.assertEqual(get_subtree_signature(self.the_dog), get_subtree_signature(self.a_cat))
+        # only the main dependency relation is compared
+        self.assertEqual(get_subtree_signature(self.the_dog), get_subtree_signature(self.a_kutya))
+        self.assertNotEqual(get_subtree_signature(self.the_dog), get_subtree_signature(self.a_small_cat))
+        # children are ordered by token position
+        small_a_cat = create_object([('small', 'ADJ'), ('a', 'DET'), ('cat', 'NOUN')], ['amod', 'det'])
+        self.assertNotEqual(get_subtree_signature(small_a_cat), get_subtree_signature(self.a_small_cat))
+
+    def test_cache_hits(self):
+        # setup
+        similarity = CachedGraphSimilarity(GED(backend='tree'))
+
+        # action
+        first = similarity.get_similarity_from_graphs(self.the_dog, self.a_small_cat)
+        second = similarity.get_similarity_from_graphs(self.a_cat, self.a_small_cat)
+        similarity.get_similarity_from_graphs(self.a_cat, self.a_small_cat, cutoff=0.9)
+
+        # assert
+        self.assertEqual(first, second)
+        self.assertEqual(GED(backend='tree').get_similarity_from_graphs(self.the_dog, self.a_small_cat), first)
+        self.assertEqual(1, similarity.hits)
+        self.assertEqual(2, similarity.misses)
+        self.assertAlmostEqual(1 / 3, similarity.get_hit_rate())
+
+    def test_get_similarity_batch(self):
+        # setup
+        similarity = CachedGraphSimilarity(GED(backend='tree'))
+        pairs = [(self.the_dog, self.a_small_cat), (self.a_cat, self.a_small_cat), (self.the_dog, self.a_cat)]
+
+        # action
+        sims = similarity.get_similarity_batch(pairs)
+
+        # assert
+        self.assertListEqual(GED(backend='tree').get_similarity_batch(pairs).tolist(), sims.tolist())
+        self.assertEqual(2, len(similarity._cache))
+
+    def test_least_recently_used_pairs_are_evicted(self):
+        # setup
+        similarity = CachedGraphSimilarity(EdgeMapper(), max_size=1)
+
+        # action
+        similarity.get_similarity_from_graphs(self.the_dog, self.a_cat)
+        similarity.get_similarity_from_graphs(self.the_dog, self.a_small_cat)
+        similarity.get_similarity_from_graphs(self.the_dog, self.a_cat)
+
+        # assert
+        self.assertEqual(0, similarity.hits)
+        self.assertEqual(3, similarity.misses)
+
+    def test_persistence(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            # setup
+            cache_path = os.path.join(tmp_dir, 'similarities.pickle')
+            similarity = CachedGraphSimilarity(GED(backend='tree'), cache_path=cache_path)
+            similarity.get_similarity_from_graphs(self.the_dog, self.a_small_cat)
+
+            # action
+            similarity.save()
+            loaded = CachedGraphSimilarity(GED(backend='tree'), cache_path=cache_path)
+            other_measure = CachedGraphSimilarity(GED(backend='networkx'), cache_path=cache_path)
+
+            # assert
+            loaded.get_similarity_from_graphs(self.a_cat, self.a_small_cat)
+            self.assertEqual(1, loaded.hits)
+            other_measure.get_similarity_from_graphs(self.a_cat, self.a_small_cat)
+            self.assertEqual(0, other_measure.hits)
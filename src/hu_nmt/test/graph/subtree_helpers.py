@@ -0,0 +1,16 @@
+import networkx as nx
+
+from hu_nmt.data_augmentator.wrapper.dependency_graph_wrapper import DependencyGraphWrapper
+
+
+def create_object(words, deps):
+    """
+    Creates an object subtree headed by its last word, words are (form, postag) tuples
+    """
+    graph = nx.DiGraph()
+    head = f'{words[-1][0]}_{len(words)}'
+    for position, (form, postag) in enumerate(words, 1):
+        graph.add_node(f'{form}_{position}', postag=postag, lemma=form)
+    for position, ((form, _), dep) in enumerate(zip(words[:-1], deps), 1):
+        graph.add_edge(head, f'{form}_{position}', dep=dep)
+    return DependencyGraphWrapper(graph)
@@ -0,0 +1,86 @@
+import pathlib
+import unittest
+
+import networkx as nx
+
+from hu_nmt.data_augmentator.base.nlp_pipeline_base import NlpPipelineBase
+from hu_nmt.data_augmentator.graph_mappers.ged import GED
+from hu_nmt.data_augmentator.graph_mappers.tree_edit_distance import tree_edit_distance
+from hu_nmt.data_augmentator.wrapper.dependency_graph_wrapper import DependencyGraphWrapper
+
+
+def create_tree(edges):
+    tree = nx.DiGraph()
+    for parent, child in edges:
+        tree.add_node(parent, label=parent[0])
+        tree.add_node(child, label=child[0])
+        tree.add_edge(parent, child, dep='')
+    return tree
+
+
+def unit_tree_edit_distance(tree1, root1, tree2, root2):
+    return tree_edit_distance(tree1, root1, tree2, root2,
+                              node_subst_cost=lambda n1, n2: 0 if n1['label'] == n2['label'] else 1,
+                              node_del_cost=lambda n: 1, node_ins_cost=lambda n: 1,
+                              edge_subst_cost=lambda e1, e2: 0, edge_del_cost=lambda e: 0,
+                              edge_ins_cost=lambda e: 0)
+
+
+class TreeEditDistanceTest(unittest.TestCase):
+    test_resource_dir = str(pathlib.Path(__file__).parent.parent.resolve() / 'resources' / 'graph_test')
+
+    def test_zhang_shasha_example(self):
+        # setup
+        # f(d(a, c(b)), e) and f(c(d(a, b)), e) from the paper of Zhang and Shasha
+        tree1 = create_tree([('f', 'd'), ('f', 'e'), ('d', 'a'), ('d', 'c'), ('c', 'b')])
+        tree2 = create_tree([('f', 'c'), ('f', 'e'), ('c', 'd'), ('d', 'a'), ('d', 'b')])
+
+        # assert
+        self.assertEqual(2, unit_tree_edit_distance(tree1, 'f', tree2, 'f'))
+        self.assertEqual(2, unit_tree_edit_distance(tree2, 'f', tree1, 'f'))
+        self.assertEqual(0, unit_tree_edit_distance(tree1, 'f', tree1, 'f'))
+
+    def test_sibling_order_matters(self):
+        # setup
+        tree1 = create_tree([('r', 'a'), ('r', 'b')])
+        tree2 = create_tree([('r', 'b'), ('r', 'a')])
+
+        # assert
+        self.assertEqual(2, unit_tree_edit_distance(tree1, 'r', tree2, 'r'))
+
+    def test_distance_to_single_node(self):
+        # setup
+        tree1 = create_tree([('r', 'a'), ('a', 'b'), ('a', 'c')])
+        tree2 = nx.DiGraph()
+        tree2.add_node('x', label='x')
+
+        # assert
+        self.assertEqual(4, unit_tree_edit_distance(tree1, 'r', tree2, 'x'))
+
+    def test_ged_tree_backend_on_dependency_trees(self):
+        # setup
+        hun_wrapper, eng_wrapper = [DependencyGraphWrapper(x) for x in
+                                    NlpPipelineBase.read_parsed_dep_trees_from_files(self.test_resource_dir)]
+        ged = GED(backend='tree')
+
+        # action
+        distance = ged.get_ged(hun_wrapper, eng_wrapper)
+
+        # assert
+        self.assertEqual(0, ged.get_ged(hun_wrapper, hun_wrapper))
+        self.assertEqual(distance, ged.get_ged(eng_wrapper, hun_wrapper))
+        self.assertGreater(distance, 0)
+
+    def test_upper_bound(self):
+        # setup
+        tree1 = create_tree([('f', 'd'), ('f', 'e'), ('d', 'a'), ('d', 'c'), ('c', 'b')])
+        tree2 = create_tree([('f', 'c'), ('f', 'e'), ('c', 'd'), ('d', 'a'), ('d', 'b')])
+        costs = dict(node_subst_cost=lambda n1, n2: 0 if n1['label'] == n2['label'] else 1,
+                     node_del_cost=lambda n: 1, node_ins_cost=lambda n: 1,
+                     edge_subst_cost=lambda e1, e2: 0, edge_del_cost=lambda e: 0, edge_ins_cost=lambda e: 0)
+
+        # assert
+        self.assertEqual(2, tree_edit_distance(tree1, 'f', tree2, 'f', upper_bound=2, **costs))
+        self.assertIsNone(tree_edit_distance(tree1, 'f', tree2, 'f', upper_bound=1.5, **costs))
+        # rejected by the postorder sequence bound
+        self.assertIsNone(tree_edit_distance(tree1, 'f', create_tree([('x', 'y')]), 'x', upper_bound=3, **costs))
@@ -0,0 +1,106 @@
+import unittest
+
+import numpy as np
+
+from hu_nmt.data_augmentator.augmentators.graph_based_augmentator import GraphBasedAugmentator
+from hu_nmt.data_augmentator.graph_mappers.ged import DEFAULT_GED_TIMEOUT
+from hu_nmt.data_augmentator.utils.translation_candidate import TranslationCandidate
+
+
+def create_candidates(similarities):
+    return [TranslationCandidate(f'src_{idx}', f'tgt_{idx}', similarity=similarity)
+            for idx, similarity in enumerate(similarities)]
+
+
+class GraphBasedSamplingTest(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.candidates = create_candidates([0.9, 0.1, 0.7, 0.3, 0.8, 0.2, 0.6, 0.4])
+
+    def test_pairs_are_drawn_above_the_threshold(self):
+        # setup
+        augmentator = GraphBasedAugmentator('en', 'hu', threshold=0.6)
+
+        # action
+        index_pairs = augmentator.sample_item_index_pairs(self.candidates, 6, 'obj', np.random.default_rng(0))
+
+        # assert
+        self.assertEqual((6, 2), index_pairs.shape)
+        self.assertSetEqual({(0, 2), (0, 4), (0, 6), (2, 4), (2, 6), (4, 6)},
+                            {tuple(sorted(pair)) for pair in index_pairs.tolist()})
+
+    def test_threshold_is_lowered_in_one_step(self):
+        # setup
+        augmentator = GraphBasedAugmentator('en', 'hu', threshold=0.6)
+
+        # action
+        with self.assertLogs(level='WARNING'):
+            index_pairs = augmentator.sample_item_index_pairs(self.candidates, 10, 'obj', np.random.default_rng(0))
+
+        # assert
+        # 5 candidates supply 10 pairs, the threshold is lowered to the fifth highest similarity
+        self.assertSetEqual({0, 2, 4, 6, 7}, set(index_pairs.flatten().tolist()))
+        self.assertEqual(10, len({tuple(sorted(pair)) for pair in index_pairs.tolist()}))
+        self.assertEqual(0.6, augmentator.threshold)
+
+    def test_clipped_candidates_are_ranked_by_their_bounds(self):
+        # setup
+        augmentator = GraphBasedAugmentator('en', 'hu', threshold=0.6)
+        # rejected pairs whose upper bounds pass the cutoff are clipped just below it
+        clipped = float(np.nextafter(0.6, -np.inf))
+        candidates = [candidate._replace(similarity_bound=bound) for candidate, bound in zip(
+            create_candidates([0.9, clipped, 0.7, clipped, 0.8, clipped, 0.6, 0.5]),
+            [None, 0.75, None, 0.95, None, 0.65, None, None])]
+
+        # action
+        with self.assertLogs(level='WARNING'):
+            index_pairs = augmentator.sample_item_index_pairs(candidates, 15, 'obj', np.random.default_rng(0))
+
+        # assert
+        # 6 candidates supply 15 pairs, the best bounded ones below the cutoff fill the shortfall
+        self.assertSetEqual({0, 1, 2, 3, 4, 6}, set(index_pairs.flatten().tolist()))
+        self.assertEqual(15, len({tuple(sorted(pair)) for pair in index_pairs.tolist()}))
+        self.assertEqual(0.6, augmentator.threshold)
+
+    def test_sampling_threshold(self):
+        # setup
+        augmentator = GraphBasedAugmentator('en', 'hu', threshold=0.95)
+        sorted_similarities = np.array([0.9, 0.8, 0.7, 0.6, 0.4])
+
+        # assert
+        self.assertEqual(0.95, augmentator.get_sampling_threshold(sorted_similarities, 0))
+        self.assertEqual(0.8, augmentator.get_sampling_threshold(sorted_similarities, 1))
+        self.assertEqual(0.7, augmentator.get_sampling_threshold(sorted_similarities, 3))
+        self.assertEqual(0.4, augmentator.get_sampling_threshold(sorted_similarities, 100))
+
+    def test_threshold_is_per_instance(self):
+        # setup
+        strict = GraphBasedAugmentator('en', 'hu', threshold=0.8)
+        lenient = GraphBasedAugmentator('en', 'hu', threshold=0.2, use_similarity_cutoff=False)
+
+        # assert
+        self.assertEqual(0.8, strict.threshold)
+        self.assertEqual(0.8, strict.similarity_cutoff)
+        self.assertEqual(0.2, lenient.threshold)
+        self.assertIsNone(lenient.similarity_cutoff)
+
+    def test_ged_timeout_is_the_pair_timeout(self):
+        # setup
+        augmentator = GraphBasedAugmentator('en', 'hu', similarity_type='ged', similarity_cache_size=0,
+                                            similarity_pair_timeout=2.0)
+        unlimited = GraphBasedAugmentator('en', 'hu', similarity_type='ged', similarity_cache_size=0,
+                                          similarity_pair_timeout=None)
+
+        # assert
+        self.assertEqual(2.0, augmentator.similarity.timeout)
+        self.assertEqual(DEFAULT_GED_TIMEOUT, unlimited.similarity.timeout)
+
+    def test_similarity_budget_share_of_shards(self):
+        # setup
+        augmentator = GraphBasedAugmentator('en', 'hu', expected_sentence_count=100)
+
+        # action
+        shares = [augmentator._get_budget_share(sentence_count) for sentence_count in [20, 40, 40]]
+
+        # assert
+        self.assertListEqual([0.2, 0.5, 1.0], shares)
@@ -0,0 +1,58 @@
+import unittest
+
+import numpy as np
+
+from hu_nmt.data_augmentator.utils.length_buckets import get_length_schedule, parse_in_length_order
+
+
+class LengthBucketsTest(unittest.TestCase):
+
+    def test_sentences_are_sorted_within_windows(self):
+        # setup
+        lengths = np.array([5, 1, 3, 9, 2, 2, 7, 4])
+
+        # action
+        regular_order, long_order = get_length_schedule(lengths, window_size=4, long_sentence_length=None)
+
+        # assert
+        self.assertListEqual([1, 2, 0, 3, 4, 5, 7, 6], regular_order.tolist())
+        self.assertListEqual([], long_order.tolist())
+
+    def test_long_sentences_are_queued_separately(self):
+        # setup
+        lengths = np.array([5, 200, 3, 9, 150, 2])
+
+        # action
+        regular_order, long_order = get_length_schedule(lengths, window_size=3, long_sentence_length=100)
+
+        # assert
+        self.assertListEqual([2, 0, 3, 5], regular_order.tolist())
+        self.assertListEqual([1, 4], long_order.tolist())
+
+    def test_results_are_in_original_order(self):
+        # setup
+        sentences = [' '.join(['word'] * length) for length in [4, 1, 300, 2, 8, 3, 1]]
+        parsed_batches = []
+
+        def parse(batch):
+            parsed_batches.append(batch)
+            return [len(sentence.split()) for sentence in batch]
+
+        # action
+        results = parse_in_length_order(sentences, parse, window_size=4, long_sentence_length=100)
+
+        # assert
+        self.assertListEqual([4, 1, 300, 2, 8, 3, 1], results)
+        self.assertListEqual([[1, 2, 4, 8, 1, 3], [300]],
+                             [[len(sentence.split()) for sentence in batch] for batch in parsed_batches])
+
+    def test_long_sentences_use_their_own_parser(self):
+        # setup
+        sentences = ['a b c', 'a ' * 10, 'a']
+
+        # action
+        results = parse_in_length_order(sentences, lambda batch: ['regular'] * len(batch),
+                                        parse_long=lambda batch: ['long'] * len(batch), long_sentence_length=5)
+
+        # assert
+        self.assertListEqual(['regular', 'long', 'regular'], results)
@@ -0,0 +1,82 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from hu_nmt.data_augmentator.augmentators.subject_object_augmentator import SubjectObjectAugmentator
+from hu_nmt.data_augmentator.utils.packed_candidates import save_packed_candidates, load_packed_candidates, \
+    swap_packed_pairs
+from hu_nmt.data_augmentator.utils.translation_candidate import TranslationCandidate, SentenceCandidate
+
+
+def create_candidates():
+    candidates = []
+    for i in range(8):
+        src = SentenceCandidate(('Ő', 'szereti', f'a{i}', 'fagyit', '.'), obj_span=(2, 3), nsubj_span=(0, 0))
+        tgt = SentenceCandidate((f'He{i}', 'likes', 'ice', 'créam', str(i)), obj_span=(2, 3),
+                                nsubj_span=(0, 0) if i % 3 else None)
+        candidates.append(TranslationCandidate(src, tgt))
+    return candidates
+
+
+class PackedCandidatesTest(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.candidates = create_candidates()
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    def test_swap_matches_candidate_swapping(self):
+        # setup
+        augmentator = SubjectObjectAugmentator(None, None, filters=[], save_original=True)
+        save_packed_candidates(self.candidates, self.tmp_dir.name)
+        index_pairs = np.array([[0, 1], [2, 5], [1, 3], [4, 7]])
+
+        # action
+        result = swap_packed_pairs(load_packed_candidates(self.tmp_dir.name), index_pairs, 'nsubj', save_original=True)
+        augmentator.swap_dep_subtrees([(self.candidates[x], self.candidates[y]) for x, y in index_pairs], 'nsubj',
+                                      False)
+
+        # assert
+        self.assertEqual(2, result.error_cnt)
+        self.assertListEqual(augmentator._augmented_sentence_pairs['subj_swapping']['src'], result.src_sents)
+        self.assertListEqual(augmentator._augmented_sentence_pairs['subj_swapping']['tgt'], result.tgt_sents)
+        self.assertListEqual(['Ő szereti a2 fagyit .', 'Ő szereti a5 fagyit .', 'He2 likes ice créam 2',
+                              'He5 likes ice créam 5'], [result.original_src_sents[0], result.original_src_sents[1],
+                                                         result.original_tgt_sents[0], result.original_tgt_sents[1]])
+
+    def augment(self, num_workers: int, random_seed: int):
+        output_path = os.path.join(self.tmp_dir.name, f'{num_workers}_{random_seed}')
+        augmentator = SubjectObjectAugmentator(None, None, 1, random_seed=random_seed, filters=[],
+                                               output_path=output_path, output_format='tsv', num_workers=num_workers)
+        augmentator._pre_filter_sentence_count = 20
+        augmentator._candidate_translations['both'] = self.candidates
+        augmentator.augment()
+
+        output = {}
+        for file_name in sorted(os.listdir(output_path)):
+            with open(os.path.join(output_path, file_name)) as f:
+                output[file_name] = f.read()
+        shutil.rmtree(output_path)
+        return output
+
+    def test_parallel_augmentation_matches_serial(self):
+        # action
+        serial_output = self.augment(1, 42)
+        parallel_output = self.augment(2, 42)
+
+        # assert
+        self.assertEqual(20, len(serial_output['obj_swapping.tsv'].splitlines()))
+        self.assertEqual(serial_output, parallel_output)
+
+    def test_augmentation_is_reproducible_with_seed(self):
+        # action
+        output = self.augment(2, 42)
+
+        # assert
+        self.assertEqual(output, self.augment(2, 42))
+        self.assertNotEqual(output, self.augment(2, 43))
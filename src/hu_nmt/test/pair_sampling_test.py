@@ -0,0 +1,55 @@
+import unittest
+
+import numpy as np
+
+from hu_nmt.data_augmentator.utils.pair_sampling import decode_pair_indices, sample_unordered_index_pairs, \
+    get_pair_count
+
+
+class PairSamplingTest(unittest.TestCase):
+
+    def test_decode_pair_indices(self):
+        # setup
+        expected_pairs = [(i, j) for j in range(60) for i in range(j)]
+
+        # action
+        first, second = decode_pair_indices(np.arange(get_pair_count(60)))
+
+        # assert
+        self.assertListEqual(expected_pairs, list(zip(first.tolist(), second.tolist())))
+
+    def test_decode_large_pair_indices(self):
+        # setup
+        item_count = 10_000_000
+        last_pair = get_pair_count(item_count) - 1
+
+        # action
+        first, second = decode_pair_indices(np.array([last_pair, last_pair - 1]))
+
+        # assert
+        self.assertListEqual([item_count - 2, item_count - 3], first.tolist())
+        self.assertListEqual([item_count - 1, item_count - 1], second.tolist())
+
+    def test_sampled_pairs_are_distinct(self):
+        for item_count, sample_count in [(1000, 5000), (10, 40), (10, 45)]:
+            # action
+            pairs = sample_unordered_index_pairs(item_count, sample_count, np.random.default_rng(123))
+
+            # assert
+            self.assertEqual((sample_count, 2), pairs.shape)
+            self.assertTrue(np.all(pairs[:, 0] < pairs[:, 1]))
+            self.assertTrue(np.all(pairs[:, 1] < item_count))
+            self.assertEqual(sample_count, len({tuple(pair) for pair in pairs.tolist()}))
+
+    def test_sample_count_is_clamped(self):
+        # action
+        with self.assertLogs(level='WARNING'):
+            pairs = sample_unordered_index_pairs(4, 100, np.random.default_rng(123))
+
+        # assert
+        self.assertEqual(6, len(pairs))
+        self.assertEqual(0, len(sample_unordered_index_pairs(1, 3, np.random.default_rng(123))))
+
+    def test_seeded_sampling_is_reproducible(self):
+        self.assertListEqual(sample_unordered_index_pairs(100, 20, np.random.default_rng(7)).tolist(),
+                             sample_unordered_index_pairs(100, 20, np.random.default_rng(7)).tolist())
@@ -17,6 +17,17 @@ class LanguageDetectorTest(unittest.TestCase):
         text = 'This is a beautiful house'
         self.assertEqual('en', self.langdetect.predict(text))
 
+    def testPredictBatch(self):
+        texts = ['Ez egy gyönyörű ház', 'This is a beautiful house', 'Ez egy gyönyörű  ház\n']
 
+        languages = self.langdetect.predict_batch(texts)
 
+        self.assertListEqual(['hu', 'en', 'hu'], languages)
 
+    def testRepeatedTextIsCached(self):
+        langdetect = LanguageDetector(cache_size=1)
+        langdetect.predict_batch(['Ez egy gyönyörű ház', 'Ez egy gyönyörű ház'])
+
+        self.assertEqual('hu', langdetect.predict('Ez  egy gyönyörű ház'))
+        self.assertEqual(1, langdetect.hits)
+        self.assertEqual(2, langdetect.misses)
@@ -87,3 +87,40 @@ class PreprocessorTest(unittest.TestCase):
         target_doc = self.preprocessor.target_parser.tokenize(target_sentence)
 
         self.assertFalse(self.preprocessor._contains_one_sentence(source_doc, target_doc))
+
+    def test_screen_pair_empty(self):
+        self.assertEqual('empty', self.preprocessor.screen_pair('', 'This is an English sentence.'))
+
+    def test_screen_pair_too_long(self):
+        source_sentence = ' '.join(['szó'] * 130)
+        target_sentence = ' '.join(['word'] * 130)
+
+        self.assertEqual('word_count', self.preprocessor.screen_pair(source_sentence, target_sentence))
+
+    def test_screen_pair_bad_ratio(self):
+        source_sentence = ' '.join(['szó'] * 10)
+        target_sentence = ' '.join(['word'] * 40)
+
+        self.assertEqual('word_count_ratio', self.preprocessor.screen_pair(source_sentence, target_sentence))
+
+    def test_screen_pair_multiple_sentences(self):
+        source_sentence = 'Ez egy magyar mondat. Ez is.'
+        target_sentence = 'This is an English sentence.'
+
+        self.preprocessor._screen_multiple_sentences = True
+        try:
+            self.assertEqual('multiple_sentences', self.preprocessor.screen_pair(source_sentence, target_sentence))
+        finally:
+            self.preprocessor._screen_multiple_sentences = False
+
+    def test_screen_pair_keeps_multiple_sentences_by_default(self):
+        source_sentence = 'Az árak tartalmazzák az áfát.'
+        target_sentence = 'Prices incl. VAT are listed here.'
+
+        self.assertIsNone(self.preprocessor.screen_pair(source_sentence, target_sentence))
+
+    def test_screen_pair_passes(self):
+        source_sentence = 'Mr. Smith a 2. fejezetet olvassa.'
+        target_sentence = 'Mr. Smith is reading chapter 2.'
+
+        self.assertIsNone(self.preprocessor.screen_pair(source_sentence, target_sentence))
@@ -39,6 +39,20 @@ class SpacyDependencyParserTest(unittest.TestCase):
         if not isinstance(dep_graph, nx.DiGraph):
             raise TypeError('Dependency graph needs to be a nx DiGraph')
 
+    def test_sentences_to_node_relationship_lists(self):
+        sentences = [
+            'Péter elvitte a kutyát sétálni az erdőbe.',
+            'Ma elmegyek a boltba. Holnap pedig a piacra.',
+            'Róbert kihívta Ákost egy futóversenyre.'
+        ]
+        pipeline = self.hun_dep_parser.nlp_pipeline
+
+        dep_rel_lists = SpacyNlpPipeline.sentences_to_node_relationship_lists(pipeline, sentences, batch_size=2)
+
+        expected = [SpacyNlpPipeline.sentence_to_node_relationship_list(pipeline, sentence) for sentence in sentences]
+        self.assertListEqual(expected, dep_rel_lists)
+        self.assertListEqual([], dep_rel_lists[1])
+
     def test_sentences_to_serialized_dep_graph_files(self):
         sentences = [
             'Péter elvitte a kutyát sétálni az erdőbe.',
@@ -17,6 +17,16 @@ class StanzaDependencyParserTest(unittest.TestCase):
 
         self.assertEqual(count, 9)
 
+    def test_sentences_to_node_relationship_lists(self):
+        sentences = ['This is a sentence.', 'This is one. This is another!', 'The dog chased the cat.']
+        pipeline = self.eng_parser.nlp_pipeline
+
+        dep_rel_lists = self.eng_parser.sentences_to_node_relationship_lists(pipeline, sentences)
+
+        expected = [self.eng_parser.sentence_to_node_relationship_list(pipeline, sentence) for sentence in sentences]
+        self.assertListEqual(expected, dep_rel_lists)
+        self.assertListEqual([], dep_rel_lists[1])
+
     def test_sentence_count(self):
         sentence = 'This is a sentence: it\'s still the same. This is another! Is this a list: 1, 2, 3?'
         doc = self.eng_tokenizer.tokenize(sentence)
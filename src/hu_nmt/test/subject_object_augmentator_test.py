@@ -327,7 +327,7 @@ class SubjectObjectAugmentatorTests(unittest.TestCase):
                                                                           with_progress_bar=False,
                                                                           separate_augmentation=True)
         object_translation_pairs = SubjectObjectAugmentator.sample_item_pairs(
-            augmentator._candidate_translations['obj'], 1)
+            augmentator._candidate_translations['obj'], 1, 'obj', augmentator.get_rng('obj'))
 
         # action
         augmentator.swap_dep_subtrees(object_translation_pairs, 'obj', False)
@@ -360,7 +360,7 @@ class SubjectObjectAugmentatorTests(unittest.TestCase):
                                                                           with_progress_bar=False,
                                                                           separate_augmentation=True)
         subject_translation_pairs = SubjectObjectAugmentator.sample_item_pairs(
-            augmentator._candidate_translations['nsubj'], 1)
+            augmentator._candidate_translations['nsubj'], 1, 'nsubj', augmentator.get_rng('nsubj'))
 
         # action
         augmentator.swap_dep_subtrees(subject_translation_pairs, 'nsubj', False)
@@ -0,0 +1,54 @@
+import pathlib
+import unittest
+
+from hu_nmt.data_augmentator.augmentators.subject_object_augmentator import SubjectObjectAugmentator
+from hu_nmt.data_augmentator.base.nlp_pipeline_base import NlpPipelineBase
+from hu_nmt.data_augmentator.utils.translation_candidate import TranslationCandidate, to_translation_candidate
+from hu_nmt.data_augmentator.utils.translation_graph import TranslationGraph
+from hu_nmt.data_augmentator.wrapper.dependency_graph_wrapper import DependencyGraphWrapper
+
+
+class TranslationCandidateTest(unittest.TestCase):
+    test_resource_dir = str(pathlib.Path(__file__).parent.resolve() / 'resources' / 'graph_test')
+
+    def setUp(self) -> None:
+        self.hun_tree, self.eng_tree = NlpPipelineBase.read_dependency_trees_from_files(self.test_resource_dir)
+        self.hun_wrapper, self.eng_wrapper = [DependencyGraphWrapper(x) for x in
+                                              NlpPipelineBase.read_parsed_dep_trees_from_files(self.test_resource_dir)]
+
+    def test_from_graphs(self):
+        # action
+        candidate = TranslationCandidate.from_graphs(self.hun_tree, self.eng_tree, ['obj', 'nsubj'], 0.5,
+                                                     with_predicate=True)
+
+        # assert
+        self.assertEqual(0.5, candidate.similarity)
+        self.assertEqual((15, 18), candidate.src.obj_span)
+        self.assertListEqual(['a', 'kényelmes', 'zsáklaki', 'életet'], candidate.src.get_subtree_tokens('obj'))
+        self.assertListEqual(['a', 'búcsú'], candidate.src.get_subtree_tokens('nsubj'))
+        self.assertEqual('fájdalmas', candidate.src.tokens[candidate.src.predicate_index])
+        self.assertEqual('fájdalmas', candidate.src.predicate_lemma)
+        self.assertEqual(self.eng_tree.get_sentence_tokens(), candidate.tgt.tokens)
+
+    def test_translation_graph_conversion(self):
+        # action
+        candidate = to_translation_candidate(TranslationGraph(self.hun_wrapper, self.eng_wrapper, 0.25))
+
+        # assert
+        self.assertEqual(TranslationCandidate.from_graphs(self.hun_tree, self.eng_tree, ['obj', 'nsubj'], 0.25,
+                                                          with_predicate=True), candidate)
+        self.assertIs(candidate, to_translation_candidate(candidate))
+
+    def test_swap_on_candidates_matches_graphs(self):
+        # setup
+        augmentator = SubjectObjectAugmentator(None, None, filters=[])
+        candidate = TranslationCandidate.from_graphs(self.hun_tree, self.eng_tree, ['obj', 'nsubj'],
+                                                     with_predicate=True)
+
+        # action
+        swapped = augmentator.swap_candidate_subtrees(candidate.src, candidate.tgt, 'obj')
+
+        # assert
+        self.assertListEqual(augmentator.swap_subtrees(self.hun_wrapper, self.eng_wrapper, 'obj'), swapped)
+        self.assertListEqual(augmentator.swap_predicates(self.hun_wrapper, self.eng_wrapper),
+                             augmentator.swap_candidate_predicates(candidate.src, candidate.tgt))